@@ -4,14 +4,16 @@ from __future__ import annotations
 import logging
 from typing import TYPE_CHECKING, TypeAlias
 
-import aiohttp
+import voluptuous as vol
 
-from homeassistant.config_entries import ConfigEntry
+from homeassistant.config_entries import SOURCE_IMPORT, ConfigEntry
 from homeassistant.const import Platform
 from homeassistant.core import HomeAssistant
 from homeassistant.exceptions import ConfigEntryNotReady
+import homeassistant.helpers.config_validation as cv
+from homeassistant.helpers.typing import ConfigType
 
-from .const import DOMAIN
+from .const import CONF_STATION_GIDS, DOMAIN, RELOAD_OPTIONS
 
 if TYPE_CHECKING:
     from .sensor import VasttrafikDataUpdateCoordinator
@@ -20,45 +22,80 @@ _LOGGER = logging.getLogger(__name__)
 
 PLATFORMS = [Platform.SENSOR]
 
+# Optional YAML import of many stations at once:
+#
+# vasttrafik_m34:
+#   auth_key: !secret vasttrafik_auth_key
+#   stations:
+#     - Brunnsparken
+#     - 9021014001760000
+CONFIG_SCHEMA = vol.Schema(
+    {
+        vol.Optional(DOMAIN): vol.Schema(
+            {
+                vol.Required("auth_key"): cv.string,
+                vol.Required("stations"): vol.All(cv.ensure_list, [cv.string]),
+            }
+        )
+    },
+    extra=vol.ALLOW_EXTRA,
+)
+
+
 # Type alias for config entry with runtime data
 VasttrafikConfigEntry: TypeAlias = "ConfigEntry[VasttrafikDataUpdateCoordinator]"
 
 
+async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
+    """Set up services and import stations listed in configuration.yaml."""
+    # Loaded here rather than at import, importing the integration stays cheap
+    # pylint: disable-next=import-outside-toplevel
+    from .services import async_setup_services
+    # pylint: disable-next=import-outside-toplevel
+    from .views import async_register_views
+    
+    async_setup_services(hass)
+    async_register_views(hass)
+    
+    if DOMAIN in config:
+        hass.async_create_task(
+            hass.config_entries.flow.async_init(
+                DOMAIN,
+                context={"source": SOURCE_IMPORT},
+                data=dict(config[DOMAIN]),
+            )
+        )
+    return True
+
+
 async def async_setup_entry(hass: HomeAssistant, entry: VasttrafikConfigEntry) -> bool:
     """Set up Västtrafik M34 from a config entry."""
     # Validate that we have the required data
-    if "auth_key" not in entry.data or "station_gid" not in entry.data:
+    if "auth_key" not in entry.data or (
+        "station_gid" not in entry.data and CONF_STATION_GIDS not in entry.data
+    ):
         _LOGGER.error("Missing required data in config entry")
         return False
     
+    # pylint: disable-next=import-outside-toplevel
+    import aiohttp
+    
+    # pylint: disable-next=import-outside-toplevel
+    from .auth import TokenRequestFailed, async_get_token_manager
+    
     # Test connection before setting up platforms
     auth_key = entry.data["auth_key"]
     
     try:
-        # Test OAuth2 token retrieval
-        async with aiohttp.ClientSession() as session:
-            auth_header = f"Basic {auth_key}"
-            
-            async with session.post(
-                "https://ext-api.vasttrafik.se/token",
-                headers={
-                    "Authorization": auth_header,
-                    "Content-Type": "application/x-www-form-urlencoded",
-                },
-                data={"grant_type": "client_credentials"},
-                timeout=aiohttp.ClientTimeout(total=10),
-            ) as response:
-                if response.status != 200:
-                    error_text = await response.text()
-                    _LOGGER.error("Failed to authenticate with Västtrafik API: %s", error_text)
-                    raise ConfigEntryNotReady(f"Authentication failed: {response.status}")
-                
-                token_data = await response.json()
-                if "access_token" not in token_data:
-                    raise ConfigEntryNotReady("No access token in response")
+        # Test OAuth2 token retrieval, the coordinator reuses the token
+        token_manager = await async_get_token_manager(hass, auth_key)
+        await token_manager.async_get_token()
         
         _LOGGER.info("Successfully authenticated with Västtrafik API")
         
+    except TokenRequestFailed as ex:
+        _LOGGER.error("Failed to authenticate with Västtrafik API: %s", ex)
+        raise ConfigEntryNotReady(f"Authentication failed: {ex.status}") from ex
     except aiohttp.ClientError as ex:
         _LOGGER.error("Network error while testing connection: %s", ex)
         raise ConfigEntryNotReady(f"Network error: {ex}") from ex
@@ -70,9 +107,41 @@ async def async_setup_entry(hass: HomeAssistant, entry: VasttrafikConfigEntry) -
     # The coordinator will be stored in runtime_data by sensor platform
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
     
+    # Options the running entry was set up or last updated with
+    applied = dict(entry.options)
+    
+    async def _async_update_listener(
+        hass: HomeAssistant, entry: VasttrafikConfigEntry
+    ) -> None:
+        """Apply changed options in place, reloading only when needed."""
+        changed = {
+            key
+            for key in applied.keys() | entry.options.keys()
+            if applied.get(key) != entry.options.get(key)
+        }
+        if changed & RELOAD_OPTIONS:
+            await hass.config_entries.async_reload(entry.entry_id)
+            return
+        applied.clear()
+        applied.update(entry.options)
+        if changed:
+            entry.runtime_data.async_apply_options(entry.options)
+    
+    entry.async_on_unload(entry.add_update_listener(_async_update_listener))
+    
     return True
 
 
 async def async_unload_entry(hass: HomeAssistant, entry: VasttrafikConfigEntry) -> bool:
     """Unload a config entry."""
-    return await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
+    if not await hass.config_entries.async_unload_platforms(entry, PLATFORMS):
+        return False
+    
+    # pylint: disable-next=import-outside-toplevel
+    from .departure_query import async_drop_index
+    # pylint: disable-next=import-outside-toplevel
+    from .views import async_entry_unloaded
+    
+    async_drop_index(hass, entry.entry_id)
+    async_entry_unloaded(hass, entry.entry_id)
+    return True
@@ -0,0 +1,149 @@
+"""Presence- and visibility-driven polling for Västtrafik M34.
+
+A station can be bound to polling conditions: people being home, someone
+in a zone, an input_boolean being on, or a dashboard being subscribed to
+its departures. While none of its conditions hold, the station drops to a
+slow heartbeat or stops polling altogether, and it wakes up as soon as one
+becomes true. A station without conditions always polls.
+"""
+from __future__ import annotations
+
+from collections.abc import Awaitable, Callable, Iterable
+from typing import Any
+
+from homeassistant.const import STATE_HOME, STATE_ON
+from homeassistant.core import (
+    CALLBACK_TYPE,
+    Event,
+    HomeAssistant,
+    State,
+    callback,
+)
+from homeassistant.helpers.event import async_track_state_change_event
+
+
+def condition_met(state: State | None) -> bool:
+    """Return True if a condition entity currently allows polling."""
+    if state is None:
+        return False
+    if state.domain == "person":
+        return state.state == STATE_HOME
+    if state.domain == "zone":
+        # A zone's state is the number of people in it
+        try:
+            return int(state.state) > 0
+        except ValueError:
+            return False
+    return state.state == STATE_ON
+
+
+class PollGate:
+    """Decide whether a station should poll at full rate."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        entity_ids: Iterable[str] = (),
+        when_viewed: bool = False,
+    ) -> None:
+        """Initialize the gate."""
+        self.hass = hass
+        self.entity_ids = list(entity_ids)
+        self.when_viewed = when_viewed
+        # Websocket subscriptions to the station's departures
+        self.viewers = 0
+        self._on_wake: Callable[[], Awaitable[None]] | None = None
+        self._unsub_state: CALLBACK_TYPE | None = None
+        self._active = self._evaluate()
+
+    @property
+    def conditional(self) -> bool:
+        """Return True if polling depends on any condition."""
+        return bool(self.entity_ids) or self.when_viewed
+
+    @property
+    def active(self) -> bool:
+        """Return True if the station should poll at full rate."""
+        return self._active
+
+    def _evaluate(self) -> bool:
+        """Return whether any condition holds right now."""
+        if not self.conditional:
+            return True
+        if self.when_viewed and self.viewers > 0:
+            return True
+        return any(
+            condition_met(self.hass.states.get(entity_id))
+            for entity_id in self.entity_ids
+        )
+
+    @callback
+    def _async_update(self) -> None:
+        """Re-evaluate the conditions and wake the station if they became true."""
+        was_active = self._active
+        self._active = self._evaluate()
+        if self._active and not was_active and self._on_wake is not None:
+            self.hass.async_create_task(self._on_wake())
+
+    @callback
+    def async_start(self, on_wake: Callable[[], Awaitable[None]]) -> CALLBACK_TYPE:
+        """Start following the condition entities, return a stop callback."""
+        self._on_wake = on_wake
+        self._active = self._evaluate()
+        self._async_track()
+        return self._async_untrack
+
+    @callback
+    def _async_track(self) -> None:
+        """Follow the state of the condition entities."""
+        if not self.entity_ids:
+            return
+
+        @callback
+        def _state_changed(event: Event) -> None:
+            self._async_update()
+
+        self._unsub_state = async_track_state_change_event(
+            self.hass, self.entity_ids, _state_changed
+        )
+
+    @callback
+    def _async_untrack(self) -> None:
+        """Stop following the condition entities."""
+        if self._unsub_state is not None:
+            self._unsub_state()
+            self._unsub_state = None
+
+    @callback
+    def async_set_conditions(
+        self, entity_ids: Iterable[str], when_viewed: bool
+    ) -> None:
+        """Replace the conditions of a running gate."""
+        self._async_untrack()
+        self.entity_ids = list(entity_ids)
+        self.when_viewed = when_viewed
+        if self._on_wake is not None:
+            self._async_track()
+        self._async_update()
+
+    @callback
+    def async_add_viewer(self) -> CALLBACK_TYPE:
+        """Count a subscribed dashboard, return a callback that removes it."""
+        self.viewers += 1
+        self._async_update()
+
+        @callback
+        def _remove() -> None:
+            self.viewers -= 1
+            self._async_update()
+
+        return _remove
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the state for diagnostics."""
+        return {
+            "active": self._active,
+            "conditions": self.entity_ids,
+            "when_viewed": self.when_viewed,
+            "viewers": self.viewers,
+        }
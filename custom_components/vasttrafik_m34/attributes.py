@@ -0,0 +1,68 @@
+"""Compact departure attributes for Västtrafik M34.
+
+The columnar format stores the departures as parallel arrays, one per
+field, with times as epoch seconds. It leaves out what a card can derive
+(clock time, minutes until departure), so the state only changes when the
+departures do. A byte budget trims departures from the end until the
+encoded attribute fits.
+"""
+from __future__ import annotations
+
+from collections.abc import Callable
+import json
+from typing import Any
+
+from .board import parse_time
+
+
+def _epoch(value: str | None) -> int | None:
+    """Return an API timestamp as epoch seconds."""
+    if (parsed := parse_time(value)) is None:
+        return None
+    return int(parsed.timestamp())
+
+
+def columnar_departures(departures: list[dict[str, Any]]) -> dict[str, list[Any]]:
+    """Return the departures as parallel arrays per field."""
+    columns: dict[str, list[Any]] = {
+        "line": [dep.get("line_number", "?") for dep in departures],
+        "destination": [dep.get("direction", "?") for dep in departures],
+        "track": [dep.get("track", "") for dep in departures],
+        "planned": [_epoch(dep.get("planned_time")) for dep in departures],
+        "estimated": [_epoch(dep.get("estimated_time")) for dep in departures],
+        "delay": [dep.get("delay_minutes", 0) for dep in departures],
+        "cancelled": [dep.get("is_cancelled", False) for dep in departures],
+        "realtime": [dep.get("is_realtime", False) for dep in departures],
+        "details_reference": [dep.get("details_reference") for dep in departures],
+    }
+    # Combined boards name the stop each departure leaves from
+    if any("stop_name" in dep for dep in departures):
+        columns["stop_name"] = [dep.get("stop_name", "") for dep in departures]
+    return columns
+
+
+def encoded_size(value: Any) -> int:
+    """Return the size of a value encoded as compact JSON."""
+    return len(
+        json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode()
+    )
+
+
+def fit_rows(render: Callable[[int], Any], rows: int, budget: int) -> Any:
+    """Render as many leading rows as fit in a byte budget.
+
+    ``render(n)`` returns the attribute for the first ``n`` rows. A budget
+    of 0 means no limit.
+    """
+    value = render(rows)
+    if not budget or encoded_size(value) <= budget:
+        return value
+    # Largest row count that fits
+    low, high = 0, rows - 1
+    while low < high:
+        middle = (low + high + 1) // 2
+        if encoded_size(render(middle)) <= budget:
+            low = middle
+        else:
+            high = middle - 1
+    return render(low)
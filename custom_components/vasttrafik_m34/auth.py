@@ -0,0 +1,158 @@
+"""OAuth2 token handling for the Västtrafik M34 integration.
+
+One token manager exists per Authentication Key. Station coordinators and
+the config flow share it, so adding another station with a key that is
+already configured reuses the cached token instead of fetching a new one.
+"""
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime
+from functools import partial
+import logging
+from typing import TYPE_CHECKING
+
+import aiohttp
+
+from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import HomeAssistantError
+
+from .const import DOMAIN, TOKEN_URL
+from .quota import QuotaPlanner, async_get_planner
+from .resilience import REQUEST_TIMEOUT, RequestLayer, async_get_request_layer
+from .vasttrafik_api import ApiError, async_request_token
+
+if TYPE_CHECKING:
+    from .shared_cache import SharedCache
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class TokenRequestFailed(HomeAssistantError):
+    """Error to indicate the token endpoint refused the request."""
+
+    def __init__(self, status: int) -> None:
+        """Initialize the error."""
+        super().__init__(f"Failed to get access token: {status}")
+        self.status = status
+
+
+class TokenManager:
+    """Fetch and cache the access token for one Authentication Key."""
+
+    def __init__(
+        self,
+        auth_key: str,
+        planner: QuotaPlanner,
+        request_layer: RequestLayer,
+    ) -> None:
+        """Initialize the token manager."""
+        self._auth_key = auth_key
+        self._planner = planner
+        self._request_layer = request_layer
+        self._access_token: str | None = None
+        self._expires_at: datetime | None = None
+        self._lock = asyncio.Lock()
+        # Token cache shared with other instances, if an entry uses one
+        self.shared_cache: SharedCache | None = None
+        # Last token the API refused, not to be taken from the shared cache
+        self._refused: str | None = None
+
+    @property
+    def has_valid_token(self) -> bool:
+        """Return True if a cached token can still be used."""
+        return (
+            self._access_token is not None
+            and self._expires_at is not None
+            and datetime.now() < self._expires_at
+        )
+
+    def invalidate(self) -> None:
+        """Forget the cached token, e.g. after a 401 answer."""
+        self._refused = self._access_token
+        self._access_token = None
+        self._expires_at = None
+
+    async def async_get_token(self) -> str:
+        """Return a valid access token, fetching one only when needed.
+
+        Concurrent callers wait for a single token request. With a shared
+        cache, a token another instance fetched is used before asking for
+        a new one.
+        """
+        if self.has_valid_token:
+            return self._access_token
+        async with self._lock:
+            if not self.has_valid_token and not await self._async_load_shared_token():
+                await self._async_fetch_token()
+                await self._async_store_shared_token()
+            return self._access_token
+
+    async def async_set_shared_cache(self, shared_cache: SharedCache) -> None:
+        """Share tokens with other instances from now on."""
+        self.shared_cache = shared_cache
+        if self.has_valid_token:
+            await self._async_store_shared_token()
+
+    async def _async_load_shared_token(self) -> bool:
+        """Take a valid token from the shared cache, True if there was one."""
+        if self.shared_cache is None:
+            return False
+        try:
+            stored = await self.shared_cache.async_get_token(self._planner.key_id)
+        except HomeAssistantError as ex:
+            _LOGGER.debug("Could not read the shared token: %s", ex)
+            return False
+        if stored is None or stored[0] == self._refused:
+            return False
+        self._access_token = stored[0]
+        self._expires_at = datetime.fromtimestamp(stored[1])
+        return self.has_valid_token
+
+    async def _async_store_shared_token(self) -> None:
+        """Offer the current token to the other instances."""
+        if self.shared_cache is None or self._expires_at is None:
+            return
+        try:
+            await self.shared_cache.async_set_token(
+                self._planner.key_id, self._access_token, self._expires_at.timestamp()
+            )
+        except HomeAssistantError as ex:
+            _LOGGER.debug("Could not share the token: %s", ex)
+
+    async def _async_fetch_token(self) -> None:
+        """Fetch a new token from the token endpoint."""
+        async with aiohttp.ClientSession(timeout=REQUEST_TIMEOUT) as session:
+            try:
+                token = await async_request_token(
+                    session,
+                    self._auth_key,
+                    token_url=TOKEN_URL,
+                    request=partial(
+                        self._request_layer.request,
+                        session,
+                        endpoint=f"token:{self._planner.key_id}",
+                        on_send=self._planner.async_record_request,
+                    ),
+                )
+            except ApiError as ex:
+                _LOGGER.error("Token request failed: %s - %s", ex.status, ex.text)
+                raise TokenRequestFailed(ex.status) from ex
+
+        self._access_token = token.token
+        self._expires_at = datetime.fromtimestamp(token.expires_at)
+
+
+async def async_get_token_manager(hass: HomeAssistant, auth_key: str) -> TokenManager:
+    """Return the shared token manager for an auth key."""
+    managers: dict[str, TokenManager] = hass.data.setdefault(DOMAIN, {}).setdefault(
+        "tokens", {}
+    )
+    if (manager := managers.get(auth_key)) is None:
+        planner = await async_get_planner(hass, auth_key)
+        # Another caller may have created it while the planner loaded
+        if (manager := managers.get(auth_key)) is None:
+            manager = managers[auth_key] = TokenManager(
+                auth_key, planner, async_get_request_layer(hass)
+            )
+    return manager
@@ -0,0 +1,62 @@
+"""Combined departure boards for Västtrafik M34.
+
+A combined board shows the departures of several nearby stop areas as one
+list. Each stop's list arrives sorted from the API, so the board is a k-way
+merge of those lists rather than a sort of everything. A journey calling at
+more than one of the stops is shown once, at its earliest departure.
+"""
+from __future__ import annotations
+
+from collections.abc import Iterator, Mapping, Sequence
+from datetime import datetime, timezone
+import heapq
+from typing import Any
+
+
+def parse_time(value: str | None) -> datetime | None:
+    """Parse an API timestamp, None if missing or malformed."""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+
+def departure_time(departure: Mapping[str, Any]) -> datetime:
+    """Return the expected departure time used to order a board."""
+    value = departure.get("estimated_time") or departure.get("planned_time")
+    # Unknown times go last
+    return parse_time(value) or datetime.max.replace(tzinfo=timezone.utc)
+
+
+def _stream(
+    gid: str, name: str, departures: list[dict[str, Any]]
+) -> Iterator[dict[str, Any]]:
+    """Yield one stop's departures in time order, tagged with the stop.
+
+    The API orders by planned time, so delays can leave a few items out of
+    place. Sorting an almost sorted list is a single linear pass.
+    """
+    for departure in sorted(departures, key=departure_time):
+        yield {**departure, "stop_gid": gid, "stop_name": name}
+
+
+def merge_departures(
+    stops: Sequence[tuple[str, str, list[dict[str, Any]]]],
+) -> list[dict[str, Any]]:
+    """Merge the departures of several stops into one time-ordered board.
+
+    ``stops`` holds (stop gid, stop name, departures) for each stop. Every
+    departure on the board is tagged with the stop it leaves from.
+    """
+    streams = [_stream(gid, name, departures) for gid, name, departures in stops]
+    seen: set[str] = set()
+    board: list[dict[str, Any]] = []
+    for departure in heapq.merge(*streams, key=departure_time):
+        if (journey := departure.get("journey_gid")) is not None:
+            if journey in seen:
+                continue
+            seen.add(journey)
+        board.append(departure)
+    return board
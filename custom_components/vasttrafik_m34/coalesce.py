@@ -0,0 +1,63 @@
+"""Single-flight coalescing of departures fetches for Västtrafik M34.
+
+Dashboards and automations calling ``homeassistant.update_entity`` at the
+same moment would otherwise each trigger an identical departures request for
+the same stop area. Concurrent fetches for one key share a single in-flight
+request instead.
+"""
+from __future__ import annotations
+
+import asyncio
+from collections import Counter
+from collections.abc import Awaitable, Callable
+from typing import Any, TypeVar
+
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+
+_T = TypeVar("_T")
+
+
+class SingleFlight:
+    """Run at most one fetch per key at a time and share its result."""
+
+    def __init__(self) -> None:
+        """Initialize the single-flight group."""
+        self._inflight: dict[str, asyncio.Future[Any]] = {}
+        self.coalesced: Counter[str] = Counter()
+
+    async def run(self, key: str, fetch: Callable[[], Awaitable[_T]]) -> _T:
+        """Return the result of ``fetch``, joining a fetch already running.
+
+        The shared fetch is shielded, so a cancelled caller does not cancel
+        it for the others that joined.
+        """
+        if (future := self._inflight.get(key)) is not None:
+            self.coalesced[key] += 1
+            return await asyncio.shield(future)
+
+        future = asyncio.ensure_future(fetch())
+        self._inflight[key] = future
+
+        def _done(finished: asyncio.Future[Any]) -> None:
+            if self._inflight.get(key) is finished:
+                del self._inflight[key]
+            # Nobody may be left awaiting it; mark the exception as seen
+            if not finished.cancelled():
+                finished.exception()
+
+        future.add_done_callback(_done)
+        return await asyncio.shield(future)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the state for diagnostics."""
+        return {"in_flight": sorted(self._inflight), "coalesced": dict(self.coalesced)}
+
+
+def async_get_single_flight(hass: HomeAssistant) -> SingleFlight:
+    """Return the single-flight group shared by all entries."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if (group := domain_data.get("single_flight")) is None:
+        group = domain_data["single_flight"] = SingleFlight()
+    return group
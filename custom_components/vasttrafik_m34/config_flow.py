@@ -1,74 +1,96 @@
 """Config flow for Västtrafik M34 integration."""
 from __future__ import annotations
 
-import base64
+import asyncio
 import logging
+import os
+import re
 from typing import Any
 
 import aiohttp
 import voluptuous as vol
 
 from homeassistant import config_entries
-from homeassistant.core import HomeAssistant
+from homeassistant.components import persistent_notification
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.data_entry_flow import FlowResult
 from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import selector
 
-from .const import DOMAIN
+from .auth import TokenManager, TokenRequestFailed, async_get_token_manager
+from .const import (
+    ATTRIBUTE_FORMAT_COLUMNAR,
+    ATTRIBUTE_FORMAT_JSON,
+    API_BASE,
+    BULK_IMPORT_CONCURRENCY,
+    CONF_ATTRIBUTE_BYTES,
+    CONF_ATTRIBUTE_FORMAT,
+    CONF_DAILY_REQUEST_BUDGET,
+    CONF_DESTINATION,
+    CONF_DIRECTION_GID,
+    CONF_EXTRA_AUTH_KEYS,
+    CONF_HEDGE_BUDGET,
+    CONF_IDLE_INTERVAL,
+    CONF_LEGACY_DEPARTURES,
+    CONF_LINES,
+    CONF_MAX_DEPARTURES,
+    CONF_MAX_INFERRED_AGE,
+    CONF_MIN_REFRESH_SPACING,
+    CONF_MQTT_TOPIC,
+    CONF_POLL_CONDITIONS,
+    CONF_POLL_WHEN_VIEWED,
+    CONF_PUNCTUALITY_STATISTICS,
+    CONF_SHARED_CACHE_DIR,
+    CONF_STATION_GIDS,
+    CONF_STATION_NAMES,
+    CONF_TIMETABLE_SNAPSHOT,
+    DEFAULT_ATTRIBUTE_BYTES,
+    DEFAULT_ATTRIBUTE_FORMAT,
+    DEFAULT_DAILY_REQUEST_BUDGET,
+    DEFAULT_DESTINATION,
+    DEFAULT_DIRECTION_GID,
+    DEFAULT_EXTRA_AUTH_KEYS,
+    DEFAULT_HEDGE_BUDGET,
+    DEFAULT_IDLE_INTERVAL,
+    DEFAULT_LEGACY_DEPARTURES,
+    DEFAULT_LINES,
+    DEFAULT_MAX_DEPARTURES,
+    DEFAULT_MAX_INFERRED_AGE,
+    DEFAULT_MIN_REFRESH_SPACING,
+    DEFAULT_MQTT_TOPIC,
+    DEFAULT_POLL_WHEN_VIEWED,
+    DEFAULT_PUNCTUALITY_STATISTICS,
+    DEFAULT_SHARED_CACHE_DIR,
+    DEFAULT_NEARBY_COUNT,
+    DEFAULT_TIMETABLE_SNAPSHOT,
+    DOMAIN,
+    SEARCH_LIMIT,
+)
+from .credentials import parse_auth_keys
+from .resilience import REQUEST_TIMEOUT
+from .stop_cache import async_get_stop_cache, normalize_query
+from .stop_index import async_get_stop_index
+from .vasttrafik_api import (
+    ApiError,
+    AuthenticationError,
+    VasttrafikError,
+    async_search_stop_areas,
+)
 
 _LOGGER = logging.getLogger(__name__)
 
-# OAuth2 Configuration
-TOKEN_URL = "https://ext-api.vasttrafik.se/token"
-API_BASE = "https://ext-api.vasttrafik.se/pr/v4"
+CONF_ZONE = "zone"
+CONF_COUNT = "count"
+CONF_STATIONS = "stations"
+CONF_BOARD_NAME = "board_name"
 
-
-async def get_access_token(
-    hass: HomeAssistant, auth_key: str
-) -> tuple[str, int]:
-    """Get OAuth2 access token from Västtrafik API.
-    
-    Args:
-        hass: Home Assistant instance
-        auth_key: Base64 encoded client_id:client_secret (Authentication Key from portal)
-    
-    Returns:
-        Tuple of (access_token, expires_in_seconds)
-    """
-    headers = {
-        "Authorization": f"Basic {auth_key}",
-        "Content-Type": "application/x-www-form-urlencoded",
-    }
-    
-    data = {"grant_type": "client_credentials"}
-    
-    try:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(TOKEN_URL, headers=headers, data=data) as response:
-                if response.status != 200:
-                    error_text = await response.text()
-                    _LOGGER.error("Token request failed: %s - %s", response.status, error_text)
-                    raise CannotConnect(f"Failed to get access token: {response.status}")
-                
-                result = await response.json()
-                return result["access_token"], result.get("expires_in", 86400)
-    except aiohttp.ClientError as ex:
-        _LOGGER.error("Network error during token request: %s", ex)
-        raise CannotConnect(f"Network error: {ex}") from ex
-
-
-async def validate_auth_key(hass: HomeAssistant, auth_key: str) -> bool:
-    """Validate the authentication key by attempting to get an access token."""
-    try:
-        token, _ = await get_access_token(hass, auth_key)
-        return token is not None and len(token) > 0
-    except Exception as ex:
-        _LOGGER.error("Failed to validate authentication key: %s", ex)
-        return False
+# Stop area GIDs are 16 digits, e.g. 9021014001760000
+GID_PATTERN = re.compile(r"^\d{16}$")
 
 
 async def search_stations(
     hass: HomeAssistant, access_token: str, query: str
-) -> list[dict[str, str]]:
+) -> list[dict[str, Any]]:
     """Search for stations using the Västtrafik API v4.
     
     Args:
@@ -77,48 +99,93 @@ async def search_stations(
         query: Search query string
     
     Returns:
-        List of station dictionaries with 'gid', 'name', and 'type'
+        List of station dictionaries with 'gid', 'name', 'type', 'latitude'
+        and 'longitude'
     """
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-    }
+    try:
+        async with aiohttp.ClientSession(timeout=REQUEST_TIMEOUT) as session:
+            stations = await async_search_stop_areas(
+                session, access_token, query, SEARCH_LIMIT, api_base=API_BASE
+            )
+    except AuthenticationError as ex:
+        raise InvalidAuth("Access token expired or invalid") from ex
+    except ApiError as ex:
+        _LOGGER.error("Station search failed: %s - %s", ex.status, ex.text)
+        raise CannotConnect(f"Failed to search stations: {ex.status}") from ex
+    except (aiohttp.ClientError, asyncio.TimeoutError) as ex:
+        _LOGGER.error("Network error during station search: %s", ex)
+        raise CannotConnect(f"Network error: {ex!r}") from ex
+    return [{**station, "type": "StopArea"} for station in stations]
+
+
+async def async_search_stations_cached(
+    hass: HomeAssistant, access_token: str, query: str
+) -> list[dict[str, Any]]:
+    """Search for stations, answering from the stop-area cache when possible."""
+    cache = await async_get_stop_cache(hass)
+    if (cached := cache.async_lookup(query)) is not None:
+        return [{**stop, "type": "StopArea"} for stop in cached]
     
-    params = {
-        "q": query,
-        "limit": 10,
-        "types": "stoparea",  # Only search for stop areas
-    }
+    stations = await search_stations(hass, access_token, query)
+    cache.async_store(
+        query,
+        [
+            {
+                "gid": station["gid"],
+                "name": station["name"],
+                "latitude": station["latitude"],
+                "longitude": station["longitude"],
+            }
+            for station in stations
+        ],
+        complete=len(stations) < SEARCH_LIMIT,
+    )
+    return stations
+
+
+async def async_resolve_stations(
+    hass: HomeAssistant, access_token: str, items: list[str]
+) -> tuple[list[dict[str, Any]], list[str]]:
+    """Resolve station names or GIDs concurrently with bounded parallelism.
     
-    url = f"{API_BASE}/locations/by-text"
+    Returns the resolved stations and the items that could not be resolved.
+    """
+    cache = await async_get_stop_cache(hass)
+    semaphore = asyncio.Semaphore(BULK_IMPORT_CONCURRENCY)
     
-    try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, headers=headers, params=params) as response:
-                if response.status == 401:
-                    raise InvalidAuth("Access token expired or invalid")
-                if response.status != 200:
-                    error_text = await response.text()
-                    _LOGGER.error("Station search failed: %s - %s", response.status, error_text)
-                    raise CannotConnect(f"Failed to search stations: {response.status}")
-                
-                result = await response.json()
-                
-                # Parse the results from API v4
-                stations = []
-                results_list = result.get("results", [])
-                
-                for location in results_list:
-                    if location.get("locationType") == "stoparea":
-                        stations.append({
-                            "gid": location.get("gid"),
-                            "name": location.get("name"),
-                            "type": "StopArea",
-                        })
-                
-                return stations
-    except aiohttp.ClientError as ex:
-        _LOGGER.error("Network error during station search: %s", ex)
-        raise CannotConnect(f"Network error: {ex}") from ex
+    async def _resolve(item: str) -> dict[str, Any] | None:
+        if GID_PATTERN.match(item) and (stop := cache.async_get_stop(item)):
+            return dict(stop)
+        async with semaphore:
+            try:
+                stations = await async_search_stations_cached(hass, access_token, item)
+            except (CannotConnect, InvalidAuth) as ex:
+                _LOGGER.warning("Could not resolve station %s: %s", item, ex)
+                return None
+        if GID_PATTERN.match(item):
+            return next((s for s in stations if s["gid"] == item), None)
+        # Prefer an exact name match over the search ranking
+        wanted = normalize_query(item)
+        return next(
+            (s for s in stations if normalize_query(s["name"]) == wanted),
+            stations[0] if stations else None,
+        )
+    
+    results = await asyncio.gather(*(_resolve(item) for item in items))
+    resolved: dict[str, dict[str, Any]] = {}
+    unresolved: list[str] = []
+    for item, station in zip(items, results):
+        if station is None:
+            unresolved.append(item)
+        else:
+            resolved.setdefault(station["gid"], station)
+    return list(resolved.values()), unresolved
+
+
+def parse_station_list(text: str) -> list[str]:
+    """Split a pasted list of names or GIDs on lines and semicolons."""
+    items = (part.strip() for line in text.splitlines() for part in line.split(";"))
+    return list(dict.fromkeys(item for item in items if item))
 
 
 class VasttrafikM34ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
@@ -130,7 +197,16 @@ class VasttrafikM34ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         """Initialize the config flow."""
         self._auth_key: str | None = None
         self._access_token: str | None = None
-        self._stations: list[dict[str, str]] = []
+        self._token_manager: TokenManager | None = None
+        self._stations: list[dict[str, Any]] = []
+
+    @staticmethod
+    @callback
+    def async_get_options_flow(
+        config_entry: config_entries.ConfigEntry,
+    ) -> VasttrafikM34OptionsFlow:
+        """Get the options flow for this handler."""
+        return VasttrafikM34OptionsFlow()
 
     async def async_step_user(
         self, user_input: dict[str, Any] | None = None
@@ -145,44 +221,34 @@ class VasttrafikM34ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             existing_auth_key = existing_entries[0].data.get("auth_key")
             if existing_auth_key:
                 try:
-                    # Validate the existing auth key
-                    is_valid = await validate_auth_key(self.hass, existing_auth_key)
-                    if is_valid:
-                        # Reuse existing auth key
-                        self._auth_key = existing_auth_key
-                        self._access_token, _ = await get_access_token(
-                            self.hass, self._auth_key
-                        )
-                        # Skip to station search directly
-                        return await self.async_step_station()
+                    # Reuse the token the running entries already hold
+                    self._token_manager = await async_get_token_manager(
+                        self.hass, existing_auth_key
+                    )
+                    self._access_token = await self._token_manager.async_get_token()
+                    self._auth_key = existing_auth_key
+                    # Skip to station search directly
+                    return await self.async_step_station_menu()
                 except Exception:
                     # If validation fails, continue to ask for auth_key
                     pass
 
         if user_input is not None:
             try:
-                # Validate authentication key
-                is_valid = await validate_auth_key(
-                    self.hass,
-                    user_input["auth_key"],
+                # Validate authentication key by getting a token
+                self._token_manager = await async_get_token_manager(
+                    self.hass, user_input["auth_key"]
                 )
-                
-                if not is_valid:
-                    raise InvalidAuth("Invalid authentication key")
-                
-                # Store auth key and get token
+                self._access_token = await self._token_manager.async_get_token()
                 self._auth_key = user_input["auth_key"]
-                self._access_token, _ = await get_access_token(
-                    self.hass, self._auth_key
-                )
                 
                 # Move to station search step
-                return await self.async_step_station()
+                return await self.async_step_station_menu()
                 
-            except CannotConnect:
-                errors["base"] = "cannot_connect"
-            except InvalidAuth:
+            except TokenRequestFailed:
                 errors["base"] = "invalid_auth"
+            except (aiohttp.ClientError, asyncio.TimeoutError, HomeAssistantError):
+                errors["base"] = "cannot_connect"
             except Exception:  # pylint: disable=broad-except
                 _LOGGER.exception("Unexpected exception")
                 errors["base"] = "unknown"
@@ -200,6 +266,251 @@ class VasttrafikM34ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             },
         )
 
+    async def async_step_station_menu(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Let the user search by name or pick a stop near a zone."""
+        return self.async_show_menu(
+            step_id="station_menu",
+            menu_options=["station", "nearby", "bulk", "combined"],
+        )
+
+    async def async_step_nearby(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Offer the stop areas closest to a zone from the offline index."""
+        errors: dict[str, str] = {}
+
+        if user_input is not None:
+            zone = self.hass.states.get(user_input[CONF_ZONE])
+            if zone is None or "latitude" not in zone.attributes:
+                errors["base"] = "invalid_zone"
+            else:
+                try:
+                    index = await async_get_stop_index(self.hass)
+                    if index.expired:
+                        try:
+                            # The list covers the area around home, refreshed rarely
+                            await index.async_refresh(
+                                self._access_token,
+                                self.hass.config.latitude,
+                                self.hass.config.longitude,
+                            )
+                        except (
+                            aiohttp.ClientError,
+                            asyncio.TimeoutError,
+                            VasttrafikError,
+                        ):
+                            if not index.loaded:
+                                raise
+                            _LOGGER.warning("Could not refresh stop list, using stored list")
+                    nearest = index.async_nearest(
+                        zone.attributes["latitude"],
+                        zone.attributes["longitude"],
+                        user_input[CONF_COUNT],
+                    )
+                except (aiohttp.ClientError, asyncio.TimeoutError, VasttrafikError):
+                    errors["base"] = "cannot_connect"
+                except Exception:  # pylint: disable=broad-except
+                    _LOGGER.exception("Unexpected exception during nearby search")
+                    errors["base"] = "unknown"
+                else:
+                    if not nearest:
+                        errors["base"] = "no_stations_found"
+                    else:
+                        cache = await async_get_stop_cache(self.hass)
+                        cache.async_add_stops([stop for _, stop in nearest])
+                        self._stations = [
+                            {
+                                **stop,
+                                "type": "StopArea",
+                                "label": f"{stop['name']} ({distance:.0f} m)",
+                            }
+                            for distance, stop in nearest
+                        ]
+                        return await self.async_step_select_station()
+
+        return self.async_show_form(
+            step_id="nearby",
+            data_schema=vol.Schema(
+                {
+                    vol.Required(CONF_ZONE, default="zone.home"): selector.EntitySelector(
+                        selector.EntitySelectorConfig(domain="zone")
+                    ),
+                    vol.Required(CONF_COUNT, default=DEFAULT_NEARBY_COUNT): vol.All(
+                        vol.Coerce(int), vol.Range(min=1, max=25)
+                    ),
+                }
+            ),
+            errors=errors,
+        )
+
+    async def async_step_bulk(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Add many stations at once from a list of names or GIDs."""
+        errors: dict[str, str] = {}
+
+        if user_input is not None:
+            items = parse_station_list(user_input[CONF_STATIONS])
+            if not items:
+                errors["base"] = "no_stations_found"
+            else:
+                added, unresolved = await self._async_import_stations(items)
+                return self.async_abort(
+                    reason="bulk_import_done",
+                    description_placeholders={
+                        "added": str(added),
+                        "unresolved": ", ".join(unresolved) or "-",
+                    },
+                )
+
+        return self.async_show_form(
+            step_id="bulk",
+            data_schema=vol.Schema(
+                {
+                    vol.Required(CONF_STATIONS): selector.TextSelector(
+                        selector.TextSelectorConfig(multiline=True)
+                    ),
+                }
+            ),
+            errors=errors,
+        )
+
+    async def async_step_combined(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Create one departure board for several nearby stop areas."""
+        errors: dict[str, str] = {}
+        placeholders = {"unresolved": "-"}
+
+        if user_input is not None:
+            items = parse_station_list(user_input[CONF_STATIONS])
+            stations, unresolved = await async_resolve_stations(
+                self.hass, self._access_token, items
+            )
+            if unresolved:
+                errors["base"] = "stations_not_found"
+                placeholders["unresolved"] = ", ".join(unresolved)
+            elif len(stations) < 2:
+                errors["base"] = "combined_needs_two"
+            else:
+                gids = [station["gid"] for station in stations]
+                await self.async_set_unique_id(
+                    "vasttrafik_combined_" + "_".join(sorted(gids))
+                )
+                self._abort_if_unique_id_configured()
+                return self.async_create_entry(
+                    title=user_input[CONF_BOARD_NAME],
+                    data={
+                        "auth_key": self._auth_key,
+                        "station_name": user_input[CONF_BOARD_NAME],
+                        CONF_STATION_GIDS: gids,
+                        CONF_STATION_NAMES: [station["name"] for station in stations],
+                    },
+                )
+
+        return self.async_show_form(
+            step_id="combined",
+            data_schema=vol.Schema(
+                {
+                    vol.Required(CONF_BOARD_NAME): str,
+                    vol.Required(CONF_STATIONS): selector.TextSelector(
+                        selector.TextSelectorConfig(multiline=True)
+                    ),
+                }
+            ),
+            errors=errors,
+            description_placeholders=placeholders,
+        )
+
+    async def async_step_import(self, import_data: dict[str, Any]) -> FlowResult:
+        """Import stations from YAML or from a bulk import.
+        
+        A single resolved station becomes an entry; a list of names or GIDs
+        (from configuration.yaml) is resolved and imported station by station.
+        """
+        if "station_gid" in import_data:
+            await self.async_set_unique_id(f"vasttrafik_{import_data['station_gid']}")
+            self._abort_if_unique_id_configured()
+            return self.async_create_entry(
+                title=import_data["station_name"],
+                data={
+                    "auth_key": import_data["auth_key"],
+                    "station_gid": import_data["station_gid"],
+                    "station_name": import_data["station_name"],
+                },
+            )
+
+        self._auth_key = import_data["auth_key"]
+        # Only resolve what is not configured yet, YAML is imported on every start
+        configured = {
+            value
+            for entry in self._async_current_entries()
+            for value in (
+                entry.data.get("station_gid"),
+                normalize_query(entry.data.get("station_name", "")),
+            )
+        }
+        items = [
+            item
+            for item in import_data[CONF_STATIONS]
+            if item not in configured and normalize_query(item) not in configured
+        ]
+        if not items:
+            return self.async_abort(reason="already_configured")
+
+        try:
+            self._token_manager = await async_get_token_manager(self.hass, self._auth_key)
+            self._access_token = await self._token_manager.async_get_token()
+        except TokenRequestFailed:
+            return self.async_abort(reason="invalid_auth")
+        except (aiohttp.ClientError, asyncio.TimeoutError, HomeAssistantError):
+            return self.async_abort(reason="cannot_connect")
+
+        added, unresolved = await self._async_import_stations(items)
+        if unresolved:
+            persistent_notification.async_create(
+                self.hass,
+                "Could not find these stations: " + ", ".join(unresolved),
+                title="Västtrafik M34 import",
+                notification_id=f"{DOMAIN}_import",
+            )
+        return self.async_abort(
+            reason="bulk_import_done",
+            description_placeholders={
+                "added": str(added),
+                "unresolved": ", ".join(unresolved) or "-",
+            },
+        )
+
+    async def _async_import_stations(self, items: list[str]) -> tuple[int, list[str]]:
+        """Resolve stations and start an import flow for each new one."""
+        stations, unresolved = await async_resolve_stations(
+            self.hass, self._access_token, items
+        )
+        configured = {
+            entry.unique_id for entry in self._async_current_entries()
+        }
+        new_stations = [
+            station
+            for station in stations
+            if f"vasttrafik_{station['gid']}" not in configured
+        ]
+        for station in new_stations:
+            self.hass.async_create_task(
+                self.hass.config_entries.flow.async_init(
+                    DOMAIN,
+                    context={"source": config_entries.SOURCE_IMPORT},
+                    data={
+                        "auth_key": self._auth_key,
+                        "station_gid": station["gid"],
+                        "station_name": station["name"],
+                    },
+                )
+            )
+        return len(new_stations), unresolved
+
     async def async_step_station(
         self, user_input: dict[str, Any] | None = None
     ) -> FlowResult:
@@ -210,7 +521,7 @@ class VasttrafikM34ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             if "station_name" in user_input and user_input["station_name"]:
                 # User wants to search for stations
                 try:
-                    self._stations = await search_stations(
+                    self._stations = await async_search_stations_cached(
                         self.hass, self._access_token, user_input["station_name"]
                     )
                     
@@ -223,6 +534,9 @@ class VasttrafikM34ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                 except CannotConnect:
                     errors["base"] = "cannot_connect"
                 except InvalidAuth:
+                    # The cached token may have been revoked, get a new one next time
+                    if self._token_manager is not None:
+                        self._token_manager.invalidate()
                     errors["base"] = "invalid_auth"
                 except Exception:  # pylint: disable=broad-except
                     _LOGGER.exception("Unexpected exception during station search")
@@ -273,7 +587,7 @@ class VasttrafikM34ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
 
         # Create station selector options
         station_options = {
-            station["gid"]: station["name"]
+            station["gid"]: station.get("label", station["name"])
             for station in self._stations
         }
 
@@ -288,6 +602,166 @@ class VasttrafikM34ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         )
 
 
+class VasttrafikM34OptionsFlow(config_entries.OptionsFlow):
+    """Handle options for a Västtrafik M34 entry."""
+
+    async def async_step_init(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Manage the options."""
+        errors: dict[str, str] = {}
+        if user_input is not None:
+            shared_dir = user_input.get(CONF_SHARED_CACHE_DIR)
+            if shared_dir and not await self.hass.async_add_executor_job(
+                _is_writable_dir, shared_dir
+            ):
+                errors[CONF_SHARED_CACHE_DIR] = "invalid_directory"
+            direction_gid = user_input.get(CONF_DIRECTION_GID)
+            if direction_gid and not GID_PATTERN.match(direction_gid):
+                errors[CONF_DIRECTION_GID] = "invalid_stop_area"
+        if user_input is not None and not errors:
+            try:
+                # Every extra key must be able to get a token
+                for auth_key in parse_auth_keys(user_input.get(CONF_EXTRA_AUTH_KEYS)):
+                    manager = await async_get_token_manager(self.hass, auth_key)
+                    await manager.async_get_token()
+            except TokenRequestFailed:
+                errors["base"] = "invalid_auth"
+            except (aiohttp.ClientError, asyncio.TimeoutError, HomeAssistantError):
+                errors["base"] = "cannot_connect"
+            else:
+                return self.async_create_entry(title="", data=user_input)
+
+        options = user_input or self.config_entry.options
+        return self.async_show_form(
+            step_id="init",
+            data_schema=vol.Schema(
+                {
+                    vol.Required(
+                        CONF_DAILY_REQUEST_BUDGET,
+                        default=options.get(
+                            CONF_DAILY_REQUEST_BUDGET, DEFAULT_DAILY_REQUEST_BUDGET
+                        ),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=100)),
+                    vol.Optional(
+                        CONF_EXTRA_AUTH_KEYS,
+                        default=options.get(
+                            CONF_EXTRA_AUTH_KEYS, DEFAULT_EXTRA_AUTH_KEYS
+                        ),
+                    ): selector.TextSelector(
+                        selector.TextSelectorConfig(multiline=True)
+                    ),
+                    vol.Required(
+                        CONF_HEDGE_BUDGET,
+                        default=options.get(CONF_HEDGE_BUDGET, DEFAULT_HEDGE_BUDGET),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=0, max=25)),
+                    vol.Required(
+                        CONF_MIN_REFRESH_SPACING,
+                        default=options.get(
+                            CONF_MIN_REFRESH_SPACING, DEFAULT_MIN_REFRESH_SPACING
+                        ),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=0, max=600)),
+                    vol.Required(
+                        CONF_MAX_INFERRED_AGE,
+                        default=options.get(
+                            CONF_MAX_INFERRED_AGE, DEFAULT_MAX_INFERRED_AGE
+                        ),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=0, max=900)),
+                    vol.Required(
+                        CONF_TIMETABLE_SNAPSHOT,
+                        default=options.get(
+                            CONF_TIMETABLE_SNAPSHOT, DEFAULT_TIMETABLE_SNAPSHOT
+                        ),
+                    ): bool,
+                    vol.Optional(
+                        CONF_POLL_CONDITIONS,
+                        default=options.get(CONF_POLL_CONDITIONS, []),
+                    ): selector.EntitySelector(
+                        selector.EntitySelectorConfig(
+                            domain=["person", "zone", "input_boolean"],
+                            multiple=True,
+                        )
+                    ),
+                    vol.Required(
+                        CONF_POLL_WHEN_VIEWED,
+                        default=options.get(
+                            CONF_POLL_WHEN_VIEWED, DEFAULT_POLL_WHEN_VIEWED
+                        ),
+                    ): bool,
+                    vol.Required(
+                        CONF_IDLE_INTERVAL,
+                        default=options.get(CONF_IDLE_INTERVAL, DEFAULT_IDLE_INTERVAL),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=0, max=240)),
+                    vol.Optional(
+                        CONF_LINES,
+                        default=options.get(CONF_LINES, DEFAULT_LINES),
+                    ): str,
+                    vol.Optional(
+                        CONF_DESTINATION,
+                        default=options.get(CONF_DESTINATION, DEFAULT_DESTINATION),
+                    ): str,
+                    vol.Optional(
+                        CONF_DIRECTION_GID,
+                        default=options.get(
+                            CONF_DIRECTION_GID, DEFAULT_DIRECTION_GID
+                        ),
+                    ): str,
+                    vol.Required(
+                        CONF_MAX_DEPARTURES,
+                        default=options.get(
+                            CONF_MAX_DEPARTURES, DEFAULT_MAX_DEPARTURES
+                        ),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=1, max=50)),
+                    vol.Required(
+                        CONF_ATTRIBUTE_FORMAT,
+                        default=options.get(
+                            CONF_ATTRIBUTE_FORMAT, DEFAULT_ATTRIBUTE_FORMAT
+                        ),
+                    ): selector.SelectSelector(
+                        selector.SelectSelectorConfig(
+                            options=[ATTRIBUTE_FORMAT_JSON, ATTRIBUTE_FORMAT_COLUMNAR],
+                            translation_key=CONF_ATTRIBUTE_FORMAT,
+                        )
+                    ),
+                    vol.Required(
+                        CONF_ATTRIBUTE_BYTES,
+                        default=options.get(
+                            CONF_ATTRIBUTE_BYTES, DEFAULT_ATTRIBUTE_BYTES
+                        ),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=0, max=16384)),
+                    vol.Required(
+                        CONF_LEGACY_DEPARTURES,
+                        default=options.get(
+                            CONF_LEGACY_DEPARTURES, DEFAULT_LEGACY_DEPARTURES
+                        ),
+                    ): bool,
+                    vol.Required(
+                        CONF_PUNCTUALITY_STATISTICS,
+                        default=options.get(
+                            CONF_PUNCTUALITY_STATISTICS, DEFAULT_PUNCTUALITY_STATISTICS
+                        ),
+                    ): bool,
+                    vol.Optional(
+                        CONF_MQTT_TOPIC,
+                        default=options.get(CONF_MQTT_TOPIC, DEFAULT_MQTT_TOPIC),
+                    ): str,
+                    vol.Optional(
+                        CONF_SHARED_CACHE_DIR,
+                        default=options.get(
+                            CONF_SHARED_CACHE_DIR, DEFAULT_SHARED_CACHE_DIR
+                        ),
+                    ): str,
+                }
+            ),
+            errors=errors,
+        )
+
+
+def _is_writable_dir(path: str) -> bool:
+    """Return True if path is a directory this process can write to."""
+    return os.path.isdir(path) and os.access(path, os.W_OK)
+
+
 class CannotConnect(HomeAssistantError):
     """Error to indicate we cannot connect."""
 
@@ -1,3 +1,146 @@
 """Constants for the Västtrafik M34 integration."""
+from datetime import timedelta
 
 DOMAIN = "vasttrafik_m34"
+
+# API
+TOKEN_URL = "https://ext-api.vasttrafik.se/token"
+API_BASE = "https://ext-api.vasttrafik.se/pr/v4"
+TS_API_BASE = "https://ext-api.vasttrafik.se/ts/v1"
+SEARCH_LIMIT = 10
+BULK_IMPORT_CONCURRENCY = 4
+
+# Combined boards list several stop areas in one entry
+CONF_STATION_GIDS = "station_gids"
+CONF_STATION_NAMES = "station_names"
+
+# Polling
+SCAN_INTERVAL = timedelta(minutes=1)
+MAX_SCAN_INTERVAL = timedelta(minutes=30)
+
+# Request quota
+CONF_DAILY_REQUEST_BUDGET = "daily_request_budget"
+DEFAULT_DAILY_REQUEST_BUDGET = 10000
+# Extra Authentication Keys whose quotas are pooled with the entry's own
+CONF_EXTRA_AUTH_KEYS = "extra_auth_keys"
+DEFAULT_EXTRA_AUTH_KEYS = ""
+# Share of the daily budget kept back for stations that have no data yet
+QUOTA_RESERVE_FRACTION = 0.02
+# Relative polling weight per local hour; rush hours get more of the budget
+TIME_OF_DAY_WEIGHTS = (
+    0.2, 0.1, 0.1, 0.1, 0.2, 0.5,  # 00-05
+    1.0, 1.5, 1.5, 1.0, 0.8, 0.8,  # 06-11
+    0.8, 0.8, 1.0, 1.5, 1.5, 1.5,  # 12-17
+    1.0, 0.8, 0.6, 0.5, 0.4, 0.3,  # 18-23
+)
+
+# Request layer
+BACKOFF_BASE_SECONDS = 30
+BACKOFF_MAX_SECONDS = 900
+BREAKER_FAILURE_THRESHOLD = 3
+BREAKER_RECOVERY_SECONDS = 120
+CONNECT_TIMEOUT_SECONDS = 5
+FIRST_BYTE_TIMEOUT_SECONDS = 10
+TOTAL_TIMEOUT_SECONDS = 20
+
+# Request hedging
+CONF_HEDGE_BUDGET = "hedge_budget"
+DEFAULT_HEDGE_BUDGET = 0
+HEDGE_MIN_SAMPLES = 20
+HEDGE_MIN_DELAY_SECONDS = 0.5
+
+# Cross-station journey inference, 0 disables it
+CONF_MAX_INFERRED_AGE = "max_inferred_age"
+DEFAULT_MAX_INFERRED_AGE = 0
+# Share of a station's departures that must be seen upstream to skip a fetch
+INFERENCE_MIN_COVERAGE = 0.5
+
+# Manual refreshes
+CONF_MIN_REFRESH_SPACING = "min_refresh_spacing"
+DEFAULT_MIN_REFRESH_SPACING = 30
+
+# Polling conditions, a station without any always polls
+CONF_POLL_CONDITIONS = "poll_conditions"
+CONF_POLL_WHEN_VIEWED = "poll_when_viewed"
+DEFAULT_POLL_WHEN_VIEWED = False
+# Minutes between refreshes while no condition holds, 0 stops polling
+CONF_IDLE_INTERVAL = "idle_interval"
+DEFAULT_IDLE_INTERVAL = 30
+
+# Stop-area search cache
+STOP_CACHE_TTL = timedelta(days=7)
+STOP_CACHE_MAX_QUERIES = 200
+STOP_CACHE_MAX_STOPS = 2000
+
+# Offline stop-area index
+STOP_INDEX_TTL = timedelta(days=30)
+STOP_INDEX_RADIUS_METERS = 100_000
+STOP_INDEX_PAGE_SIZE = 1000
+DEFAULT_NEARBY_COUNT = 10
+
+# Journey details, fetched on demand and kept until the journey has ended
+JOURNEY_CACHE_SIZE = 64
+# Realtime estimates along the route are refreshed at least this often
+JOURNEY_DETAILS_TTL = timedelta(minutes=2)
+
+# Traffic situations, one shared feed per auth key
+SITUATIONS_TTL = timedelta(minutes=15)
+
+# Departure attributes
+CONF_ATTRIBUTE_FORMAT = "attribute_format"
+ATTRIBUTE_FORMAT_JSON = "json"
+ATTRIBUTE_FORMAT_COLUMNAR = "columnar"
+DEFAULT_ATTRIBUTE_FORMAT = ATTRIBUTE_FORMAT_JSON
+# Size limit of a sensor's attributes in bytes, 0 for no limit
+CONF_ATTRIBUTE_BYTES = "attribute_bytes"
+DEFAULT_ATTRIBUTE_BYTES = 0
+CONF_LEGACY_DEPARTURES = "legacy_departures"
+DEFAULT_LEGACY_DEPARTURES = True
+
+# Departure filters. The direction stop area is sent to the API as
+# directionGid, lines, destination and count only change what is shown.
+CONF_LINES = "lines"
+DEFAULT_LINES = ""
+CONF_DESTINATION = "destination"
+DEFAULT_DESTINATION = ""
+CONF_DIRECTION_GID = "direction_gid"
+DEFAULT_DIRECTION_GID = ""
+CONF_MAX_DEPARTURES = "max_departures"
+DEFAULT_MAX_DEPARTURES = 15
+
+# Punctuality statistics per line, written hourly to long-term statistics
+CONF_PUNCTUALITY_STATISTICS = "punctuality_statistics"
+DEFAULT_PUNCTUALITY_STATISTICS = False
+
+# MQTT output, an empty base topic disables it
+CONF_MQTT_TOPIC = "mqtt_topic"
+DEFAULT_MQTT_TOPIC = ""
+
+# Directory of a departures and token cache shared with other Home
+# Assistant instances, empty disables it
+CONF_SHARED_CACHE_DIR = "shared_cache_dir"
+DEFAULT_SHARED_CACHE_DIR = ""
+
+# Server-Sent Events boards for kiosk displays
+SSE_KEEPALIVE_SECONDS = 30
+
+# Planned timetable snapshot with realtime-only polling
+CONF_TIMETABLE_SNAPSHOT = "timetable_snapshot"
+DEFAULT_TIMETABLE_SNAPSHOT = False
+TIMETABLE_DAY_START_HOUR = 4
+TIMETABLE_CHUNK_MINUTES = 180
+TIMETABLE_PAGE_SIZE = 100
+TIMETABLE_REALTIME_MINUTES = 20
+DEPARTURES_WINDOW_MINUTES = 60
+
+# Options that change what an entry is built from; all others are applied
+# to the running entry without a reload
+RELOAD_OPTIONS = frozenset(
+    {
+        CONF_EXTRA_AUTH_KEYS,
+        CONF_MQTT_TOPIC,
+        CONF_PUNCTUALITY_STATISTICS,
+        CONF_SHARED_CACHE_DIR,
+        CONF_TIMETABLE_SNAPSHOT,
+    }
+)
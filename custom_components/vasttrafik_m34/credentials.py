@@ -0,0 +1,219 @@
+"""Credential pools for the Västtrafik M34 integration.
+
+An entry can be given extra Authentication Keys on top of the one it was
+created with. Each key keeps its own token manager and quota planner, so the
+daily budgets add up: departures requests go to the healthy key with the
+most requests left, and the polling interval is planned from the combined
+rate of all healthy keys. A key whose token is refused or that keeps
+getting throttled is taken out of rotation for a while.
+"""
+from __future__ import annotations
+
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+import logging
+import re
+import time
+from typing import Any
+
+from homeassistant.core import HomeAssistant, callback
+
+from .auth import TokenManager, async_get_token_manager
+from .const import MAX_SCAN_INTERVAL, SCAN_INTERVAL
+from .quota import QuotaPlanner, async_get_planner, project_exhaustion
+
+_LOGGER = logging.getLogger(__name__)
+
+# Consecutive credential failures before a key leaves the rotation
+CREDENTIAL_FAILURE_THRESHOLD = 3
+
+# How long a failing key stays out of the rotation
+CREDENTIAL_COOLDOWN_SECONDS = 600
+
+
+def parse_auth_keys(value: str | None) -> list[str]:
+    """Return the keys of a whitespace or comma separated list."""
+    keys: list[str] = []
+    for key in re.split(r"[\s,]+", value or ""):
+        if key and key not in keys:
+            keys.append(key)
+    return keys
+
+
+@dataclass
+class Credential:
+    """One Authentication Key with its token and quota accounting."""
+
+    token_manager: TokenManager
+    planner: QuotaPlanner
+    failures: int = 0
+    # Monotonic time the key may be used again, None while healthy
+    retry_at: float | None = None
+
+    @property
+    def key_id(self) -> str:
+        """Return the non-secret identifier of the key."""
+        return self.planner.key_id
+
+    @property
+    def healthy(self) -> bool:
+        """Return True if the key is in rotation."""
+        return self.retry_at is None or time.monotonic() >= self.retry_at
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the state for diagnostics."""
+        return {
+            "key_id": self.key_id,
+            "healthy": self.healthy,
+            "failures": self.failures,
+            "remaining": self.planner.remaining,
+            "used_today": self.planner.used,
+        }
+
+
+class CredentialPool:
+    """Route an entry's departures requests across its Authentication Keys."""
+
+    def __init__(self, credentials: list[Credential]) -> None:
+        """Initialize the pool, the first credential is the entry's own."""
+        self.credentials = credentials
+
+    @property
+    def primary(self) -> Credential:
+        """Return the credential the entry was created with."""
+        return self.credentials[0]
+
+    def _healthy(self) -> list[Credential]:
+        """Return the credentials in rotation, the primary if none is."""
+        return [cred for cred in self.credentials if cred.healthy] or [self.primary]
+
+    def select(self) -> Credential:
+        """Return the healthy credential with the most requests left."""
+        healthy = self._healthy()
+        allowed = [cred for cred in healthy if not cred.planner.degraded] or healthy
+        return max(allowed, key=lambda cred: cred.planner.remaining)
+
+    @callback
+    def record_success(self, credential: Credential) -> None:
+        """Put a credential that answered back into rotation."""
+        credential.failures = 0
+        credential.retry_at = None
+
+    @callback
+    def record_failure(self, credential: Credential) -> None:
+        """Count a refused or throttled request against a credential."""
+        credential.failures += 1
+        if (
+            len(self.credentials) == 1
+            or credential.failures < CREDENTIAL_FAILURE_THRESHOLD
+        ):
+            return
+        if credential.retry_at is None:
+            _LOGGER.warning(
+                "Auth key %s failed %s times in a row, leaving it out for %s minutes",
+                credential.key_id,
+                credential.failures,
+                CREDENTIAL_COOLDOWN_SECONDS // 60,
+            )
+        # Failing again after the cooldown starts another one
+        credential.retry_at = time.monotonic() + CREDENTIAL_COOLDOWN_SECONDS
+
+    @callback
+    def async_register(
+        self,
+        station_gid: str,
+        budget: int,
+        consumed: Callable[[], bool],
+        cost: int = 1,
+    ) -> Callable[[], None]:
+        """Register a station with every key, return the unregister callback."""
+        unsubs = [
+            cred.planner.async_register(station_gid, budget, consumed, cost=cost)
+            for cred in self.credentials
+        ]
+
+        @callback
+        def _unregister() -> None:
+            for unsub in unsubs:
+                unsub()
+
+        return _unregister
+
+    @callback
+    def async_update_budget(self, station_gid: str, budget: int) -> None:
+        """Change the daily budget of a station with every key."""
+        for cred in self.credentials:
+            cred.planner.async_update_budget(station_gid, budget)
+
+    @callback
+    def async_update_demand(self, station_gid: str, departures: int) -> None:
+        """Update the departure density of a station with every key."""
+        for cred in self.credentials:
+            cred.planner.async_update_demand(station_gid, departures)
+
+    @callback
+    def async_allow_request(self, has_data: bool) -> bool:
+        """Return True if any healthy key may spend a request now."""
+        return any(
+            cred.planner.async_allow_request(has_data) for cred in self._healthy()
+        )
+
+    def interval_for(self, station_gid: str) -> timedelta:
+        """Return the update interval from the combined rate of healthy keys."""
+        healthy = self._healthy()
+        if len(healthy) == 1:
+            return healthy[0].planner.interval_for(station_gid)
+        rate = sum(
+            1 / cred.planner.interval_for(station_gid).total_seconds()
+            for cred in healthy
+        )
+        interval = timedelta(seconds=1 / rate)
+        return max(SCAN_INTERVAL, min(interval, MAX_SCAN_INTERVAL))
+
+    @property
+    def daily_budget(self) -> int:
+        """Return the combined daily budget of every key."""
+        return sum(cred.planner.daily_budget for cred in self.credentials)
+
+    @property
+    def used(self) -> int:
+        """Return the requests made today with any key."""
+        return sum(cred.planner.used for cred in self.credentials)
+
+    @property
+    def remaining(self) -> int:
+        """Return the requests left today with any key."""
+        return sum(cred.planner.remaining for cred in self.credentials)
+
+    @property
+    def degraded(self) -> bool:
+        """Return True when every key is down to its reserve."""
+        return all(cred.planner.degraded for cred in self.credentials)
+
+    @property
+    def projected_exhaustion(self) -> datetime | None:
+        """Return when the keys run out at their combined request rate."""
+        return project_exhaustion(
+            self.remaining,
+            sum(cred.planner.hourly_rate for cred in self.credentials),
+        )
+
+    def as_dict(self) -> list[dict[str, Any]]:
+        """Return the state for diagnostics."""
+        return [cred.as_dict() for cred in self.credentials]
+
+
+async def async_get_credential_pool(
+    hass: HomeAssistant, auth_keys: list[str]
+) -> CredentialPool:
+    """Return a pool over the shared token managers and planners of keys."""
+    credentials = []
+    for auth_key in dict.fromkeys(auth_keys):
+        credentials.append(
+            Credential(
+                await async_get_token_manager(hass, auth_key),
+                await async_get_planner(hass, auth_key),
+            )
+        )
+    return CredentialPool(credentials)
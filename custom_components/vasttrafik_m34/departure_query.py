@@ -0,0 +1,109 @@
+"""Filtered departure lookups for the get_departures service.
+
+An entry's departures are indexed once per coordinator update: by line,
+with the estimated times parsed and the destinations case-folded. A lookup
+then only walks the departures of the requested line, so scripts and voice
+assistants asking for "the next 3 on line 6 towards Kortedala" are answered
+from memory without templates or a request.
+"""
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import datetime
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.core import HomeAssistant, callback
+
+from .board import parse_time
+from .const import DOMAIN
+from .subscription import compact_departure
+
+if TYPE_CHECKING:
+    from .sensor import VasttrafikDataUpdateCoordinator
+
+
+class DepartureIndex:
+    """One coordinator update's departures, indexed for lookups."""
+
+    def __init__(self, data: dict[str, Any] | None) -> None:
+        """Index the departures."""
+        # Kept to tell whether the coordinator has updated since
+        self.data = data
+        # (departure time, case-folded destination, compact departure)
+        self._rows: list[tuple[datetime | None, str, dict[str, Any]]] = []
+        self._by_line: dict[str, list[int]] = defaultdict(list)
+        for dep in (data or {}).get("departures", []):
+            compact = compact_departure(dep)
+            index = len(self._rows)
+            self._rows.append(
+                (
+                    parse_time(compact["estimated_time"]),
+                    compact["destination"].casefold(),
+                    compact,
+                )
+            )
+            for line in {dep.get("line_number"), dep.get("line_designation")}:
+                if line:
+                    self._by_line[line.casefold()].append(index)
+
+    def lookup(
+        self,
+        now: datetime,
+        line: str | None = None,
+        direction: str | None = None,
+        track: str | None = None,
+        limit: int | None = None,
+        until: datetime | None = None,
+    ) -> list[dict[str, Any]]:
+        """Return the upcoming departures matching every given filter.
+
+        ``direction`` matches part of the destination, ``line`` either the
+        line name or its designation, case-insensitively.
+        """
+        if line is not None:
+            indexes = self._by_line.get(line.casefold(), [])
+        else:
+            indexes = range(len(self._rows))
+        direction = direction.casefold() if direction else None
+        track = track.casefold() if track else None
+
+        found = []
+        for index in indexes:
+            departs, destination, compact = self._rows[index]
+            if departs is not None and (
+                departs < now or (until is not None and departs > until)
+            ):
+                continue
+            if direction and direction not in destination:
+                continue
+            if track and compact["track"].casefold() != track:
+                continue
+            minutes = (
+                max(int((departs - now).total_seconds() // 60), 0)
+                if departs is not None
+                else None
+            )
+            found.append({**compact, "minutes": minutes})
+            if limit is not None and len(found) >= limit:
+                break
+        return found
+
+
+@callback
+def async_get_index(
+    hass: HomeAssistant, entry_id: str, coordinator: VasttrafikDataUpdateCoordinator
+) -> DepartureIndex:
+    """Return an entry's current index, building it once per update."""
+    indexes: dict[str, DepartureIndex] = hass.data.setdefault(DOMAIN, {}).setdefault(
+        "departure_indexes", {}
+    )
+    index = indexes.get(entry_id)
+    if index is None or index.data is not coordinator.data:
+        index = indexes[entry_id] = DepartureIndex(coordinator.data)
+    return index
+
+
+@callback
+def async_drop_index(hass: HomeAssistant, entry_id: str) -> None:
+    """Drop an unloaded entry's index."""
+    hass.data.get(DOMAIN, {}).get("departure_indexes", {}).pop(entry_id, None)
@@ -0,0 +1,69 @@
+"""Diagnostics support for Västtrafik M34."""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.core import HomeAssistant
+
+from .const import CONF_EXTRA_AUTH_KEYS
+from .journey import async_get_journey_cache
+from .profiling import async_get_loop_lag_monitor
+from .resilience import async_get_request_layer
+
+if TYPE_CHECKING:
+    from . import VasttrafikConfigEntry
+
+TO_REDACT = {"auth_key", CONF_EXTRA_AUTH_KEYS}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: VasttrafikConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    coordinator = entry.runtime_data
+    planner = coordinator.planner
+
+    return {
+        "entry": {
+            "data": async_redact_data(dict(entry.data), TO_REDACT),
+            "options": async_redact_data(dict(entry.options), TO_REDACT),
+        },
+        "coordinator": {
+            "last_update_success": coordinator.last_update_success,
+            "update_interval_seconds": (
+                coordinator.update_interval.total_seconds()
+                if coordinator.update_interval is not None
+                else None
+            ),
+            "departure_count": len((coordinator.data or {}).get("departures", [])),
+            "latency": coordinator.latency.as_dict(),
+            "hedging": coordinator.hedge_budget.as_dict(),
+            "coalesced_refreshes": sum(
+                coordinator.single_flight.coalesced[gid]
+                for gid in coordinator.station_gids
+            ),
+            "refreshes_served_from_cache": coordinator.served_from_cache,
+            "inferred_refreshes": coordinator.inferred_refreshes,
+            "tracked_journeys": len(coordinator.journeys),
+            "polling": coordinator.gate.as_dict(),
+            "shared_cache": (
+                coordinator.shared_cache.as_dict()
+                if coordinator.shared_cache is not None
+                else None
+            ),
+            "refresh_timing": coordinator.refresh_timer.as_dict(),
+        },
+        "quota": {
+            "key_id": planner.key_id,
+            "daily_budget": planner.daily_budget,
+            "used_today": planner.used,
+            "remaining": planner.remaining,
+            "degraded": planner.degraded,
+            "credentials": coordinator.credentials.as_dict(),
+        },
+        "request_layer": async_get_request_layer(hass).as_dict(),
+        "journey_details": async_get_journey_cache(hass).as_dict(),
+        "traffic_situations": coordinator.situations.as_dict(),
+        "event_loop_lag_seconds": async_get_loop_lag_monitor(hass).as_dict(),
+    }
@@ -0,0 +1,138 @@
+"""Cross-station journey inference for Västtrafik M34.
+
+When several configured stations lie on the same line, the same service
+journey shows up in each station's departures. Every real departures fetch
+is recorded here per journey. A station can then bring its last fetched
+departures up to date from newer observations of the same journeys at
+upstream stations, instead of spending a request. A delay observed upstream
+carries over downstream; running early does not, since vehicles wait at
+timing points.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+import time
+from typing import Any
+
+from homeassistant.core import HomeAssistant
+from homeassistant.util import dt as dt_util
+
+from .board import departure_time, parse_time
+from .const import DOMAIN
+
+# Journeys whose last observed departure is older than this are forgotten
+JOURNEY_RETENTION = timedelta(hours=1)
+
+
+@dataclass(slots=True)
+class Observation:
+    """One journey as seen in one station's departures."""
+
+    planned: datetime
+    delay: timedelta
+    is_cancelled: bool
+    # time.monotonic() of the fetch
+    observed: float
+
+
+class JourneyTracker:
+    """Latest observation of each journey at each configured stop area."""
+
+    def __init__(self) -> None:
+        """Initialize the tracker."""
+        # journey gid -> stop area gid -> observation
+        self._journeys: dict[str, dict[str, Observation]] = {}
+
+    def __len__(self) -> int:
+        """Return the number of tracked journeys."""
+        return len(self._journeys)
+
+    def observe(self, station_gid: str, departures: list[dict[str, Any]]) -> None:
+        """Record the departures of a real fetch at a stop area."""
+        observed = time.monotonic()
+        for departure in departures:
+            journey = departure.get("journey_gid")
+            planned = parse_time(departure.get("planned_time"))
+            estimated = parse_time(departure.get("estimated_time"))
+            if journey is None or planned is None or estimated is None:
+                continue
+            self._journeys.setdefault(journey, {})[station_gid] = Observation(
+                planned=planned,
+                delay=estimated - planned,
+                is_cancelled=departure.get("is_cancelled", False),
+                observed=observed,
+            )
+        self._prune()
+
+    def _prune(self) -> None:
+        """Forget journeys that have left every tracked stop."""
+        cutoff = dt_util.utcnow() - JOURNEY_RETENTION
+        for journey in [
+            journey
+            for journey, stops in self._journeys.items()
+            if max(obs.planned + obs.delay for obs in stops.values()) < cutoff
+        ]:
+            del self._journeys[journey]
+
+    def _upstream(
+        self, journey: str, station_gid: str, planned: datetime, since: float
+    ) -> Observation | None:
+        """Return the newest observation made upstream after ``since``."""
+        best: Observation | None = None
+        for stop, obs in self._journeys.get(journey, {}).items():
+            if stop == station_gid or obs.observed <= since or obs.planned > planned:
+                continue
+            if best is None or obs.observed > best.observed:
+                best = obs
+        return best
+
+    def infer(
+        self,
+        station_gid: str,
+        departures: list[dict[str, Any]],
+        since: float,
+    ) -> tuple[list[dict[str, Any]], int]:
+        """Update a station's departures from newer upstream observations.
+
+        ``departures`` are the station's last fetched departures and
+        ``since`` the time of that fetch. Combined boards pass departures
+        tagged with ``stop_gid``, which then replaces ``station_gid``.
+        Returns the departures still to come and how many were updated.
+        """
+        now = dt_util.utcnow()
+        result: list[dict[str, Any]] = []
+        updated = 0
+        for departure in departures:
+            planned = parse_time(departure.get("planned_time"))
+            obs = None
+            if planned is not None and (journey := departure.get("journey_gid")):
+                obs = self._upstream(
+                    journey, departure.get("stop_gid", station_gid), planned, since
+                )
+            if obs is not None:
+                delay = max(obs.delay, timedelta(0))
+                estimated = planned + delay
+                departure = {
+                    **departure,
+                    "estimated_time": estimated.isoformat(),
+                    "delay_minutes": int(delay.total_seconds() / 60),
+                    "is_cancelled": departure.get("is_cancelled", False) or obs.is_cancelled,
+                    "is_realtime": True,
+                }
+                updated += 1
+            else:
+                estimated = parse_time(departure.get("estimated_time"))
+            if estimated is None or estimated >= now:
+                result.append(departure)
+        # A carried-over delay can move a departure past the next one
+        result.sort(key=departure_time)
+        return result, updated
+
+
+def async_get_journey_tracker(hass: HomeAssistant) -> JourneyTracker:
+    """Return the journey tracker shared by all entries."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if (tracker := domain_data.get("journey_tracker")) is None:
+        tracker = domain_data["journey_tracker"] = JourneyTracker()
+    return tracker
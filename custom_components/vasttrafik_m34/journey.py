@@ -0,0 +1,159 @@
+"""On-demand journey details for Västtrafik M34.
+
+The departures payload only references a departure's service journey. The
+stops along its route and the arrival times there are fetched when asked
+for, through the ``get_journey_details`` service or websocket command, and
+never during polling. Answers are cached per details reference until the
+journey has ended, with a short cap so realtime estimates stay current.
+"""
+from __future__ import annotations
+
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from datetime import datetime, timedelta
+import logging
+from typing import Any
+
+import aiohttp
+
+from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.util import dt as dt_util
+
+from .auth import TokenManager
+from .board import parse_time
+from .coalesce import SingleFlight
+from .const import API_BASE, DOMAIN, JOURNEY_CACHE_SIZE, JOURNEY_DETAILS_TTL
+from .quota import QuotaPlanner
+from .resilience import REQUEST_TIMEOUT, RequestLayer
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def parse_journey_details(result: dict[str, Any]) -> dict[str, Any]:
+    """Turn a journey details payload into the route with its calls."""
+    journeys = result.get("serviceJourneys") or [{}]
+    journey = journeys[0]
+    calls = []
+    for call in journey.get("callsOnServiceJourney", []):
+        stop_point = call.get("stopPoint", {})
+        stop_area = stop_point.get("stopArea", {})
+        platform = stop_point.get("platform", "")
+        calls.append({
+            "stop_name": stop_area.get("name") or stop_point.get("name", ""),
+            "stop_area_gid": stop_area.get("gid"),
+            "track": platform.get("name", "") if isinstance(platform, dict) else platform,
+            "planned_arrival": call.get("plannedArrivalTime"),
+            "estimated_arrival": call.get("estimatedArrivalTime"),
+            "planned_departure": call.get("plannedDepartureTime"),
+            "estimated_departure": call.get("estimatedDepartureTime"),
+            "is_cancelled": call.get("isCancelled", False),
+        })
+    line = journey.get("line", {})
+    return {
+        "journey_gid": journey.get("gid"),
+        "line": line.get("name", "?"),
+        "direction": journey.get("direction", ""),
+        "calls": calls,
+    }
+
+
+def journey_end(details: dict[str, Any]) -> datetime | None:
+    """Return when the journey reaches its last stop."""
+    if not details["calls"]:
+        return None
+    last = details["calls"][-1]
+    return parse_time(last["estimated_arrival"] or last["planned_arrival"])
+
+
+async def async_fetch_journey_details(
+    token_manager: TokenManager,
+    planner: QuotaPlanner,
+    request_layer: RequestLayer,
+    stop_gid: str,
+    details_reference: str,
+) -> dict[str, Any]:
+    """Fetch the calls of the journey behind a departure."""
+    access_token = await token_manager.async_get_token()
+    headers = {"Authorization": f"Bearer {access_token}"}
+    params = {"includes": "servicejourneycalls"}
+    url = f"{API_BASE}/stop-areas/{stop_gid}/departures/{details_reference}/details"
+
+    async with aiohttp.ClientSession(timeout=REQUEST_TIMEOUT) as session:
+        async with request_layer.request(
+            session,
+            "GET",
+            url,
+            # Each key has its own rate limit, the path names one journey
+            endpoint=f"journey_details:{planner.key_id}",
+            on_send=planner.async_record_request,
+            headers=headers,
+            params=params,
+        ) as response:
+            if response.status == 401:
+                token_manager.invalidate()
+            if response.status != 200:
+                raise HomeAssistantError(
+                    f"Journey details request failed: {response.status}"
+                )
+            result = await response.json()
+    return parse_journey_details(result)
+
+
+class JourneyDetailsCache:
+    """LRU cache of journey details that expire with the journey."""
+
+    def __init__(self, size: int = JOURNEY_CACHE_SIZE) -> None:
+        """Initialize the cache."""
+        self._size = size
+        # details reference -> (expires at, details)
+        self._entries: OrderedDict[str, tuple[datetime, dict[str, Any]]] = OrderedDict()
+        self._single_flight = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+
+    def _expiry(self, details: dict[str, Any]) -> datetime:
+        """Return when cached details go stale."""
+        expires = dt_util.utcnow() + JOURNEY_DETAILS_TTL
+        if (end := journey_end(details)) is not None:
+            expires = min(expires, end)
+        return expires
+
+    async def async_get(
+        self,
+        details_reference: str,
+        fetch: Callable[[], Awaitable[dict[str, Any]]],
+    ) -> dict[str, Any]:
+        """Return journey details, fetching them on a miss.
+
+        Concurrent lookups of the same journey share one request.
+        """
+        if (entry := self._entries.get(details_reference)) is not None:
+            expires, details = entry
+            if dt_util.utcnow() < expires:
+                self._entries.move_to_end(details_reference)
+                self.hits += 1
+                return details
+            del self._entries[details_reference]
+
+        self.misses += 1
+        details = await self._single_flight.run(details_reference, fetch)
+        expires = self._expiry(details)
+        if dt_util.utcnow() < expires:
+            self._entries[details_reference] = (expires, details)
+            self._entries.move_to_end(details_reference)
+            while len(self._entries) > self._size:
+                self._entries.popitem(last=False)
+        return details
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the state for diagnostics."""
+        return {"cached": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+def async_get_journey_cache(hass: HomeAssistant) -> JourneyDetailsCache:
+    """Return the journey details cache shared by all entries."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if (cache := domain_data.get("journeys")) is None:
+        cache = domain_data["journeys"] = JourneyDetailsCache()
+    return cache
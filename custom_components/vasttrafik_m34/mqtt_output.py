@@ -0,0 +1,109 @@
+"""MQTT output of departures for Västtrafik M34.
+
+With an MQTT base topic set, an entry publishes its departures through Home
+Assistant's MQTT integration whenever the coordinator updates:
+
+- ``<base>/<station>/board``: the departure board as compact JSON
+- ``<base>/<station>/line/<line>``: the next departure of each line
+
+Messages are retained, so any number of signage controllers can subscribe
+and get the current board at once without an API request of their own.
+A topic is only published when its payload changed, and the retained
+message of a line that no longer departs is cleared.
+"""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable, Callable
+import json
+import logging
+from typing import Any
+
+from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import HomeAssistantError
+
+from .subscription import compact_departure
+
+_LOGGER = logging.getLogger(__name__)
+
+PublishFunc = Callable[..., Awaitable[None]]
+
+
+def _topic_level(value: str) -> str:
+    """Return a value usable as one level of an MQTT topic."""
+    for char in "/+#":
+        value = value.replace(char, "_")
+    return value or "_"
+
+
+def _encode(payload: Any) -> str:
+    """Encode a payload as compact JSON."""
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+
+
+def build_messages(
+    base_topic: str, station_id: str, departures: list[dict[str, Any]]
+) -> dict[str, str]:
+    """Return the payload of every topic for the given departures."""
+    prefix = f"{base_topic.rstrip('/')}/{_topic_level(station_id)}"
+    board = [compact_departure(departure) for departure in departures]
+    messages = {f"{prefix}/board": _encode(board)}
+    for departure in board:
+        topic = f"{prefix}/line/{_topic_level(departure['line'])}"
+        # Departures are in order, the first one per line is the next
+        messages.setdefault(topic, _encode(departure))
+    return messages
+
+
+class DeparturePublisher:
+    """Publish an entry's departures as retained MQTT messages."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        base_topic: str,
+        station_id: str,
+        publish: PublishFunc | None = None,
+    ) -> None:
+        """Initialize the publisher."""
+        self.hass = hass
+        self._base_topic = base_topic
+        self._station_id = station_id
+        self._publish = publish
+        self._lock = asyncio.Lock()
+        self._warned = False
+        # Topic -> payload of the retained messages published so far
+        self._published: dict[str, str] = {}
+
+    async def async_publish(self, departures: list[dict[str, Any]]) -> None:
+        """Publish the topics whose payload changed."""
+        if self._publish is None:
+            # pylint: disable-next=import-outside-toplevel
+            from homeassistant.components import mqtt
+
+            if not await mqtt.async_wait_for_mqtt_client(self.hass):
+                if not self._warned:
+                    self._warned = True
+                    _LOGGER.warning(
+                        "MQTT is not available, departures are not published"
+                    )
+                return
+            self._publish = mqtt.async_publish
+
+        messages = build_messages(self._base_topic, self._station_id, departures)
+        async with self._lock:
+            # An empty retained message removes the line from the broker
+            for topic in self._published.keys() - messages.keys():
+                messages[topic] = ""
+            for topic, payload in messages.items():
+                if self._published.get(topic) == payload:
+                    continue
+                try:
+                    await self._publish(self.hass, topic, payload, qos=0, retain=True)
+                except HomeAssistantError as ex:
+                    _LOGGER.debug("Could not publish %s: %s", topic, ex)
+                    continue
+                if payload:
+                    self._published[topic] = payload
+                else:
+                    self._published.pop(topic, None)
@@ -0,0 +1,385 @@
+"""Refresh timing, event loop lag and on-demand profiling.
+
+Every coordinator refresh is timed from start to end, waiting for the API
+included, and one taking longer than ``LONG_REFRESH_SECONDS`` is logged at
+most once per warning interval. A shared monitor measures how late the loop
+runs a callback scheduled every few seconds, which shows when the whole
+instance is slow.
+
+The profile action turns on cProfile and tracemalloc for a while. Only the
+steps of the coordinator refreshes and the sensor renders run under the
+profilers, each entry under its own, so the written profiles and memory
+report show this integration's share and not the rest of Home Assistant.
+While it runs, refreshes are also timed by the time they actually hold the
+event loop, summed over their steps between awaits, and one holding it
+longer than ``SLOW_REFRESH_SECONDS`` is logged. Outside a profile the
+refresh coroutine is awaited directly.
+"""
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from collections.abc import Awaitable, Callable, Coroutine, Generator
+import cProfile
+import logging
+import os
+import time
+import tracemalloc
+from typing import Any, TypeVar
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.util import dt as dt_util
+
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+_T = TypeVar("_T")
+
+# A refresh holding the event loop this long is logged
+SLOW_REFRESH_SECONDS = 0.1
+
+# A refresh taking this long from start to end, waiting for the API included,
+# is logged at most once per warning interval
+LONG_REFRESH_SECONDS = 10
+LONG_REFRESH_WARNING_INTERVAL_SECONDS = 300
+
+# The loop lag is sampled this often, and logged past the threshold at most
+# once per warning interval
+LOOP_LAG_INTERVAL_SECONDS = 5
+LOOP_LAG_WARNING_SECONDS = 0.5
+LOOP_LAG_WARNING_INTERVAL_SECONDS = 300
+
+# Samples kept for the statistics in diagnostics
+STATS_WINDOW = 120
+
+# Lines of the memory report per entry
+MEMORY_REPORT_LINES = 25
+
+
+class DurationStats:
+    """Sliding window of durations in seconds."""
+
+    def __init__(self, window: int = STATS_WINDOW) -> None:
+        """Initialize the statistics."""
+        self._samples: deque[float] = deque(maxlen=window)
+        self.max = 0.0
+
+    def record(self, seconds: float) -> None:
+        """Add a sample."""
+        self._samples.append(seconds)
+        self.max = max(self.max, seconds)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the state for diagnostics."""
+        if not self._samples:
+            return {"samples": 0}
+        ordered = sorted(self._samples)
+        return {
+            "samples": len(ordered),
+            "last": round(self._samples[-1], 4),
+            "p95": round(ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)], 4),
+            "max": round(self.max, 4),
+        }
+
+
+class EntryProfile:
+    """Profiling data collected for one entry during a session."""
+
+    def __init__(self) -> None:
+        """Initialize the profile."""
+        self.profile = cProfile.Profile()
+        # Net bytes allocated by the profiled steps
+        self.allocated = 0
+        self.steps = 0
+
+    def run(self, func: Callable[..., _T], *args: Any) -> _T:
+        """Run one synchronous step under the profilers."""
+        memory = tracemalloc.get_traced_memory()[0]
+        try:
+            self.profile.enable()
+        except ValueError:
+            # Another profiler is running in this thread
+            return func(*args)
+        try:
+            return func(*args)
+        finally:
+            self.profile.disable()
+            self.steps += 1
+            self.allocated += tracemalloc.get_traced_memory()[0] - memory
+
+
+class ProfileSession:
+    """A running profile action, collecting per entry."""
+
+    def __init__(self) -> None:
+        """Start tracing allocations."""
+        self.started = dt_util.utcnow()
+        self.entries: dict[str, EntryProfile] = {}
+        self._started_tracemalloc = not tracemalloc.is_tracing()
+        if self._started_tracemalloc:
+            tracemalloc.start()
+
+    def entry(self, key: str) -> EntryProfile:
+        """Return the profile of an entry."""
+        if (profile := self.entries.get(key)) is None:
+            profile = self.entries[key] = EntryProfile()
+        return profile
+
+    def snapshot(self) -> tracemalloc.Snapshot:
+        """Stop tracing and return the allocations still held.
+
+        Slow after a long session, run it in the executor.
+        """
+        snapshot = tracemalloc.take_snapshot()
+        self.stop()
+        return snapshot
+
+    def stop(self) -> None:
+        """Stop tracing if this session started it."""
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+
+
+class _Instrumented:
+    """Await a coroutine, timing and profiling each of its steps."""
+
+    def __init__(
+        self,
+        coro: Coroutine[Any, Any, _T],
+        on_step: Callable[[float], None],
+        profile: EntryProfile,
+    ) -> None:
+        """Initialize the wrapper."""
+        self._coro = coro
+        self._on_step = on_step
+        self._profile = profile
+
+    def _step(self, send: Callable[[Any], Any], value: Any) -> Any:
+        """Run the coroutine until its next await."""
+        started = time.perf_counter()
+        try:
+            return self._profile.run(send, value)
+        finally:
+            self._on_step(time.perf_counter() - started)
+
+    def __await__(self) -> Generator[Any, Any, _T]:
+        """Drive the coroutine step by step."""
+        send: Callable[[Any], Any] = self._coro.send
+        value: Any = None
+        while True:
+            try:
+                yielded = self._step(send, value)
+            except StopIteration as stop:
+                return stop.value
+            try:
+                value = yield yielded
+                send = self._coro.send
+            except GeneratorExit:
+                self._coro.close()
+                raise
+            except BaseException as ex:  # pylint: disable=broad-except
+                # Cancellation and errors go into the coroutine
+                value = ex
+                send = self._coro.throw
+
+
+class RefreshTimer:
+    """Time an entry's refreshes, and their event loop share while profiled."""
+
+    def __init__(self, hass: HomeAssistant, name: str) -> None:
+        """Initialize the timer, ``name`` is the entry's profile key."""
+        self.hass = hass
+        self.name = name
+        self.stats = DurationStats()
+        self.loop_stats = DurationStats()
+        self.slow_refreshes = 0
+        self.long_refreshes = 0
+        self._last_warning: float | None = None
+
+    def _record(self, seconds: float) -> None:
+        """Record how long a refresh took, logging a long one."""
+        self.stats.record(seconds)
+        if seconds <= LONG_REFRESH_SECONDS:
+            return
+        self.long_refreshes += 1
+        now = time.monotonic()
+        if (
+            self._last_warning is None
+            or now - self._last_warning > LONG_REFRESH_WARNING_INTERVAL_SECONDS
+        ):
+            self._last_warning = now
+            _LOGGER.warning("Refresh of %s took %.1f seconds", self.name, seconds)
+
+    async def async_run(self, func: Callable[[], Awaitable[_T]]) -> _T:
+        """Run a refresh, profiling it if a profile session is running."""
+        if (session := async_get_profile_session(self.hass)) is None:
+            started = time.perf_counter()
+            try:
+                return await func()
+            finally:
+                self._record(time.perf_counter() - started)
+
+        busy = 0.0
+
+        def _on_step(seconds: float) -> None:
+            nonlocal busy
+            busy += seconds
+
+        started = time.perf_counter()
+        try:
+            return await _Instrumented(func(), _on_step, session.entry(self.name))
+        finally:
+            self._record(time.perf_counter() - started)
+            self.loop_stats.record(busy)
+            if busy > SLOW_REFRESH_SECONDS:
+                self.slow_refreshes += 1
+                _LOGGER.warning(
+                    "Refresh of %s held the event loop for %.3f seconds",
+                    self.name,
+                    busy,
+                )
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the state for diagnostics."""
+        return {
+            "seconds": self.stats.as_dict(),
+            "profiled_loop_seconds": self.loop_stats.as_dict(),
+            "slow_refreshes": self.slow_refreshes,
+            "long_refreshes": self.long_refreshes,
+        }
+
+
+@callback
+def async_profile_render(
+    hass: HomeAssistant, key: str, func: Callable[[], None]
+) -> None:
+    """Render an entity, under the entry's profiler if a session is running."""
+    if (session := async_get_profile_session(hass)) is None:
+        func()
+        return
+    session.entry(key).run(func)
+
+
+class LoopLagMonitor:
+    """Measure how late the event loop runs a regularly scheduled callback."""
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the monitor."""
+        self.hass = hass
+        self.stats = DurationStats()
+        self._registrations = 0
+        self._handle: Any = None
+        self._expected = 0.0
+        self._last_warning: float | None = None
+
+    @callback
+    def async_register(self) -> CALLBACK_TYPE:
+        """Keep measuring while registered, return an unregister callback."""
+        self._registrations += 1
+        if self._handle is None:
+            self._schedule()
+
+        @callback
+        def _unregister() -> None:
+            self._registrations -= 1
+            if not self._registrations and self._handle is not None:
+                self._handle.cancel()
+                self._handle = None
+
+        return _unregister
+
+    def _schedule(self) -> None:
+        """Schedule the next sample."""
+        self._expected = self.hass.loop.time() + LOOP_LAG_INTERVAL_SECONDS
+        self._handle = self.hass.loop.call_at(self._expected, self._sample)
+
+    def _sample(self) -> None:
+        """Record how late this callback runs."""
+        now = self.hass.loop.time()
+        lag = max(now - self._expected, 0.0)
+        self.stats.record(lag)
+        if lag > LOOP_LAG_WARNING_SECONDS and (
+            self._last_warning is None
+            or now - self._last_warning > LOOP_LAG_WARNING_INTERVAL_SECONDS
+        ):
+            self._last_warning = now
+            _LOGGER.warning(
+                "The event loop ran %.3f seconds late, Home Assistant is busy", lag
+            )
+        self._schedule()
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the state for diagnostics."""
+        return self.stats.as_dict()
+
+
+def async_get_loop_lag_monitor(hass: HomeAssistant) -> LoopLagMonitor:
+    """Return the loop lag monitor shared by all entries."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if (monitor := domain_data.get("loop_lag")) is None:
+        monitor = domain_data["loop_lag"] = LoopLagMonitor(hass)
+    return monitor
+
+
+def async_get_profile_session(hass: HomeAssistant) -> ProfileSession | None:
+    """Return the running profile session, if any."""
+    return hass.data.get(DOMAIN, {}).get("profile_session")
+
+
+def _write_results(
+    directory: str,
+    stamp: str,
+    session: ProfileSession,
+    package_dir: str,
+) -> list[str]:
+    """Write one profile per entry and the memory report, return the paths."""
+    snapshot = session.snapshot()
+    paths = []
+    report = [f"Västtrafik M34 memory report, {session.started.isoformat()}", ""]
+    statistics = snapshot.filter_traces(
+        [tracemalloc.Filter(True, f"{package_dir}/*")]
+    ).statistics("lineno")
+    for key, profile in session.entries.items():
+        path = f"{directory}/{DOMAIN}_profile.{stamp}.{key}.cprof"
+        profile.profile.dump_stats(path)
+        paths.append(path)
+        report.append(
+            f"{key}: {profile.steps} profiled steps, "
+            f"{profile.allocated / 1024:+.1f} KiB net allocated"
+        )
+    report.extend(["", "Allocations held by the integration:"])
+    report.extend(str(stat) for stat in statistics[:MEMORY_REPORT_LINES])
+    memory_path = f"{directory}/{DOMAIN}_memory.{stamp}.txt"
+    with open(memory_path, "w", encoding="utf-8") as file:
+        file.write("\n".join(report) + "\n")
+    paths.append(memory_path)
+    return paths
+
+
+async def async_run_profile(hass: HomeAssistant, duration: float) -> list[str]:
+    """Profile the integration for a while, return the written files."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if "profile_session" in domain_data:
+        raise HomeAssistantError("A profile is already running")
+    session = domain_data["profile_session"] = ProfileSession()
+    try:
+        await asyncio.sleep(duration)
+    except BaseException:
+        del domain_data["profile_session"]
+        session.stop()
+        raise
+    # Refreshes are no longer profiled, but no new profile starts until the
+    # results are written
+    domain_data["profile_session"] = None
+    try:
+        return await hass.async_add_executor_job(
+            _write_results,
+            hass.config.path(),
+            session.started.strftime("%Y%m%d%H%M%S"),
+            session,
+            os.path.dirname(__file__),
+        )
+    finally:
+        del domain_data["profile_session"]
@@ -0,0 +1,268 @@
+"""Punctuality statistics per line and stop area for Västtrafik M34.
+
+Every real departures fetch is folded into streaming aggregates: a departure
+is counted once, with its last observed delay and cancellation, when its
+departure time has passed. Aggregates are kept per hour, stop area and line
+(count, delay sum, extremes, a histogram of whole delay minutes for the
+quantiles, cancellations). Once an hour the completed hours are written as
+external long-term statistics, a few rows per line and hour, so delay
+trends need neither the recorder history of the attributes nor extra
+requests.
+"""
+from __future__ import annotations
+
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+import logging
+import math
+from typing import Any
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_track_time_change
+from homeassistant.util import dt as dt_util, slugify
+
+from .board import parse_time
+from .const import DOMAIN
+from .timetable import departure_key
+
+_LOGGER = logging.getLogger(__name__)
+
+# Delays outside this range (minutes) are counted at its bounds
+DELAY_HISTOGRAM_RANGE = (-15, 120)
+
+# Counted departures are remembered this long, the API keeps listing a
+# departure for a while after it left
+COUNTED_RETENTION = timedelta(hours=3)
+
+
+@dataclass
+class LineStats:
+    """Streaming punctuality aggregates of one line at one stop area."""
+
+    count: int = 0
+    cancelled: int = 0
+    delay_sum: float = 0.0
+    delay_min: float | None = None
+    delay_max: float | None = None
+    # Whole delay minutes -> departures, a fixed-size quantile sketch
+    histogram: Counter[int] = field(default_factory=Counter)
+
+    def add(self, delay_minutes: float, is_cancelled: bool) -> None:
+        """Fold one departed departure into the aggregates."""
+        self.count += 1
+        if is_cancelled:
+            # A cancelled departure has no meaningful delay
+            self.cancelled += 1
+            return
+        self.delay_sum += delay_minutes
+        if self.delay_min is None or delay_minutes < self.delay_min:
+            self.delay_min = delay_minutes
+        if self.delay_max is None or delay_minutes > self.delay_max:
+            self.delay_max = delay_minutes
+        low, high = DELAY_HISTOGRAM_RANGE
+        self.histogram[min(max(round(delay_minutes), low), high)] += 1
+
+    @property
+    def ran(self) -> int:
+        """Return the number of departures that were not cancelled."""
+        return self.count - self.cancelled
+
+    @property
+    def mean_delay(self) -> float | None:
+        """Return the mean delay in minutes of the departures that ran."""
+        return self.delay_sum / self.ran if self.ran else None
+
+    @property
+    def cancellation_rate(self) -> float:
+        """Return the share of cancelled departures."""
+        return self.cancelled / self.count if self.count else 0.0
+
+    def quantile(self, q: float) -> float | None:
+        """Return the nearest-rank delay quantile in whole minutes."""
+        if not self.ran:
+            return None
+        rank = max(math.ceil(q * self.ran), 1)
+        seen = 0
+        for minutes in sorted(self.histogram):
+            seen += self.histogram[minutes]
+            if seen >= rank:
+                return float(minutes)
+        return float(max(self.histogram))
+
+
+class PunctualityTracker:
+    """Punctuality aggregates of every observed stop area."""
+
+    def __init__(self) -> None:
+        """Initialize the tracker."""
+        # (stop area, departure key) -> last observed departure
+        self._pending: dict[tuple[str, str], dict[str, Any]] = {}
+        # Departures already counted, with their departure time
+        self._counted: dict[tuple[str, str], datetime] = {}
+        # (hour start, stop area, line) -> aggregates
+        self.hours: dict[tuple[datetime, str, str], LineStats] = {}
+        # Hours before this have been written and are not added to again
+        self._published_until: datetime | None = None
+        self.names: dict[str, str] = {}
+        self._registrations = 0
+        self._unsub_hourly: CALLBACK_TYPE | None = None
+
+    @callback
+    def async_register_station(
+        self, hass: HomeAssistant, station_gid: str, name: str
+    ) -> CALLBACK_TYPE:
+        """Track a stop area, return a callback that stops tracking it.
+
+        The hourly statistics are written while any stop area is tracked.
+        """
+        self.names[station_gid] = name
+        self._registrations += 1
+        if self._unsub_hourly is None:
+
+            @callback
+            def _async_hourly(now: datetime) -> None:
+                self.async_publish(hass, now)
+
+            self._unsub_hourly = async_track_time_change(
+                hass, _async_hourly, minute=0, second=30
+            )
+
+        @callback
+        def _unregister() -> None:
+            self._registrations -= 1
+            if not self._registrations and self._unsub_hourly is not None:
+                self._unsub_hourly()
+                self._unsub_hourly = None
+
+        return _unregister
+
+    def observe(
+        self,
+        station_gid: str,
+        departures: list[dict[str, Any]],
+        now: datetime | None = None,
+    ) -> None:
+        """Record a real fetch and count the departures that have left."""
+        now = now or dt_util.utcnow()
+        for departure in departures:
+            key = (station_gid, departure_key(departure))
+            if key not in self._counted:
+                self._pending[key] = departure
+        self._finalize(now)
+
+    def _finalize(self, now: datetime) -> None:
+        """Count pending departures whose departure time has passed."""
+        for key, departure in list(self._pending.items()):
+            planned = parse_time(departure.get("planned_time"))
+            departed = parse_time(departure.get("estimated_time")) or planned
+            if departed is None:
+                del self._pending[key]
+                continue
+            if departed > now:
+                continue
+            del self._pending[key]
+            self._counted[key] = departed
+            hour = dt_util.as_utc(departed).replace(minute=0, second=0, microsecond=0)
+            if self._published_until is not None and hour < self._published_until:
+                # Seen only after its hour was written, a row with just this
+                # departure would replace the hour's statistics
+                continue
+            stats = self.hours.setdefault(
+                (hour, key[0], departure.get("line_number", "?")), LineStats()
+            )
+            stats.add(
+                departure.get("delay_minutes", 0), departure.get("is_cancelled", False)
+            )
+        cutoff = now - COUNTED_RETENTION
+        for key in [key for key, when in self._counted.items() if when < cutoff]:
+            del self._counted[key]
+
+    def pop_completed(
+        self, now: datetime
+    ) -> dict[tuple[datetime, str, str], LineStats]:
+        """Remove and return the aggregates of hours that have ended."""
+        current = dt_util.as_utc(now).replace(minute=0, second=0, microsecond=0)
+        completed = {
+            key: stats for key, stats in self.hours.items() if key[0] < current
+        }
+        for key in completed:
+            del self.hours[key]
+        if self._published_until is None or current > self._published_until:
+            self._published_until = current
+        return completed
+
+    @callback
+    def async_publish(self, hass: HomeAssistant, now: datetime) -> None:
+        """Write the completed hours as external long-term statistics."""
+        self._finalize(dt_util.as_utc(now))
+        if not (completed := self.pop_completed(now)):
+            return
+        # pylint: disable-next=import-outside-toplevel
+        from homeassistant.components.recorder.statistics import (
+            async_add_external_statistics,
+        )
+
+        # statistic id -> (metadata, rows)
+        series: dict[str, tuple[dict[str, Any], list[dict[str, Any]]]] = {}
+        for (hour, station_gid, line), stats in completed.items():
+            for metric, unit, row in statistic_rows(hour, stats):
+                statistic_id = f"{DOMAIN}:{slugify(f'{station_gid}_{line}_{metric}')}"
+                station = self.names.get(station_gid, station_gid)
+                name = f"{station} {line} {metric.replace('_', ' ')}"
+                metadata = {
+                    "has_mean": True,
+                    "has_sum": False,
+                    "name": name,
+                    "source": DOMAIN,
+                    "statistic_id": statistic_id,
+                    "unit_of_measurement": unit,
+                }
+                series.setdefault(statistic_id, (metadata, []))[1].append(row)
+        for metadata, rows in series.values():
+            async_add_external_statistics(hass, metadata, rows)
+        _LOGGER.debug("Wrote %s punctuality statistics", len(series))
+
+
+def statistic_rows(
+    hour: datetime, stats: LineStats
+) -> list[tuple[str, str | None, dict[str, Any]]]:
+    """Return the (metric, unit, statistics row) of one line and hour."""
+    rows: list[tuple[str, str | None, dict[str, Any]]] = [
+        (
+            "departures",
+            None,
+            {"start": hour, "mean": stats.count, "min": stats.count, "max": stats.count},
+        ),
+        (
+            "cancelled",
+            "%",
+            {"start": hour, "mean": round(stats.cancellation_rate * 100, 1)},
+        ),
+    ]
+    if stats.ran:
+        rows.extend(
+            [
+                (
+                    "delay",
+                    "min",
+                    {
+                        "start": hour,
+                        "mean": round(stats.mean_delay, 2),
+                        "min": stats.delay_min,
+                        "max": stats.delay_max,
+                    },
+                ),
+                ("delay_p50", "min", {"start": hour, "mean": stats.quantile(0.5)}),
+                ("delay_p90", "min", {"start": hour, "mean": stats.quantile(0.9)}),
+            ]
+        )
+    return rows
+
+
+def async_get_punctuality(hass: HomeAssistant) -> PunctualityTracker:
+    """Return the punctuality tracker shared by all entries."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if (tracker := domain_data.get("punctuality")) is None:
+        tracker = domain_data["punctuality"] = PunctualityTracker()
+    return tracker
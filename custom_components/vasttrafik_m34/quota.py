@@ -0,0 +1,255 @@
+"""Request quota planning for the Västtrafik M34 integration.
+
+Every station entry polls the departures endpoint on its own, but all entries
+created with the same Authentication Key share one developer quota. The
+planner keeps a daily request budget per ``auth_key`` and hands each station
+an update interval so that the budget lasts until midnight.
+"""
+from __future__ import annotations
+
+from collections import deque
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+import hashlib
+import logging
+import math
+from typing import Any
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    DEFAULT_DAILY_REQUEST_BUDGET,
+    DOMAIN,
+    MAX_SCAN_INTERVAL,
+    QUOTA_RESERVE_FRACTION,
+    SCAN_INTERVAL,
+    TIME_OF_DAY_WEIGHTS,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_VERSION = 1
+SAVE_DELAY = 60
+
+# Weight of a station nobody listens to (all its entities disabled)
+UNCONSUMED_WEIGHT = 0.1
+
+
+@dataclass
+class StationDemand:
+    """Polling demand reported by one station coordinator."""
+
+    budget: int
+    departures: int = 1
+    consumed: Callable[[], bool] = lambda: True
+    # Requests spent per refresh, more than one for combined boards
+    cost: int = 1
+
+    @property
+    def weight(self) -> float:
+        """Return the relative share of the budget this station should get."""
+        density = math.sqrt(max(self.departures, 1))
+        return density * (1.0 if self.consumed() else UNCONSUMED_WEIGHT)
+
+
+def _key_id(auth_key: str) -> str:
+    """Return a stable, non-secret identifier for an auth key."""
+    return hashlib.sha256(auth_key.encode()).hexdigest()[:12]
+
+
+def _weighted_seconds(start: datetime, end: datetime) -> float:
+    """Integrate the time-of-day weight profile between two local times."""
+    total = 0.0
+    cursor = start
+    while cursor < end:
+        hour_end = cursor.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+        segment_end = min(hour_end, end)
+        total += (segment_end - cursor).total_seconds() * TIME_OF_DAY_WEIGHTS[cursor.hour]
+        cursor = segment_end
+    return total
+
+
+class QuotaPlanner:
+    """Spread a daily request budget across the stations sharing an auth key."""
+
+    def __init__(self, hass: HomeAssistant, auth_key: str) -> None:
+        """Initialize the planner."""
+        self.hass = hass
+        self.key_id = _key_id(auth_key)
+        self._store: Store[dict[str, Any]] = Store(
+            hass, STORAGE_VERSION, f"{DOMAIN}.quota_{self.key_id}"
+        )
+        self._stations: dict[str, StationDemand] = {}
+        self._day = dt_util.now().date()
+        self._used = 0
+        self._recent: deque[datetime] = deque()
+        self._warned = False
+
+    async def async_load(self) -> None:
+        """Restore today's usage so restarts do not reset the budget."""
+        stored = await self._store.async_load()
+        if stored and stored.get("day") == self._day.isoformat():
+            self._used += int(stored.get("used", 0))
+
+    @callback
+    def _data_to_save(self) -> dict[str, Any]:
+        """Return the data to persist."""
+        return {"day": self._day.isoformat(), "used": self._used}
+
+    @callback
+    def async_register(
+        self,
+        station_gid: str,
+        budget: int,
+        consumed: Callable[[], bool],
+        cost: int = 1,
+    ) -> Callable[[], None]:
+        """Register a station and return a callback that unregisters it."""
+        self._stations[station_gid] = StationDemand(
+            budget=budget, consumed=consumed, cost=cost
+        )
+
+        @callback
+        def _unregister() -> None:
+            self._stations.pop(station_gid, None)
+
+        return _unregister
+
+    @property
+    def daily_budget(self) -> int:
+        """Return the budget, using the most conservative configured value."""
+        if not self._stations:
+            return DEFAULT_DAILY_REQUEST_BUDGET
+        return min(station.budget for station in self._stations.values())
+
+    @property
+    def used(self) -> int:
+        """Return the number of requests made today."""
+        self._roll_over()
+        return self._used
+
+    @property
+    def remaining(self) -> int:
+        """Return the number of requests left today."""
+        return max(self.daily_budget - self.used, 0)
+
+    @property
+    def degraded(self) -> bool:
+        """Return True when only the reserve is left."""
+        return self.remaining <= self.daily_budget * QUOTA_RESERVE_FRACTION
+
+    def _roll_over(self) -> None:
+        """Reset the counter at local midnight."""
+        today = dt_util.now().date()
+        if today != self._day:
+            self._day = today
+            self._used = 0
+            self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    @callback
+    def async_record_request(self, count: int = 1) -> None:
+        """Account for requests made with this auth key."""
+        self._roll_over()
+        now = dt_util.utcnow()
+        self._used += count
+        self._recent.extend([now] * count)
+        self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    @callback
+    def async_update_budget(self, station_gid: str, budget: int) -> None:
+        """Change the daily budget a station configured."""
+        if station := self._stations.get(station_gid):
+            station.budget = budget
+
+    @callback
+    def async_update_demand(self, station_gid: str, departures: int) -> None:
+        """Update the departure density observed for a station."""
+        if station := self._stations.get(station_gid):
+            station.departures = departures
+
+    @callback
+    def async_allow_request(self, has_data: bool) -> bool:
+        """Return True if a station refresh may spend a request now.
+
+        Once the budget is down to the reserve, stations that already have
+        data keep serving it; the reserve is left for stations without any.
+        """
+        if not self.degraded:
+            self._warned = False
+            return True
+        if not self._warned:
+            self._warned = True
+            _LOGGER.warning(
+                "Daily request budget for auth key %s is nearly used up "
+                "(%s of %s requests), serving cached departures until midnight",
+                self.key_id,
+                self.used,
+                self.daily_budget,
+            )
+        return self.remaining > 0 and not has_data
+
+    def interval_for(self, station_gid: str) -> timedelta:
+        """Return the update interval a station should use right now."""
+        now = dt_util.now()
+        midnight = (now + timedelta(days=1)).replace(
+            hour=0, minute=0, second=0, microsecond=0
+        )
+        until_midnight = midnight - now
+        station = self._stations.get(station_gid)
+        spendable = self.remaining - self.daily_budget * QUOTA_RESERVE_FRACTION
+        if station is None or spendable <= 0:
+            return min(MAX_SCAN_INTERVAL, max(until_midnight, SCAN_INTERVAL))
+
+        # Requests per second for the whole key right now, shaped by the
+        # time-of-day profile over what is left of the day
+        weighted = _weighted_seconds(now, midnight)
+        key_rate = spendable * TIME_OF_DAY_WEIGHTS[now.hour] / max(weighted, 1.0)
+        total_weight = sum(s.weight for s in self._stations.values())
+        rate = key_rate * station.weight / total_weight / station.cost
+        if rate <= 0:
+            return MAX_SCAN_INTERVAL
+        interval = timedelta(seconds=1 / rate)
+        return max(SCAN_INTERVAL, min(interval, MAX_SCAN_INTERVAL))
+
+    @property
+    def hourly_rate(self) -> float:
+        """Return the requests per second over the last hour."""
+        window_start = dt_util.utcnow() - timedelta(hours=1)
+        while self._recent and self._recent[0] < window_start:
+            self._recent.popleft()
+        return len(self._recent) / 3600
+
+    @property
+    def projected_exhaustion(self) -> datetime | None:
+        """Return when the budget runs out at the last hour's request rate."""
+        return project_exhaustion(self.remaining, self.hourly_rate)
+
+
+def project_exhaustion(remaining: int, rate: float) -> datetime | None:
+    """Return when ``remaining`` requests run out at ``rate`` per second.
+
+    None if nothing is being spent or the budget lasts until midnight.
+    """
+    if rate <= 0:
+        return None
+    exhaustion = dt_util.utcnow() + timedelta(seconds=remaining / rate)
+    midnight = dt_util.as_utc(
+        (dt_util.now() + timedelta(days=1)).replace(
+            hour=0, minute=0, second=0, microsecond=0
+        )
+    )
+    return exhaustion if exhaustion < midnight else None
+
+
+async def async_get_planner(hass: HomeAssistant, auth_key: str) -> QuotaPlanner:
+    """Return the shared planner for an auth key, creating it on first use."""
+    planners: dict[str, QuotaPlanner] = hass.data.setdefault(DOMAIN, {}).setdefault(
+        "quota", {}
+    )
+    if (planner := planners.get(auth_key)) is None:
+        planner = planners[auth_key] = QuotaPlanner(hass, auth_key)
+        await planner.async_load()
+    return planner
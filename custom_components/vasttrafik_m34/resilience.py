@@ -0,0 +1,396 @@
+"""Rate-limit aware request layer for the Västtrafik M34 integration.
+
+All station coordinators talk to the same API host. When the API throttles
+or fails, every station would otherwise retry in lockstep on its next tick.
+This module keeps per-endpoint backoff (honouring ``Retry-After``) and one
+circuit breaker per host, so an outage costs a single probe request. An API
+that fails on its own, like the traffic situations feed, can ask for its own
+breaker so it does not pause the departures on the same host. It also
+holds the request deadlines and the latency tracking used for hedging.
+"""
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from collections.abc import AsyncIterator, Callable
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+import logging
+import random
+import time
+from typing import Any
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    BACKOFF_BASE_SECONDS,
+    BACKOFF_MAX_SECONDS,
+    BREAKER_FAILURE_THRESHOLD,
+    BREAKER_RECOVERY_SECONDS,
+    CONNECT_TIMEOUT_SECONDS,
+    DOMAIN,
+    FIRST_BYTE_TIMEOUT_SECONDS,
+    HEDGE_MIN_DELAY_SECONDS,
+    HEDGE_MIN_SAMPLES,
+    TOTAL_TIMEOUT_SECONDS,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+# Statuses that mean "the API is struggling", not "the request was wrong"
+RETRYABLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# Deadlines for every API request: connecting, waiting for the first byte
+# (and each later read), and the request as a whole
+REQUEST_TIMEOUT = aiohttp.ClientTimeout(
+    total=TOTAL_TIMEOUT_SECONDS,
+    connect=CONNECT_TIMEOUT_SECONDS,
+    sock_read=FIRST_BYTE_TIMEOUT_SECONDS,
+)
+
+LATENCY_WINDOW = 50
+# Hedge tokens cannot pile up beyond this during long quiet periods
+HEDGE_BURST = 3
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Parse a Retry-After header, either delta-seconds or an HTTP date."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        return None
+    return max((retry_at - dt_util.utcnow()).total_seconds(), 0.0)
+
+
+class Backoff:
+    """Jittered exponential backoff for a single endpoint."""
+
+    def __init__(
+        self,
+        base: float = BACKOFF_BASE_SECONDS,
+        cap: float = BACKOFF_MAX_SECONDS,
+    ) -> None:
+        """Initialize the backoff."""
+        self._base = base
+        self._cap = cap
+        self.failures = 0
+        self._not_before = 0.0
+
+    @property
+    def remaining(self) -> float:
+        """Return the seconds left before the endpoint may be called again."""
+        return max(self._not_before - time.monotonic(), 0.0)
+
+    def record_failure(self, retry_after: float | None = None) -> float:
+        """Register a failure and return the delay before the next attempt.
+
+        The server's Retry-After wins when it asks for longer than our own
+        backoff; full jitter spreads stations that failed at the same time.
+        """
+        self.failures += 1
+        ceiling = min(self._cap, self._base * 2 ** (self.failures - 1))
+        delay = random.uniform(ceiling / 2, ceiling)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        self._not_before = time.monotonic() + delay
+        return delay
+
+    def record_success(self) -> None:
+        """Reset the backoff after a successful call."""
+        self.failures = 0
+        self._not_before = 0.0
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the state for diagnostics."""
+        return {"failures": self.failures, "retry_in": round(self.remaining, 1)}
+
+
+class CircuitBreaker:
+    """Circuit breaker shared by every request to one host or API."""
+
+    def __init__(
+        self,
+        host: str,
+        failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+        recovery_timeout: float = BREAKER_RECOVERY_SECONDS,
+    ) -> None:
+        """Initialize the breaker."""
+        self.host = host
+        self._failure_threshold = failure_threshold
+        self._recovery_timeout = recovery_timeout
+        self._state = STATE_CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.trips = 0
+
+    @property
+    def state(self) -> str:
+        """Return the current state, moving from open to half-open on time."""
+        if (
+            self._state == STATE_OPEN
+            and time.monotonic() - self._opened_at >= self._recovery_timeout
+        ):
+            self._state = STATE_HALF_OPEN
+        return self._state
+
+    def allow_request(self) -> bool:
+        """Return True if a request may go out now.
+
+        While half-open only one caller gets through as the probe; the rest
+        fail fast until the probe has reported back.
+        """
+        state = self.state
+        if state == STATE_CLOSED:
+            return True
+        if state == STATE_HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        """Close the breaker after a successful request."""
+        if self._state != STATE_CLOSED:
+            _LOGGER.info("Västtrafik API at %s recovered, closing circuit", self.host)
+        self._state = STATE_CLOSED
+        self._failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        """Count a failure and open the breaker past the threshold."""
+        self._failures += 1
+        self._probe_in_flight = False
+        if self._state == STATE_HALF_OPEN or self._failures >= self._failure_threshold:
+            if self._state == STATE_CLOSED:
+                _LOGGER.warning(
+                    "Västtrafik API at %s is failing, pausing requests for %s seconds",
+                    self.host,
+                    self._recovery_timeout,
+                )
+                self.trips += 1
+            self._state = STATE_OPEN
+            self._opened_at = time.monotonic()
+
+    def release_probe(self) -> None:
+        """Give the probe slot back when a probe ended without a verdict."""
+        self._probe_in_flight = False
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the state for diagnostics."""
+        state = self.state
+        retry_in = 0.0
+        if state == STATE_OPEN:
+            retry_in = self._recovery_timeout - (time.monotonic() - self._opened_at)
+        return {
+            "state": state,
+            "consecutive_failures": self._failures,
+            "trips": self.trips,
+            "retry_in": round(max(retry_in, 0.0), 1),
+        }
+
+
+class LatencyTracker:
+    """Sliding window of request latencies for one endpoint."""
+
+    def __init__(self, window: int = LATENCY_WINDOW) -> None:
+        """Initialize the tracker."""
+        self._samples: deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        """Add the latency of a successful request."""
+        self._samples.append(seconds)
+
+    def percentile(self, fraction: float) -> float | None:
+        """Return a latency percentile, None until enough samples exist."""
+        if len(self._samples) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+    def hedge_delay(self) -> float | None:
+        """Return how long to wait before hedging, None to not hedge."""
+        if (p95 := self.percentile(0.95)) is None:
+            return None
+        return max(p95, HEDGE_MIN_DELAY_SECONDS)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the state for diagnostics."""
+        p50 = self.percentile(0.5)
+        p95 = self.percentile(0.95)
+        return {
+            "samples": len(self._samples),
+            "p50": round(p50, 3) if p50 is not None else None,
+            "p95": round(p95, 3) if p95 is not None else None,
+        }
+
+
+class HedgeBudget:
+    """Token bucket limiting hedged requests to a share of all requests.
+
+    Tokens are counted in percent of a request so that integer shares add
+    up exactly: every request earns ``percent`` and a hedge costs 100.
+    """
+
+    def __init__(self, percent: int) -> None:
+        """Initialize the budget; 0 percent disables hedging."""
+        self._percent = max(int(percent), 0)
+        self._tokens = 0
+        self.spent = 0
+        self.wins = 0
+
+    def update_percent(self, percent: int) -> None:
+        """Change the hedge share, keeping the tokens and counters."""
+        self._percent = max(int(percent), 0)
+
+    @property
+    def enabled(self) -> bool:
+        """Return True if hedging is switched on."""
+        return self._percent > 0
+
+    def earn(self) -> None:
+        """Earn the hedge share of a regular request."""
+        self._tokens = min(self._tokens + self._percent, HEDGE_BURST * 100)
+
+    def try_spend(self) -> bool:
+        """Spend one hedged request if the budget allows it."""
+        if self._tokens < 100:
+            return False
+        self._tokens -= 100
+        self.spent += 1
+        return True
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the state for diagnostics."""
+        return {
+            "percent": self._percent,
+            "hedged_requests": self.spent,
+            "hedge_wins": self.wins,
+        }
+
+
+class RequestBlocked(HomeAssistantError):
+    """Error to indicate a request was not sent because of backoff."""
+
+    def __init__(self, message: str, retry_in: float) -> None:
+        """Initialize the error."""
+        super().__init__(message)
+        self.retry_in = retry_in
+
+
+class RateLimited(HomeAssistantError):
+    """Error to indicate the API answered with a retryable status."""
+
+    def __init__(self, status: int, retry_in: float) -> None:
+        """Initialize the error."""
+        super().__init__(f"API returned {status}, retrying in {retry_in:.0f} seconds")
+        self.status = status
+        self.retry_in = retry_in
+
+
+class RequestLayer:
+    """Shared backoff and circuit breaker state for all API requests."""
+
+    def __init__(self) -> None:
+        """Initialize the request layer."""
+        self.breakers: dict[str, CircuitBreaker] = {}
+        self.backoffs: dict[str, Backoff] = {}
+
+    def _breaker(self, host: str) -> CircuitBreaker:
+        """Return the breaker for a host or API."""
+        if (breaker := self.breakers.get(host)) is None:
+            breaker = self.breakers[host] = CircuitBreaker(host)
+        return breaker
+
+    def _backoff(self, endpoint: str) -> Backoff:
+        """Return the backoff for an endpoint."""
+        if (backoff := self.backoffs.get(endpoint)) is None:
+            backoff = self.backoffs[endpoint] = Backoff()
+        return backoff
+
+    @asynccontextmanager
+    async def request(
+        self,
+        session: aiohttp.ClientSession,
+        method: str,
+        url: str,
+        endpoint: str | None = None,
+        on_send: Callable[[], None] | None = None,
+        breaker: str | None = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[aiohttp.ClientResponse]:
+        """Send a request unless its endpoint or host is backing off.
+
+        Raises RequestBlocked without touching the network while backing off
+        and RateLimited for 429 and 5xx answers. Other statuses are handed to
+        the caller, which decides what they mean. ``on_send`` is called only
+        for requests that actually go out, for quota accounting. ``breaker``
+        names a circuit breaker other than the host's.
+        """
+        host = breaker or urlsplit(url).netloc
+        backoff = self._backoff(endpoint or urlsplit(url).path)
+        circuit = self._breaker(host)
+
+        if (retry_in := backoff.remaining) > 0:
+            raise RequestBlocked(f"Backing off {endpoint or url}", retry_in)
+        if not circuit.allow_request():
+            raise RequestBlocked(
+                f"Circuit open for {host}", circuit.as_dict()["retry_in"]
+            )
+
+        if on_send is not None:
+            on_send()
+        try:
+            async with session.request(method, url, **kwargs) as response:
+                if response.status in RETRYABLE_STATUSES:
+                    retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                    delay = backoff.record_failure(retry_after)
+                    circuit.record_failure()
+                    raise RateLimited(response.status, delay)
+                backoff.record_success()
+                circuit.record_success()
+                yield response
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            backoff.record_failure()
+            circuit.record_failure()
+            raise
+        except BaseException:
+            # Cancelled or failed for a reason unrelated to the API
+            circuit.release_probe()
+            raise
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the state for diagnostics."""
+        return {
+            "circuit_breakers": {
+                host: breaker.as_dict() for host, breaker in self.breakers.items()
+            },
+            "backoff": {
+                endpoint: backoff.as_dict()
+                for endpoint, backoff in self.backoffs.items()
+                if backoff.failures
+            },
+        }
+
+
+def async_get_request_layer(hass: HomeAssistant) -> RequestLayer:
+    """Return the request layer shared by all entries."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if (layer := domain_data.get("request_layer")) is None:
+        layer = domain_data["request_layer"] = RequestLayer()
+    return layer
@@ -1,35 +1,121 @@
 """Sensor platform for Västtrafik M34 integration."""
 from __future__ import annotations
 
+import asyncio
+from collections.abc import Callable, Mapping
+from contextlib import AbstractAsyncContextManager
 from datetime import datetime, timedelta
+from functools import partial
 import logging
+import math
+import time
 from typing import TYPE_CHECKING, Any
+from urllib.parse import urlsplit
 
 import aiohttp
 
-from homeassistant.components.sensor import SensorEntity
-from homeassistant.core import HomeAssistant
+from homeassistant.components.sensor import SensorDeviceClass, SensorEntity
+from homeassistant.const import EntityCategory
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.exceptions import HomeAssistantError
 from homeassistant.helpers.device_registry import DeviceEntryType, DeviceInfo
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.event import async_call_later
 from homeassistant.helpers.update_coordinator import (
     CoordinatorEntity,
     DataUpdateCoordinator,
     UpdateFailed,
 )
+from homeassistant.util import dt as dt_util
 
-from .const import DOMAIN
+from .activity import PollGate
+from .attributes import columnar_departures, fit_rows
+from .auth import TokenRequestFailed
+from .board import merge_departures
+from .const import (
+    ATTRIBUTE_FORMAT_COLUMNAR,
+    CONF_ATTRIBUTE_BYTES,
+    CONF_ATTRIBUTE_FORMAT,
+    API_BASE,
+    CONF_DAILY_REQUEST_BUDGET,
+    CONF_DESTINATION,
+    CONF_DIRECTION_GID,
+    CONF_EXTRA_AUTH_KEYS,
+    CONF_HEDGE_BUDGET,
+    CONF_IDLE_INTERVAL,
+    CONF_LEGACY_DEPARTURES,
+    CONF_LINES,
+    CONF_MAX_DEPARTURES,
+    CONF_MAX_INFERRED_AGE,
+    CONF_MIN_REFRESH_SPACING,
+    CONF_MQTT_TOPIC,
+    CONF_POLL_CONDITIONS,
+    CONF_POLL_WHEN_VIEWED,
+    CONF_PUNCTUALITY_STATISTICS,
+    CONF_SHARED_CACHE_DIR,
+    CONF_STATION_GIDS,
+    CONF_STATION_NAMES,
+    CONF_TIMETABLE_SNAPSHOT,
+    DEFAULT_ATTRIBUTE_BYTES,
+    DEFAULT_ATTRIBUTE_FORMAT,
+    DEFAULT_DAILY_REQUEST_BUDGET,
+    DEFAULT_DESTINATION,
+    DEFAULT_DIRECTION_GID,
+    DEFAULT_EXTRA_AUTH_KEYS,
+    DEFAULT_HEDGE_BUDGET,
+    DEFAULT_IDLE_INTERVAL,
+    DEFAULT_LEGACY_DEPARTURES,
+    DEFAULT_LINES,
+    DEFAULT_MAX_DEPARTURES,
+    DEFAULT_MAX_INFERRED_AGE,
+    DEFAULT_MIN_REFRESH_SPACING,
+    DEFAULT_MQTT_TOPIC,
+    DEFAULT_POLL_WHEN_VIEWED,
+    DEFAULT_PUNCTUALITY_STATISTICS,
+    DEFAULT_SHARED_CACHE_DIR,
+    DEFAULT_TIMETABLE_SNAPSHOT,
+    DEPARTURES_WINDOW_MINUTES,
+    DOMAIN,
+    INFERENCE_MIN_COVERAGE,
+    SCAN_INTERVAL,
+    TIMETABLE_CHUNK_MINUTES,
+    TIMETABLE_PAGE_SIZE,
+    TIMETABLE_REALTIME_MINUTES,
+)
+from .coalesce import SingleFlight, async_get_single_flight
+from .credentials import (
+    Credential,
+    CredentialPool,
+    async_get_credential_pool,
+    parse_auth_keys,
+)
+from .inference import JourneyTracker, async_get_journey_tracker
+from .profiling import (
+    RefreshTimer,
+    async_get_loop_lag_monitor,
+    async_profile_render,
+)
+from .resilience import (
+    REQUEST_TIMEOUT,
+    HedgeBudget,
+    LatencyTracker,
+    RateLimited,
+    RequestBlocked,
+    RequestLayer,
+    async_get_request_layer,
+)
+from .situations import SituationFeed, async_get_situation_feed
+from .stop_cache import StopArea, async_get_stop_cache
+from .vasttrafik_api import ApiError, AuthenticationError, async_fetch_departures
 
 if TYPE_CHECKING:
     from . import VasttrafikConfigEntry
+    from .punctuality import PunctualityTracker
+    from .shared_cache import SharedCache
+    from .timetable import TimetableSnapshot
 
 _LOGGER = logging.getLogger(__name__)
 
-# API Configuration
-TOKEN_URL = "https://ext-api.vasttrafik.se/token"
-API_BASE = "https://ext-api.vasttrafik.se/pr/v4"
-
-SCAN_INTERVAL = timedelta(minutes=1)
-
 
 async def async_setup_entry(
     hass: HomeAssistant,
@@ -38,26 +124,245 @@ async def async_setup_entry(
 ) -> None:
     """Set up Västtrafik M34 sensor based on a config entry."""
     auth_key = entry.data["auth_key"]
-    station_gid = entry.data["station_gid"]
     station_name = entry.data["station_name"]
     
-    # Create coordinator
-    coordinator = VasttrafikDataUpdateCoordinator(
+    # All entries sharing an auth key share its request quota, extra keys
+    # add theirs
+    credentials = await async_get_credential_pool(
         hass,
-        auth_key=auth_key,
-        station_gid=station_gid,
+        [
+            auth_key,
+            *parse_auth_keys(
+                entry.options.get(CONF_EXTRA_AUTH_KEYS, DEFAULT_EXTRA_AUTH_KEYS)
+            ),
+        ],
+    )
+    
+    # Optional features are imported only by entries that use them
+    shared_cache = None
+    if shared_dir := entry.options.get(CONF_SHARED_CACHE_DIR, DEFAULT_SHARED_CACHE_DIR):
+        # pylint: disable-next=import-outside-toplevel
+        from .shared_cache import async_get_shared_cache
+        
+        shared_cache = await async_get_shared_cache(hass, shared_dir)
+        for credential in credentials.credentials:
+            await credential.token_manager.async_set_shared_cache(shared_cache)
+    
+    punctuality = None
+    if entry.options.get(CONF_PUNCTUALITY_STATISTICS, DEFAULT_PUNCTUALITY_STATISTICS):
+        # pylint: disable-next=import-outside-toplevel
+        from .punctuality import async_get_punctuality
+        
+        punctuality = async_get_punctuality(hass)
+    
+    coordinator_kwargs = {
+        "credentials": credentials,
+        "request_layer": async_get_request_layer(hass),
+        "hedge_budget": HedgeBudget(
+            entry.options.get(CONF_HEDGE_BUDGET, DEFAULT_HEDGE_BUDGET)
+        ),
+        "single_flight": async_get_single_flight(hass),
+        "shared_cache": shared_cache,
+        "situations": await async_get_situation_feed(hass, auth_key),
+        "journeys": async_get_journey_tracker(hass),
+        "max_inferred_age": entry.options.get(
+            CONF_MAX_INFERRED_AGE, DEFAULT_MAX_INFERRED_AGE
+        ),
+        "punctuality": punctuality,
+        "min_refresh_spacing": entry.options.get(
+            CONF_MIN_REFRESH_SPACING, DEFAULT_MIN_REFRESH_SPACING
+        ),
+        "gate": PollGate(
+            hass,
+            entry.options.get(CONF_POLL_CONDITIONS, []),
+            entry.options.get(CONF_POLL_WHEN_VIEWED, DEFAULT_POLL_WHEN_VIEWED),
+        ),
+        "idle_interval": entry.options.get(CONF_IDLE_INTERVAL, DEFAULT_IDLE_INTERVAL),
+        "direction_gid": entry.options.get(CONF_DIRECTION_GID, DEFAULT_DIRECTION_GID),
+    }
+    
+    # Create coordinator, combined boards merge several stop areas
+    if CONF_STATION_GIDS in entry.data:
+        station_gid = entry.entry_id
+        coordinator = VasttrafikBoardCoordinator(
+            hass,
+            board_id=station_gid,
+            station_gids=entry.data[CONF_STATION_GIDS],
+            station_names=entry.data[CONF_STATION_NAMES],
+            **coordinator_kwargs,
+        )
+    else:
+        station_gid = entry.data["station_gid"]
+        timetable = None
+        if entry.options.get(CONF_TIMETABLE_SNAPSHOT, DEFAULT_TIMETABLE_SNAPSHOT):
+            # pylint: disable-next=import-outside-toplevel
+            from .timetable import TimetableSnapshot
+            
+            timetable = TimetableSnapshot(hass, station_gid)
+            await timetable.async_load()
+        coordinator = VasttrafikDataUpdateCoordinator(
+            hass, station_gid=station_gid, timetable=timetable, **coordinator_kwargs
+        )
+    entry.async_on_unload(
+        credentials.async_register(
+            station_gid,
+            entry.options.get(CONF_DAILY_REQUEST_BUDGET, DEFAULT_DAILY_REQUEST_BUDGET),
+            coordinator.has_consumers,
+            cost=len(coordinator.station_gids),
+        )
     )
     
+    entry.async_on_unload(coordinator.gate.async_start(coordinator.async_wake))
+    entry.async_on_unload(async_get_loop_lag_monitor(hass).async_register())
+    
+    # Name and position come from the stop-area cache filled by the config flow
+    stop_cache = await async_get_stop_cache(hass)
+    for gid in coordinator.station_gids:
+        stop_cache.async_pin(gid)
+    
+    if coordinator.punctuality is not None:
+        station_names = entry.data.get(CONF_STATION_NAMES, [station_name])
+        for gid, name in zip(coordinator.station_gids, station_names):
+            entry.async_on_unload(
+                coordinator.punctuality.async_register_station(hass, gid, name)
+            )
+    
     # Fetch initial data
     await coordinator.async_config_entry_first_refresh()
     
     # Store coordinator in runtime_data
     entry.runtime_data = coordinator
     
+    if base_topic := entry.options.get(CONF_MQTT_TOPIC, DEFAULT_MQTT_TOPIC):
+        # pylint: disable-next=import-outside-toplevel
+        from .mqtt_output import DeparturePublisher
+        
+        publisher = DeparturePublisher(hass, base_topic, station_gid)
+        
+        @callback
+        def _async_publish_departures() -> None:
+            hass.async_create_task(
+                publisher.async_publish((coordinator.data or {}).get("departures", []))
+            )
+        
+        entry.async_on_unload(coordinator.async_add_listener(_async_publish_departures))
+        _async_publish_departures()
+    
     # Create sensor
     async_add_entities(
-        [VasttrafikM34Sensor(coordinator, station_name, station_gid)],
-        True,
+        [
+            VasttrafikM34Sensor(
+                coordinator,
+                station_name,
+                station_gid,
+                stop_cache.async_get_stop(station_gid),
+                coordinator.station_gids,
+                attribute_format=entry.options.get(
+                    CONF_ATTRIBUTE_FORMAT, DEFAULT_ATTRIBUTE_FORMAT
+                ),
+                attribute_bytes=entry.options.get(
+                    CONF_ATTRIBUTE_BYTES, DEFAULT_ATTRIBUTE_BYTES
+                ),
+                legacy_departures=entry.options.get(
+                    CONF_LEGACY_DEPARTURES, DEFAULT_LEGACY_DEPARTURES
+                ),
+                lines=entry.options.get(CONF_LINES, DEFAULT_LINES),
+                destination=entry.options.get(CONF_DESTINATION, DEFAULT_DESTINATION),
+                max_departures=entry.options.get(
+                    CONF_MAX_DEPARTURES, DEFAULT_MAX_DEPARTURES
+                ),
+            ),
+            VasttrafikQuotaRemainingSensor(coordinator, station_name, station_gid),
+            VasttrafikQuotaExhaustionSensor(coordinator, station_name, station_gid),
+        ]
+    )
+
+
+def _parse_lines(value: str) -> frozenset[str]:
+    """Return the case-folded line names of a comma separated list."""
+    return frozenset(
+        line.strip().casefold() for line in value.split(",") if line.strip()
+    )
+
+
+def _departure_times(estimated_time: str) -> tuple[str, str, int]:
+    """Return the relative time, HH:MM and minutes until a departure."""
+    try:
+        dt = datetime.fromisoformat(estimated_time.replace('Z', '+00:00'))
+        now = datetime.now().astimezone()
+        minutes = int((dt - now).total_seconds() / 60)
+    except Exception:
+        return "?", estimated_time, 0
+    
+    # Relative time
+    if minutes <= 0:
+        time_str = "Nu"
+    elif minutes == 1:
+        time_str = "1 min"
+    else:
+        time_str = f"{minutes} min"
+    return time_str, dt.strftime("%H:%M"), minutes
+
+
+def _legacy_departure(dep: dict[str, Any]) -> str:
+    """Return a departure as a line of text, the legacy attribute format."""
+    time_str, actual_time, _ = _departure_times(dep.get("estimated_time", ""))
+    
+    # Delay information
+    delay = dep.get("delay_minutes", 0)
+    delay_str = ""
+    if delay > 0:
+        delay_str = f" (+{delay})"
+    elif delay < 0:
+        delay_str = f" ({delay})"
+    
+    # Cancelled indicator (no red ball)
+    cancelled = " [INSTÄLLD]" if dep.get("is_cancelled") else ""
+    
+    # Track/platform info
+    track = dep.get("track", "")
+    track_str = f" Läge {track}" if track else ""
+    
+    # Format for display: "Linje 16 → Bergsjön - 14:25 (2 min) Läge B"
+    return (
+        f"Linje {dep.get('line_number', '?')} → {dep.get('direction', '?')} - "
+        f"{actual_time} ({time_str}){delay_str}{track_str}{cancelled}"
+    )
+
+
+def _departure_detail(dep: dict[str, Any]) -> dict[str, Any]:
+    """Return a departure as an object of departures_json."""
+    estimated_time = dep.get("estimated_time", "")
+    time_str, actual_time, minutes = _departure_times(estimated_time)
+    detail = {
+        "line": dep.get("line_number", "?"),
+        "destination": dep.get("direction", "?"),
+        "departure_time": actual_time,
+        "relative_time": time_str,
+        "minutes_until": minutes,
+        "track": dep.get("track", ""),
+        "delay_minutes": dep.get("delay_minutes", 0),
+        "is_cancelled": dep.get("is_cancelled", False),
+        "is_realtime": dep.get("is_realtime", False),
+        "planned_time": dep.get("planned_time", ""),
+        "estimated_time": estimated_time,
+        # For the get_journey_details action
+        "details_reference": dep.get("details_reference"),
+    }
+    # Combined boards name the stop each departure leaves from
+    if "stop_name" in dep:
+        detail["stop_name"] = dep["stop_name"]
+    return detail
+
+
+def _station_device_info(station_name: str, station_gid: str) -> DeviceInfo:
+    """Return device info for a station."""
+    return DeviceInfo(
+        identifiers={(DOMAIN, station_gid)},
+        name=station_name,
+        manufacturer="Västtrafik",
+        model="M34 Departure Monitor",
+        entry_type=DeviceEntryType.SERVICE,
     )
 
 
@@ -67,8 +372,21 @@ class VasttrafikDataUpdateCoordinator(DataUpdateCoordinator):
     def __init__(
         self,
         hass: HomeAssistant,
-        auth_key: str,
+        credentials: CredentialPool,
         station_gid: str,
+        request_layer: RequestLayer,
+        hedge_budget: HedgeBudget,
+        single_flight: SingleFlight,
+        shared_cache: SharedCache | None,
+        min_refresh_spacing: float,
+        situations: SituationFeed,
+        journeys: JourneyTracker,
+        max_inferred_age: float,
+        punctuality: PunctualityTracker | None,
+        gate: PollGate,
+        idle_interval: float,
+        timetable: TimetableSnapshot | None = None,
+        direction_gid: str = DEFAULT_DIRECTION_GID,
     ) -> None:
         """Initialize the coordinator."""
         super().__init__(
@@ -77,134 +395,535 @@ class VasttrafikDataUpdateCoordinator(DataUpdateCoordinator):
             name=DOMAIN,
             update_interval=SCAN_INTERVAL,
         )
-        self._auth_key = auth_key
+        # Departures requests use the pool, everything else the entry's own key
+        self.credentials = credentials
+        self.token_manager = credentials.primary.token_manager
+        self.planner = credentials.primary.planner
         self._station_gid = station_gid
-        self._access_token: str | None = None
-        self._token_expires_at: datetime | None = None
+        # Stop areas whose departures this coordinator fetches
+        self.station_gids = [station_gid]
+        self.request_layer = request_layer
+        self.hedge_budget = hedge_budget
+        self.latency = LatencyTracker()
+        self.single_flight = single_flight
+        # Departures shared with other instances on the host, if configured
+        self.shared_cache = shared_cache
+        self.situations = situations
+        self.journeys = journeys
+        self._max_inferred_age = max_inferred_age
+        # Departures of the last real fetch, the base for inference
+        self._fetched_departures: list[dict[str, Any]] = []
+        # Refreshes answered from upstream stations instead of a request
+        self.inferred_refreshes = 0
+        # Departure delays folded into long-term statistics, if enabled
+        self.punctuality = punctuality
+        # Planned departures when only the realtime window is polled
+        self.timetable = timetable
+        # Stop area the departures must pass, empty for every direction
+        self._direction_gid = direction_gid
+        self.gate = gate
+        # Heartbeat while no polling condition holds, None stops polling
+        self._idle_interval = (
+            timedelta(minutes=idle_interval) if idle_interval else None
+        )
+        self._min_refresh_spacing = min_refresh_spacing
+        self._last_fetch: float | None = None
+        # Manual refreshes answered from cache because of the spacing
+        self.served_from_cache = 0
+        # Refresh run once the spacing has passed, for those answers
+        self._unsub_deferred_refresh: CALLBACK_TYPE | None = None
+        # Time each refresh holds the event loop
+        self.refresh_timer = RefreshTimer(hass, station_gid)
+        # Number of enabled departure sensors reading this coordinator
+        self.consumers = 0
+        # Entities re-rendering when display options change
+        self._options_listeners: list[Callable[[Mapping[str, Any]], None]] = []
     
-    async def _get_access_token(self) -> str:
-        """Get or refresh OAuth2 access token."""
-        # Check if we have a valid token
-        if (
-            self._access_token
-            and self._token_expires_at
-            and datetime.now() < self._token_expires_at
-        ):
-            return self._access_token
+    def has_consumers(self) -> bool:
+        """Return True if any departure sensor uses this station."""
+        return self.consumers > 0 and self.gate.active
+    
+    def _scheduled_interval(self) -> timedelta | None:
+        """Return the interval until the next refresh, None to stop polling."""
+        interval = self.credentials.interval_for(self._station_gid)
+        if self.gate.active:
+            return interval
+        if self._idle_interval is None:
+            return None
+        return max(interval, self._idle_interval)
+    
+    def _filter_params(self) -> dict[str, Any]:
+        """Return the filter query parameters of departures requests."""
+        if not self._direction_gid:
+            return {}
+        return {"directionGid": self._direction_gid}
+    
+    def _fetch_key(self, station_gid: str) -> str:
+        """Return the key a stop area's fetches are shared under.
         
-        # Get new token
-        headers = {
-            "Authorization": f"Basic {self._auth_key}",
-            "Content-Type": "application/x-www-form-urlencoded",
-        }
+        Departures filtered by direction differ from the stop area's full
+        departures, so they are not shared with entries without the filter.
+        """
+        if not self._direction_gid:
+            return station_gid
+        return f"{station_gid}>{self._direction_gid}"
+    
+    @callback
+    def async_add_options_listener(
+        self, listener: Callable[[Mapping[str, Any]], None]
+    ) -> CALLBACK_TYPE:
+        """Call listener with the new options, return a removal callback."""
+        self._options_listeners.append(listener)
         
-        data = {"grant_type": "client_credentials"}
+        @callback
+        def _remove() -> None:
+            self._options_listeners.remove(listener)
         
+        return _remove
+    
+    @callback
+    def async_apply_options(self, options: Mapping[str, Any]) -> None:
+        """Apply changed polling, filter and display options without a reload.
+        
+        Nothing is fetched: a new direction filter is sent with the next
+        scheduled request, the timer is rescheduled for the new interval and
+        the entities re-render the departures they already have.
+        """
+        self.hedge_budget.update_percent(
+            options.get(CONF_HEDGE_BUDGET, DEFAULT_HEDGE_BUDGET)
+        )
+        self._min_refresh_spacing = options.get(
+            CONF_MIN_REFRESH_SPACING, DEFAULT_MIN_REFRESH_SPACING
+        )
+        self._max_inferred_age = options.get(
+            CONF_MAX_INFERRED_AGE, DEFAULT_MAX_INFERRED_AGE
+        )
+        self._direction_gid = options.get(CONF_DIRECTION_GID, DEFAULT_DIRECTION_GID)
+        idle_interval = options.get(CONF_IDLE_INTERVAL, DEFAULT_IDLE_INTERVAL)
+        self._idle_interval = (
+            timedelta(minutes=idle_interval) if idle_interval else None
+        )
+        self.credentials.async_update_budget(
+            self._station_gid,
+            options.get(CONF_DAILY_REQUEST_BUDGET, DEFAULT_DAILY_REQUEST_BUDGET),
+        )
+        # A condition that now holds wakes the station by itself
+        self.gate.async_set_conditions(
+            options.get(CONF_POLL_CONDITIONS, []),
+            options.get(CONF_POLL_WHEN_VIEWED, DEFAULT_POLL_WHEN_VIEWED),
+        )
+        self.update_interval = self._scheduled_interval()
+        self._schedule_refresh()
+        for listener in list(self._options_listeners):
+            listener(options)
+    
+    async def async_wake(self) -> None:
+        """Resume polling at once when a polling condition becomes true."""
+        self.update_interval = self._scheduled_interval()
+        # Polling may have been stopped, a refresh within the spacing does
+        # not reschedule it
+        self._schedule_refresh()
+        await self.async_request_refresh()
+    
+    async def _request_departures(
+        self,
+        session: aiohttp.ClientSession,
+        station_gid: str,
+        access_token: str,
+        params: dict[str, Any],
+        credential: Credential,
+    ) -> list[dict[str, Any]]:
+        """Send one departures request and return the parsed departures."""
+    
+        def _request(
+            method: str, url: str, **kwargs: Any
+        ) -> AbstractAsyncContextManager[aiohttp.ClientResponse]:
+            return self.request_layer.request(
+                session,
+                method,
+                url,
+                # Each key has its own rate limit
+                endpoint=f"{urlsplit(url).path}:{credential.key_id}",
+                on_send=credential.planner.async_record_request,
+                **kwargs,
+            )
+    
+        started = time.monotonic()
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(TOKEN_URL, headers=headers, data=data) as response:
-                    if response.status != 200:
-                        error_text = await response.text()
-                        _LOGGER.error("Token request failed: %s - %s", response.status, error_text)
-                        raise UpdateFailed(f"Failed to get access token: {response.status}")
-                    
-                    result = await response.json()
-                    self._access_token = result["access_token"]
-                    expires_in = result.get("expires_in", 86400)
-                    
-                    # Set expiration time with 5 minute buffer
-                    self._token_expires_at = datetime.now() + timedelta(seconds=expires_in - 300)
-                    
-                    _LOGGER.debug("Got new access token, expires in %s seconds", expires_in)
-                    return self._access_token
-        except aiohttp.ClientError as ex:
-            _LOGGER.error("Network error during token request: %s", ex)
-            raise UpdateFailed(f"Network error: {ex}") from ex
+            departures = await async_fetch_departures(
+                session,
+                access_token,
+                station_gid,
+                params,
+                api_base=API_BASE,
+                request=_request,
+            )
+        except AuthenticationError as ex:
+            # Token expired, clear it and retry
+            credential.token_manager.invalidate()
+            self.credentials.record_failure(credential)
+            raise UpdateFailed("Access token expired, will retry") from ex
+        except ApiError as ex:
+            _LOGGER.error("Departures request failed: %s - %s", ex.status, ex.text)
+            raise UpdateFailed(f"Failed to get departures: {ex.status}") from ex
+        self.latency.record(time.monotonic() - started)
+        return departures
+    
+    async def _fetch_departures(
+        self,
+        session: aiohttp.ClientSession,
+        station_gid: str,
+        access_token: str,
+        params: dict[str, Any],
+        credential: Credential,
+    ) -> list[dict[str, Any]]:
+        """Fetch departures, hedging with a second request on slow answers.
+        
+        When the first request has not answered within the tracked p95
+        latency and the hedge budget allows, a second identical request is
+        sent and whichever answers first wins.
+        """
+        primary = asyncio.create_task(
+            self._request_departures(
+                session, station_gid, access_token, params, credential
+            )
+        )
+        if not self.hedge_budget.enabled:
+            return await primary
+        self.hedge_budget.earn()
+        if (hedge_delay := self.latency.hedge_delay()) is None:
+            return await primary
+        
+        done, _ = await asyncio.wait({primary}, timeout=hedge_delay)
+        if done or not self.hedge_budget.try_spend():
+            return await primary
+        
+        _LOGGER.debug(
+            "Departures for %s slower than %.2fs, sending hedged request",
+            self._station_gid,
+            hedge_delay,
+        )
+        hedge = asyncio.create_task(
+            self._request_departures(
+                session, station_gid, access_token, params, credential
+            )
+        )
+        pending = {primary, hedge}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                # Look at every finished task so no exception goes unretrieved
+                succeeded = [task for task in done if task.exception() is None]
+                if succeeded:
+                    if hedge in succeeded:
+                        self.hedge_budget.wins += 1
+                    return succeeded[0].result()
+        finally:
+            for task in pending:
+                task.cancel()
+        # Both failed, report the original request's error
+        return primary.result()
     
     async def _async_update_data(self) -> dict[str, Any]:
+        """Fetch data from Västtrafik API, timing the refresh."""
+        return await self.refresh_timer.async_run(self._async_update_departures)
+    
+    async def _async_update_departures(self) -> dict[str, Any]:
         """Fetch data from Västtrafik API."""
+        self.update_interval = self._scheduled_interval()
+        if self.update_interval is None and self.data is not None:
+            # Nobody around: keep the last departures until a condition wakes us
+            return self.data
+        if (inferred := self._infer_departures()) is not None:
+            return inferred
+        if not self.credentials.async_allow_request(self.data is not None):
+            if self.timetable is not None and self.timetable.loaded:
+                # Planned times cost no request
+                now = dt_util.now()
+                return {
+                    **(self.data or {}),
+                    "departures": self.timetable.planned(
+                        now, now + timedelta(minutes=DEPARTURES_WINDOW_MINUTES)
+                    ),
+                    "last_update": datetime.now().isoformat(),
+                    "quota_limited": True,
+                }
+            if self.data is None:
+                raise UpdateFailed("Daily request budget exhausted")
+            # Keep serving the last departures instead of running into 429s
+            return {**self.data, "quota_limited": True}
+        
+        data = await self._async_fetch()
+        self._last_fetch = time.monotonic()
+        # This fetch answers any manual refresh that was deferred
+        self._cancel_deferred_refresh()
+        self._fetched_departures = data["departures"]
+        self.credentials.async_update_demand(
+            self._station_gid, len(data["departures"])
+        )
+        return {
+            **data,
+            "situations": await self._async_situations(data["departures"]),
+            "inferred": False,
+        }
+    
+    def _infer_departures(self) -> dict[str, Any] | None:
+        """Return departures updated from upstream stations, None to fetch.
+        
+        A real fetch is forced once the last one is older than the
+        configured bound, or when too few of the station's departures have
+        been seen upstream since then.
+        """
+        if (
+            not self._max_inferred_age
+            or self.data is None
+            or self._last_fetch is None
+            or time.monotonic() - self._last_fetch >= self._max_inferred_age
+        ):
+            return None
+        departures, updated = self.journeys.infer(
+            self._station_gid, self._fetched_departures, self._last_fetch
+        )
+        if not departures or updated < len(departures) * INFERENCE_MIN_COVERAGE:
+            return None
+        self.inferred_refreshes += 1
+        return {
+            **self.data,
+            "departures": departures,
+            "last_update": datetime.now().isoformat(),
+            "quota_limited": False,
+            "inferred": True,
+        }
+    
+    async def _async_situations(
+        self, departures: list[dict[str, Any]]
+    ) -> list[dict[str, Any]]:
+        """Return the traffic situations affecting the station or its lines."""
+        try:
+            index = await self.situations.async_refresh()
+        except (HomeAssistantError, aiohttp.ClientError, asyncio.TimeoutError) as ex:
+            _LOGGER.debug("Could not refresh traffic situations: %s", ex)
+            index = self.situations.index
+        lines = {dep["line_designation"] for dep in departures}
+        lines.update(dep["line_number"] for dep in departures)
+        return index.lookup(self.station_gids, lines)
+    
+    async def _async_fetch(self) -> dict[str, Any]:
+        """Fetch the station's departures, joining a fetch already running."""
+        if self.timetable is not None:
+            return await self._async_fetch_realtime()
+        return await self.single_flight.run(
+            self._fetch_key(self._station_gid),
+            partial(self._fetch_shared, self._station_gid),
+        )
+    
+    async def _fetch_shared(self, station_gid: str) -> dict[str, Any]:
+        """Fetch a stop area's departures unless another instance just did."""
+        if self.shared_cache is None:
+            return await self._fetch_station_departures(station_gid)
+        # Another instance's result is fresh enough for this polling interval
+        max_age = (self.update_interval or SCAN_INTERVAL).total_seconds()
+        data, fetched = await self.shared_cache.async_run(
+            self._fetch_key(station_gid),
+            max_age,
+            partial(self._fetch_station_departures, station_gid),
+        )
+        if not fetched:
+            self._observe(station_gid, data["departures"])
+        return data
+    
+    async def _async_fetch_realtime(self) -> dict[str, Any]:
+        """Lay a short realtime window over the planned timetable."""
+        now = dt_util.now()
+        window = timedelta(minutes=DEPARTURES_WINDOW_MINUTES)
+        realtime_window = timedelta(minutes=TIMETABLE_REALTIME_MINUTES)
+        if (
+            self.timetable.needs_refresh(now, window)
+            or self.timetable.filters != self._filter_params()
+        ):
+            try:
+                await self._async_refresh_timetable(now)
+            except UpdateFailed as ex:
+                if not self.timetable.loaded:
+                    raise
+                _LOGGER.warning(
+                    "Could not refresh the timetable of %s, using the stored one: %s",
+                    self._station_gid,
+                    ex,
+                )
+        
+        if not self.timetable.planned(now, now + realtime_window):
+            # Nothing planned soon, e.g. at night: no request needed
+            departures = self.timetable.planned(now, now + window)
+        else:
+            data = await self.single_flight.run(
+                f"{self._fetch_key(self._station_gid)}:realtime",
+                partial(
+                    self._fetch_station_departures,
+                    self._station_gid,
+                    {
+                        "timeSpanInMinutes": TIMETABLE_REALTIME_MINUTES,
+                        "limit": TIMETABLE_PAGE_SIZE,
+                    },
+                ),
+            )
+            departures = self.timetable.overlay(
+                data["departures"], now, realtime_window, window
+            )
+        return {
+            "departures": departures,
+            "last_update": datetime.now().isoformat(),
+            "quota_limited": False,
+        }
+    
+    async def _async_refresh_timetable(self, now: datetime) -> None:
+        """Download the planned departures until the next service day starts."""
+        # pylint: disable-next=import-outside-toplevel
+        from .timetable import departure_key, snapshot_end
+        
+        until = snapshot_end(now)
+        departures: dict[str, dict[str, Any]] = {}
+        start = now
+        while start < until:
+            span = min(
+                TIMETABLE_CHUNK_MINUTES, math.ceil((until - start).total_seconds() / 60)
+            )
+            offset = 0
+            while True:
+                data = await self._fetch_station_departures(
+                    self._station_gid,
+                    {
+                        "startDateTime": start.isoformat(),
+                        "timeSpanInMinutes": span,
+                        "limit": TIMETABLE_PAGE_SIZE,
+                        "offset": offset,
+                    },
+                    observe=False,
+                )
+                # Chunks overlap at their edges
+                for departure in data["departures"]:
+                    departures.setdefault(departure_key(departure), departure)
+                if len(data["departures"]) < TIMETABLE_PAGE_SIZE:
+                    break
+                offset += TIMETABLE_PAGE_SIZE
+            start += timedelta(minutes=span)
+        
+        await self.timetable.async_set(
+            list(departures.values()), until, self._filter_params()
+        )
+        _LOGGER.debug(
+            "Stored %s planned departures for %s until %s",
+            len(departures),
+            self._station_gid,
+            until,
+        )
+    
+    async def async_request_refresh(self) -> None:
+        """Request a refresh unless the data is still fresh enough.
+        
+        Manual refreshes (``homeassistant.update_entity``, dashboards) that
+        arrive within the minimum spacing of the last fetch are answered
+        with the cached departures at once. One refresh is still run when
+        the spacing has passed, unless a scheduled fetch comes first.
+        """
+        if (
+            self.last_update_success
+            and self._last_fetch is not None
+            and (elapsed := time.monotonic() - self._last_fetch)
+            < self._min_refresh_spacing
+        ):
+            self.served_from_cache += 1
+            _LOGGER.debug(
+                "Refresh of %s within %s seconds of the last fetch, serving cache",
+                self._station_gid,
+                self._min_refresh_spacing,
+            )
+            if self._unsub_deferred_refresh is None:
+                self._unsub_deferred_refresh = async_call_later(
+                    self.hass,
+                    self._min_refresh_spacing - elapsed,
+                    self._async_deferred_refresh,
+                )
+            return
+        await super().async_request_refresh()
+    
+    async def _async_deferred_refresh(self, _now: datetime) -> None:
+        """Run the refresh deferred by the minimum spacing."""
+        self._unsub_deferred_refresh = None
+        await self.async_refresh()
+    
+    @callback
+    def _cancel_deferred_refresh(self) -> None:
+        """Cancel a deferred manual refresh."""
+        if self._unsub_deferred_refresh is not None:
+            self._unsub_deferred_refresh()
+            self._unsub_deferred_refresh = None
+    
+    async def async_shutdown(self) -> None:
+        """Cancel a deferred refresh along with the scheduled ones."""
+        self._cancel_deferred_refresh()
+        await super().async_shutdown()
+    
+    def _observe(self, station_gid: str, departures: list[dict[str, Any]]) -> None:
+        """Record realtime departures for inference and statistics."""
+        self.journeys.observe(station_gid, departures)
+        if self.punctuality is not None:
+            self.punctuality.observe(station_gid, departures)
+    
+    async def _fetch_station_departures(
+        self,
+        station_gid: str,
+        params: dict[str, Any] | None = None,
+        observe: bool = True,
+    ) -> dict[str, Any]:
+        """Fetch and parse the departures for a stop area.
+        
+        Realtime fetches are recorded for cross-station inference; planned
+        timetable downloads pass ``observe=False``.
+        """
+        credential = self.credentials.select()
         try:
             # Get valid access token
-            access_token = await self._get_access_token()
-            
-            # Fetch departures
-            headers = {
-                "Authorization": f"Bearer {access_token}",
-            }
+            access_token = await credential.token_manager.async_get_token()
             
-            # Get current time in RFC 3339 format
-            now = datetime.now().astimezone().isoformat()
-            
-            params = {
-                "timeSpanInMinutes": 60,  # Next hour
+            params = params or {
+                "timeSpanInMinutes": DEPARTURES_WINDOW_MINUTES,  # Next hour
                 "maxDeparturesPerLine": 2,  # Max 2 per line
             }
+            params = {**params, **self._filter_params()}
+    
+            async with aiohttp.ClientSession(timeout=REQUEST_TIMEOUT) as session:
+                departures = await self._fetch_departures(
+                    session, station_gid, access_token, params, credential
+                )
+            self.credentials.record_success(credential)
+    
+            if observe:
+                self._observe(station_gid, departures)
             
-            url = f"{API_BASE}/stop-areas/{self._station_gid}/departures"
-            
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, headers=headers, params=params) as response:
-                    if response.status == 401:
-                        # Token expired, clear it and retry
-                        self._access_token = None
-                        self._token_expires_at = None
-                        raise UpdateFailed("Access token expired, will retry")
-                    
-                    if response.status != 200:
-                        error_text = await response.text()
-                        _LOGGER.error("Departures request failed: %s - %s", response.status, error_text)
-                        raise UpdateFailed(f"Failed to get departures: {response.status}")
-                    
-                    result = await response.json()
-                    
-                    # Parse the response
-                    departures = []
-                    results_list = result.get("results", [])
-                    
-                    for departure in results_list:
-                        service_journey = departure.get("serviceJourney", {})
-                        
-                        # Get times
-                        planned_time = departure.get("plannedTime")
-                        estimated_time = departure.get("estimatedTime")
-                        
-                        # Calculate delay
-                        delay_minutes = 0
-                        if estimated_time and planned_time:
-                            try:
-                                planned_dt = datetime.fromisoformat(planned_time.replace('Z', '+00:00'))
-                                estimated_dt = datetime.fromisoformat(estimated_time.replace('Z', '+00:00'))
-                                delay_minutes = int((estimated_dt - planned_dt).total_seconds() / 60)
-                            except Exception as ex:
-                                _LOGGER.debug("Could not calculate delay: %s", ex)
-                        
-                        # Get track/platform info - stopPoint can be a string or dict
-                        track = ""
-                        stop_point = departure.get("stopPoint", {})
-                        if isinstance(stop_point, dict):
-                            platform = stop_point.get("platform", {})
-                            if isinstance(platform, dict):
-                                track = platform.get("name", "")
-                            elif isinstance(platform, str):
-                                track = platform
-                        
-                        departures.append({
-                            "line_number": service_journey.get("line", {}).get("name", "?"),
-                            "line_designation": service_journey.get("line", {}).get("designation", ""),
-                            "direction": service_journey.get("direction", ""),
-                            "planned_time": planned_time,
-                            "estimated_time": estimated_time or planned_time,
-                            "delay_minutes": delay_minutes,
-                            "track": track,
-                            "is_cancelled": departure.get("isCancelled", False),
-                            "is_realtime": estimated_time is not None,
-                        })
-                    
-                    return {
-                        "departures": departures,
-                        "last_update": datetime.now().isoformat(),
-                    }
+            return {
+                "departures": departures,
+                "last_update": datetime.now().isoformat(),
+                "quota_limited": False,
+            }
         
+        except TokenRequestFailed as ex:
+            self.credentials.record_failure(credential)
+            raise UpdateFailed(str(ex)) from ex
+        except RequestBlocked as ex:
+            raise UpdateFailed(f"{ex}, retrying in {ex.retry_in:.0f} seconds") from ex
+        except RateLimited as ex:
+            if ex.status == 429:
+                self.credentials.record_failure(credential)
+            _LOGGER.warning("Departures request for %s throttled: %s", station_gid, ex)
+            raise UpdateFailed(str(ex)) from ex
+        except UpdateFailed:
+            raise
+        except asyncio.TimeoutError as ex:
+            _LOGGER.warning("Request for %s to Västtrafik API timed out", station_gid)
+            raise UpdateFailed("Request to Västtrafik API timed out") from ex
         except aiohttp.ClientError as ex:
             _LOGGER.error("Network error during data update: %s", ex)
             raise UpdateFailed(f"Network error: {ex}") from ex
@@ -213,6 +932,66 @@ class VasttrafikDataUpdateCoordinator(DataUpdateCoordinator):
             raise UpdateFailed(f"Unexpected error: {ex}") from ex
 
 
+class VasttrafikBoardCoordinator(VasttrafikDataUpdateCoordinator):
+    """Fetch several stop areas and merge them into one departure board."""
+    
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        board_id: str,
+        station_gids: list[str],
+        station_names: list[str],
+        **kwargs: Any,
+    ) -> None:
+        """Initialize the coordinator."""
+        super().__init__(hass, station_gid=board_id, **kwargs)
+        self.station_gids = list(station_gids)
+        self._station_names = dict(zip(station_gids, station_names))
+        # Last departures per stop, kept for stops whose fetch fails
+        self._stop_departures: dict[str, list[dict[str, Any]]] = {}
+    
+    async def _async_fetch(self) -> dict[str, Any]:
+        """Fetch every stop concurrently and merge their departures.
+        
+        Each stop goes through the shared single-flight, so a stop that is
+        also configured on its own is not fetched twice at the same moment.
+        A stop that fails keeps its previous departures as long as at least
+        one stop answered, and is listed in ``failed_stops``.
+        """
+        results = await asyncio.gather(
+            *(
+                self.single_flight.run(
+                    self._fetch_key(gid), partial(self._fetch_shared, gid)
+                )
+                for gid in self.station_gids
+            ),
+            return_exceptions=True,
+        )
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if len(errors) == len(results):
+            raise errors[0]
+        failed_stops = []
+        for gid, result in zip(self.station_gids, results):
+            if isinstance(result, BaseException):
+                _LOGGER.debug("Keeping previous departures for %s: %s", gid, result)
+                failed_stops.append(gid)
+            else:
+                self._stop_departures[gid] = result["departures"]
+        
+        return {
+            "departures": merge_departures(
+                [
+                    (gid, self._station_names.get(gid, gid), self._stop_departures[gid])
+                    for gid in self.station_gids
+                    if gid in self._stop_departures
+                ]
+            ),
+            "last_update": datetime.now().isoformat(),
+            "quota_limited": False,
+            "failed_stops": failed_stops,
+        }
+
+
 class VasttrafikM34Sensor(CoordinatorEntity, SensorEntity):
     """Representation of a Västtrafik M34 sensor."""
     
@@ -224,34 +1003,105 @@ class VasttrafikM34Sensor(CoordinatorEntity, SensorEntity):
         coordinator: VasttrafikDataUpdateCoordinator,
         station_name: str,
         station_gid: str,
+        stop: StopArea | None = None,
+        station_gids: list[str] | None = None,
+        attribute_format: str = DEFAULT_ATTRIBUTE_FORMAT,
+        attribute_bytes: int = DEFAULT_ATTRIBUTE_BYTES,
+        legacy_departures: bool = DEFAULT_LEGACY_DEPARTURES,
+        lines: str = DEFAULT_LINES,
+        destination: str = DEFAULT_DESTINATION,
+        max_departures: int = DEFAULT_MAX_DEPARTURES,
     ) -> None:
         """Initialize the sensor."""
         super().__init__(coordinator)
         
         self._station_name = station_name
         self._station_gid = station_gid
+        self._stop = stop
+        self._station_gids = station_gids or [station_gid]
+        self._attribute_format = attribute_format
+        # Byte budget of the departures attribute, 0 for no limit
+        self._attribute_bytes = attribute_bytes
+        self._legacy_departures = legacy_departures
+        # Lines and part of the destination shown, empty for all
+        self._lines = _parse_lines(lines)
+        self._destination = destination.casefold()
+        self._max_departures = max_departures
         self._attr_unique_id = f"vasttrafik_{station_gid}"
         self._attr_icon = "mdi:tram"
-        self._attr_device_info = DeviceInfo(
-            identifiers={(DOMAIN, station_gid)},
-            name=station_name,
-            manufacturer="Västtrafik",
-            model="M34 Departure Monitor",
-            entry_type=DeviceEntryType.SERVICE,
+        self._attr_device_info = _station_device_info(station_name, station_gid)
+    
+    async def async_added_to_hass(self) -> None:
+        """Count this sensor as a consumer of the station's departures."""
+        await super().async_added_to_hass()
+        self.coordinator.consumers += 1
+        self.async_on_remove(
+            self.coordinator.async_add_options_listener(self._async_apply_options)
+        )
+    
+    @callback
+    def _async_apply_options(self, options: Mapping[str, Any]) -> None:
+        """Re-render the attributes with changed filter and display options."""
+        self._attribute_format = options.get(
+            CONF_ATTRIBUTE_FORMAT, DEFAULT_ATTRIBUTE_FORMAT
+        )
+        self._attribute_bytes = options.get(
+            CONF_ATTRIBUTE_BYTES, DEFAULT_ATTRIBUTE_BYTES
         )
+        self._legacy_departures = options.get(
+            CONF_LEGACY_DEPARTURES, DEFAULT_LEGACY_DEPARTURES
+        )
+        self._lines = _parse_lines(options.get(CONF_LINES, DEFAULT_LINES))
+        self._destination = options.get(
+            CONF_DESTINATION, DEFAULT_DESTINATION
+        ).casefold()
+        self._max_departures = options.get(
+            CONF_MAX_DEPARTURES, DEFAULT_MAX_DEPARTURES
+        )
+        self.async_write_ha_state()
+    
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Render the new departures, profiled while a profile runs."""
+        async_profile_render(
+            self.hass, self._station_gid, super()._handle_coordinator_update
+        )
+    
+    async def async_will_remove_from_hass(self) -> None:
+        """Stop counting this sensor as a consumer."""
+        self.coordinator.consumers -= 1
+        await super().async_will_remove_from_hass()
         
     @property
     def available(self) -> bool:
         """Return if entity is available."""
         return self.coordinator.last_update_success
     
+    def _shown_departures(self) -> list[dict[str, Any]]:
+        """Return the departures passing the line and destination filters."""
+        departures = self.coordinator.data.get("departures", [])
+        if self._lines:
+            departures = [
+                dep
+                for dep in departures
+                if dep.get("line_number", "").casefold() in self._lines
+                or dep.get("line_designation", "").casefold() in self._lines
+            ]
+        if self._destination:
+            departures = [
+                dep
+                for dep in departures
+                if self._destination in dep.get("direction", "").casefold()
+            ]
+        return departures
+    
     @property
     def native_value(self) -> str | None:
         """Return the state of the sensor."""
         if not self.coordinator.data:
             return None
         
-        departures = self.coordinator.data.get("departures", [])
+        departures = self._shown_departures()
         if not departures:
             return "Inga avgångar"
         
@@ -260,83 +1110,152 @@ class VasttrafikM34Sensor(CoordinatorEntity, SensorEntity):
     
     @property
     def extra_state_attributes(self) -> dict[str, Any]:
-        """Return the state attributes."""
+        """Return the state attributes.
+        
+        With a size limit the last departures, then the last traffic
+        situations, are left out until all attributes fit.
+        """
         if not self.coordinator.data:
             return {}
         
-        departures = self.coordinator.data.get("departures", [])
-        last_update = self.coordinator.data.get("last_update")
+        departures = self._shown_departures()
+        shown = departures[: self._max_departures]
+        attributes: dict[str, Any] = {
+            "station_name": self._station_name,
+            "station_gid": self._station_gid,
+            **self._board_attributes(),
+            "departure_count": len(departures),
+            "last_update": self.coordinator.data.get("last_update"),
+            "quota_limited": self.coordinator.data.get("quota_limited", False),
+            "inferred": self.coordinator.data.get("inferred", False),
+            **self._position_attributes(),
+        }
         
-        # Format departures for display (legacy string format for backwards compatibility)
-        departure_list = []
-        # New: Structured JSON array for easy parsing
-        departure_details = []
+        # Only the formats that are shown are built
+        legacy = (
+            [_legacy_departure(dep) for dep in shown]
+            if self._legacy_departures
+            else None
+        )
+        if self._attribute_format == ATTRIBUTE_FORMAT_COLUMNAR:
+            # Parallel arrays per field
+            key, rows_of, render = "departures_columnar", shown, columnar_departures
+        else:
+            key, render = "departures_json", list
+            rows_of = [_departure_detail(dep) for dep in shown]
         
-        for dep in departures[:15]:  # Show max 15 departures
-            estimated_time = dep.get("estimated_time", "")
-            
-            try:
-                dt = datetime.fromisoformat(estimated_time.replace('Z', '+00:00'))
-                now = datetime.now().astimezone()
-                minutes = int((dt - now).total_seconds() / 60)
-                
-                # Relative time
-                if minutes <= 0:
-                    time_str = "Nu"
-                elif minutes == 1:
-                    time_str = "1 min"
-                else:
-                    time_str = f"{minutes} min"
-                
-                # Actual departure time (HH:MM)
-                actual_time = dt.strftime("%H:%M")
-                
-            except Exception:
-                time_str = "?"
-                actual_time = estimated_time
-                minutes = 0
-            
-            # Delay information
-            delay = dep.get("delay_minutes", 0)
-            delay_str = ""
-            if delay > 0:
-                delay_str = f" (+{delay})"
-            elif delay < 0:
-                delay_str = f" ({delay})"
-            
-            # Cancelled indicator (no red ball)
-            cancelled = " [INSTÄLLD]" if dep.get("is_cancelled") else ""
-            
-            # Track/platform info
-            track = dep.get("track", "")
-            track_str = f" Läge {track}" if track else ""
-            
-            # Format for display: "Linje 16 → Bergsjön - 14:25 (2 min) Läge B"
-            departure_list.append(
-                f"Linje {dep.get('line_number', '?')} → {dep.get('direction', '?')} - "
-                f"{actual_time} ({time_str}){delay_str}{track_str}{cancelled}"
-            )
-            
-            # New structured format
-            departure_details.append({
-                "line": dep.get("line_number", "?"),
-                "destination": dep.get("direction", "?"),
-                "departure_time": actual_time,
-                "relative_time": time_str,
-                "minutes_until": minutes,
-                "track": track,
-                "delay_minutes": delay,
-                "is_cancelled": dep.get("is_cancelled", False),
-                "is_realtime": dep.get("is_realtime", False),
-                "planned_time": dep.get("planned_time", ""),
-                "estimated_time": estimated_time,
-            })
+        def with_rows(rows: int) -> dict[str, Any]:
+            rendered = {**attributes, key: render(rows_of[:rows])}
+            if legacy is not None:
+                rendered["departures"] = legacy[:rows]  # Legacy list of strings
+            return rendered
         
+        attributes = fit_rows(with_rows, len(shown), self._attribute_bytes)
+        situations = self.coordinator.data.get("situations", [])
+        return fit_rows(
+            lambda rows: {**attributes, "situations": situations[:rows]},
+            len(situations),
+            self._attribute_bytes,
+        )
+    
+    def _board_attributes(self) -> dict[str, list[str]]:
+        """Return the stop areas of a combined board and those that failed."""
+        if len(self._station_gids) < 2:
+            return {}
         return {
-            "station_name": self._station_name,
-            "station_gid": self._station_gid,
-            "departures": departure_list,  # Legacy format (list of strings)
-            "departures_json": departure_details,  # New JSON array format
-            "departure_count": len(departures),
-            "last_update": last_update,
+            "station_gids": self._station_gids,
+            "failed_stops": self.coordinator.data.get("failed_stops", []),
+        }
+    
+    def _position_attributes(self) -> dict[str, float]:
+        """Return the station position if the stop-area cache knows it."""
+        if (
+            self._stop is None
+            or self._stop["latitude"] is None
+            or self._stop["longitude"] is None
+        ):
+            return {}
+        return {
+            "latitude": self._stop["latitude"],
+            "longitude": self._stop["longitude"],
+        }
+
+
+class VasttrafikQuotaRemainingSensor(CoordinatorEntity, SensorEntity):
+    """Requests left today in the daily budgets of the entry's auth keys."""
+    
+    _attr_has_entity_name = True
+    _attr_name = "Request budget remaining"
+    _attr_icon = "mdi:counter"
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_native_unit_of_measurement = "requests"
+    
+    def __init__(
+        self,
+        coordinator: VasttrafikDataUpdateCoordinator,
+        station_name: str,
+        station_gid: str,
+    ) -> None:
+        """Initialize the sensor."""
+        super().__init__(coordinator)
+        self._attr_unique_id = f"vasttrafik_{station_gid}_quota_remaining"
+        self._attr_device_info = _station_device_info(station_name, station_gid)
+    
+    @property
+    def available(self) -> bool:
+        """Return True, the budget is known even when the API is not."""
+        return True
+    
+    @property
+    def native_value(self) -> int:
+        """Return the number of requests left today."""
+        return self.coordinator.credentials.remaining
+    
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        """Return the state attributes, per key when several are pooled."""
+        credentials = self.coordinator.credentials
+        attributes: dict[str, Any] = {
+            "daily_budget": credentials.daily_budget,
+            "used_today": credentials.used,
+            "degraded": credentials.degraded,
+            "update_interval_seconds": (
+                int(self.coordinator.update_interval.total_seconds())
+                if self.coordinator.update_interval is not None
+                else None
+            ),
         }
+        if len(credentials.credentials) > 1:
+            attributes["auth_keys"] = credentials.as_dict()
+        return attributes
+
+
+class VasttrafikQuotaExhaustionSensor(CoordinatorEntity, SensorEntity):
+    """When the pooled daily budget runs out at the current request rate."""
+    
+    _attr_has_entity_name = True
+    _attr_name = "Request budget exhaustion"
+    _attr_icon = "mdi:timer-sand"
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_device_class = SensorDeviceClass.TIMESTAMP
+    
+    def __init__(
+        self,
+        coordinator: VasttrafikDataUpdateCoordinator,
+        station_name: str,
+        station_gid: str,
+    ) -> None:
+        """Initialize the sensor."""
+        super().__init__(coordinator)
+        self._attr_unique_id = f"vasttrafik_{station_gid}_quota_exhaustion"
+        self._attr_device_info = _station_device_info(station_name, station_gid)
+    
+    @property
+    def available(self) -> bool:
+        """Return True, the projection does not depend on the API."""
+        return True
+    
+    @property
+    def native_value(self) -> datetime | None:
+        """Return the projected exhaustion time, None if it lasts the day."""
+        return self.coordinator.credentials.projected_exhaustion
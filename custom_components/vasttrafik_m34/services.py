@@ -0,0 +1,307 @@
+"""Service actions and websocket commands for Västtrafik M34."""
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta
+from functools import partial
+from typing import TYPE_CHECKING, Any
+
+import aiohttp
+import voluptuous as vol
+
+from homeassistant.components import websocket_api
+from homeassistant.config_entries import ConfigEntryState
+from homeassistant.core import (
+    HomeAssistant,
+    ServiceCall,
+    ServiceResponse,
+    SupportsResponse,
+    callback,
+)
+from homeassistant.exceptions import HomeAssistantError, ServiceValidationError
+import homeassistant.helpers.config_validation as cv
+from homeassistant.util import dt as dt_util
+
+from .const import DEPARTURES_WINDOW_MINUTES, DOMAIN
+from .departure_query import async_get_index
+from .journey import async_fetch_journey_details, async_get_journey_cache
+from .profiling import async_run_profile
+from .subscription import DepartureStream
+
+if TYPE_CHECKING:
+    from .sensor import VasttrafikDataUpdateCoordinator
+
+ATTR_CONFIG_ENTRY_ID = "config_entry_id"
+ATTR_DETAILS_REFERENCE = "details_reference"
+ATTR_LINE = "line"
+ATTR_DIRECTION = "direction"
+ATTR_TRACK = "track"
+ATTR_LIMIT = "limit"
+ATTR_WITHIN_MINUTES = "within_minutes"
+ATTR_MAX_AGE = "max_age"
+ATTR_DURATION = "duration"
+
+SERVICE_GET_JOURNEY_DETAILS = "get_journey_details"
+SERVICE_GET_DEPARTURES = "get_departures"
+SERVICE_PROFILE = "profile"
+
+GET_JOURNEY_DETAILS_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_CONFIG_ENTRY_ID): cv.string,
+        vol.Required(ATTR_DETAILS_REFERENCE): cv.string,
+    }
+)
+
+GET_DEPARTURES_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_CONFIG_ENTRY_ID): cv.string,
+        vol.Optional(ATTR_LINE): cv.string,
+        vol.Optional(ATTR_DIRECTION): cv.string,
+        vol.Optional(ATTR_TRACK): cv.string,
+        vol.Optional(ATTR_LIMIT): vol.All(vol.Coerce(int), vol.Range(min=1)),
+        vol.Optional(ATTR_WITHIN_MINUTES): vol.All(
+            vol.Coerce(int), vol.Range(min=1, max=DEPARTURES_WINDOW_MINUTES)
+        ),
+        vol.Optional(ATTR_MAX_AGE): vol.All(vol.Coerce(int), vol.Range(min=0)),
+    }
+)
+
+PROFILE_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_DURATION, default=60): vol.All(
+            vol.Coerce(float), vol.Range(min=1, max=600)
+        ),
+    }
+)
+
+
+def _get_coordinator(
+    hass: HomeAssistant, entry_id: str
+) -> VasttrafikDataUpdateCoordinator:
+    """Return the coordinator of a loaded entry."""
+    entry = hass.config_entries.async_get_entry(entry_id)
+    if (
+        entry is None
+        or entry.domain != DOMAIN
+        or entry.state is not ConfigEntryState.LOADED
+    ):
+        raise ServiceValidationError(f"Västtrafik M34 entry {entry_id} is not loaded")
+    return entry.runtime_data
+
+
+async def async_get_journey_details(
+    hass: HomeAssistant, entry_id: str, details_reference: str
+) -> dict[str, Any]:
+    """Return the route of one of an entry's current departures."""
+    coordinator = _get_coordinator(hass, entry_id)
+    departure = next(
+        (
+            dep
+            for dep in (coordinator.data or {}).get("departures", [])
+            if dep.get("details_reference") == details_reference
+        ),
+        None,
+    )
+    if departure is None:
+        raise ServiceValidationError(
+            f"No current departure with details reference {details_reference}"
+        )
+
+    # Combined boards tag each departure with the stop it leaves from
+    stop_gid = departure.get("stop_gid", coordinator.station_gids[0])
+    credential = coordinator.credentials.select()
+    try:
+        return await async_get_journey_cache(hass).async_get(
+            details_reference,
+            partial(
+                async_fetch_journey_details,
+                credential.token_manager,
+                credential.planner,
+                coordinator.request_layer,
+                stop_gid,
+                details_reference,
+            ),
+        )
+    except (aiohttp.ClientError, asyncio.TimeoutError) as ex:
+        raise HomeAssistantError(f"Could not fetch journey details: {ex}") from ex
+
+
+def _data_age(coordinator: VasttrafikDataUpdateCoordinator) -> float | None:
+    """Return the age of the coordinator's departures in seconds."""
+    try:
+        updated = datetime.fromisoformat(coordinator.data["last_update"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    return (datetime.now() - updated).total_seconds()
+
+
+async def async_get_departures(
+    hass: HomeAssistant,
+    entry_id: str,
+    line: str | None = None,
+    direction: str | None = None,
+    track: str | None = None,
+    limit: int | None = None,
+    within_minutes: int | None = None,
+    max_age: int | None = None,
+) -> dict[str, Any]:
+    """Return an entry's upcoming departures matching the filters.
+
+    The answer comes from the coordinator's cached departures; they are
+    only refreshed first when older than ``max_age`` seconds.
+    """
+    coordinator = _get_coordinator(hass, entry_id)
+    if max_age is not None:
+        age = _data_age(coordinator)
+        if age is None or age > max_age:
+            await coordinator.async_refresh()
+
+    now = dt_util.now()
+    departures = async_get_index(hass, entry_id, coordinator).lookup(
+        now,
+        line=line,
+        direction=direction,
+        track=track,
+        limit=limit,
+        until=now + timedelta(minutes=within_minutes) if within_minutes else None,
+    )
+    return {
+        "departures": departures,
+        "last_update": (coordinator.data or {}).get("last_update"),
+    }
+
+
+@websocket_api.websocket_command(
+    {
+        vol.Required("type"): f"{DOMAIN}/journey_details",
+        vol.Required(ATTR_CONFIG_ENTRY_ID): str,
+        vol.Required(ATTR_DETAILS_REFERENCE): str,
+    }
+)
+@websocket_api.async_response
+async def websocket_journey_details(
+    hass: HomeAssistant,
+    connection: websocket_api.ActiveConnection,
+    msg: dict[str, Any],
+) -> None:
+    """Send the route of a departure to a dashboard card."""
+    try:
+        details = await async_get_journey_details(
+            hass, msg[ATTR_CONFIG_ENTRY_ID], msg[ATTR_DETAILS_REFERENCE]
+        )
+    except ServiceValidationError as ex:
+        connection.send_error(msg["id"], websocket_api.ERR_NOT_FOUND, str(ex))
+        return
+    except HomeAssistantError as ex:
+        connection.send_error(msg["id"], websocket_api.ERR_HOME_ASSISTANT_ERROR, str(ex))
+        return
+    connection.send_result(msg["id"], details)
+
+
+@websocket_api.websocket_command(
+    {
+        vol.Required("type"): f"{DOMAIN}/subscribe_departures",
+        vol.Required(ATTR_CONFIG_ENTRY_ID): str,
+        vol.Optional("lines"): [str],
+        vol.Optional("tracks"): [str],
+    }
+)
+@callback
+def websocket_subscribe_departures(
+    hass: HomeAssistant,
+    connection: websocket_api.ActiveConnection,
+    msg: dict[str, Any],
+) -> None:
+    """Stream a station's departures to a dashboard as diffs.
+
+    The first event carries every departure, later events only what was
+    added, removed or changed by a refresh. Only departures on the given
+    lines and tracks are sent.
+    """
+    try:
+        coordinator = _get_coordinator(hass, msg[ATTR_CONFIG_ENTRY_ID])
+    except ServiceValidationError as ex:
+        connection.send_error(msg["id"], websocket_api.ERR_NOT_FOUND, str(ex))
+        return
+    stream = DepartureStream(msg.get("lines"), msg.get("tracks"))
+
+    @callback
+    def _async_departures_updated() -> None:
+        diff = stream.diff((coordinator.data or {}).get("departures", []))
+        if diff is not None:
+            connection.send_message(websocket_api.event_message(msg["id"], diff))
+
+    remove_listener = coordinator.async_add_listener(_async_departures_updated)
+    # A subscribed dashboard can keep the station polling
+    remove_viewer = coordinator.gate.async_add_viewer()
+
+    @callback
+    def _async_unsubscribe() -> None:
+        remove_listener()
+        remove_viewer()
+
+    connection.subscriptions[msg["id"]] = _async_unsubscribe
+    connection.send_result(msg["id"])
+    connection.send_message(
+        websocket_api.event_message(
+            msg["id"],
+            stream.snapshot((coordinator.data or {}).get("departures", [])),
+        )
+    )
+
+
+@callback
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Register the integration's service actions and websocket commands."""
+
+    async def _async_handle_get_journey_details(call: ServiceCall) -> ServiceResponse:
+        """Handle the get_journey_details service action."""
+        return await async_get_journey_details(
+            hass,
+            call.data[ATTR_CONFIG_ENTRY_ID],
+            call.data[ATTR_DETAILS_REFERENCE],
+        )
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_GET_JOURNEY_DETAILS,
+        _async_handle_get_journey_details,
+        schema=GET_JOURNEY_DETAILS_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
+
+    async def _async_handle_get_departures(call: ServiceCall) -> ServiceResponse:
+        """Handle the get_departures service action."""
+        return await async_get_departures(
+            hass,
+            call.data[ATTR_CONFIG_ENTRY_ID],
+            line=call.data.get(ATTR_LINE),
+            direction=call.data.get(ATTR_DIRECTION),
+            track=call.data.get(ATTR_TRACK),
+            limit=call.data.get(ATTR_LIMIT),
+            within_minutes=call.data.get(ATTR_WITHIN_MINUTES),
+            max_age=call.data.get(ATTR_MAX_AGE),
+        )
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_GET_DEPARTURES,
+        _async_handle_get_departures,
+        schema=GET_DEPARTURES_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
+
+    async def _async_handle_profile(call: ServiceCall) -> ServiceResponse:
+        """Handle the profile service action."""
+        files = await async_run_profile(hass, call.data[ATTR_DURATION])
+        return {"files": files} if call.return_response else None
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_PROFILE,
+        _async_handle_profile,
+        schema=PROFILE_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+    websocket_api.async_register_command(hass, websocket_journey_details)
+    websocket_api.async_register_command(hass, websocket_subscribe_departures)
@@ -0,0 +1,308 @@
+"""Departures and tokens shared between Home Assistant instances.
+
+Several instances on one host (staging, one per building) that watch the
+same stop areas can point their entries at a common directory. The cache
+there holds the parsed departures of every stop area and the access token
+of every Authentication Key. A short lease per stop area makes sure only
+one instance fetches it per polling interval; the others wait for and read
+its result instead of spending their own requests.
+
+``SharedCache`` is the backend interface, ``SqliteSharedCache`` keeps
+everything in one SQLite database in WAL mode, so readers never block the
+instance that is writing.
+"""
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+import asyncio
+from collections.abc import Awaitable, Callable
+import json
+import logging
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from typing import Any
+
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP
+from homeassistant.core import Event, HomeAssistant, callback
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import instance_id
+
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+SHARED_CACHE_FILENAME = "vasttrafik_m34_cache.db"
+
+# A lease outlives any single fetch, an instance that dies while holding
+# one only delays the others this long
+SHARED_LEASE_SECONDS = 30
+
+# How often an instance waiting for another one's fetch looks for its result
+SHARED_POLL_SECONDS = 0.5
+
+# Told apart from other processes with the same instance id, e.g. a
+# restored backup running next to the original
+_PROCESS_ID = secrets.token_hex(4)
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS departures "
+    "(station_gid TEXT PRIMARY KEY, fetched_at REAL NOT NULL, payload TEXT NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS leases "
+    "(name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS tokens "
+    "(key_id TEXT PRIMARY KEY, token TEXT NOT NULL, expires_at REAL NOT NULL)",
+)
+
+
+class SharedCacheError(HomeAssistantError):
+    """Error to indicate the shared cache could not be read or written."""
+
+
+class SharedCache(ABC):
+    """Backend interface of the cache shared between instances.
+
+    Times are wall-clock epoch seconds, the only clock all instances share.
+    """
+
+    def __init__(self, hass: HomeAssistant, owner: str) -> None:
+        """Initialize the cache for one instance."""
+        self.hass = hass
+        self.owner = owner
+        # Fetches answered from another instance's result
+        self.hits = 0
+        self.fetches = 0
+        self._warned = False
+
+    @abstractmethod
+    async def async_get_departures(
+        self, station_gid: str, max_age: float
+    ) -> dict[str, Any] | None:
+        """Return departures fetched within max_age seconds, if any."""
+
+    @abstractmethod
+    async def async_set_departures(
+        self, station_gid: str, data: dict[str, Any]
+    ) -> None:
+        """Store freshly fetched departures."""
+
+    @abstractmethod
+    async def async_acquire(self, name: str, ttl: float) -> bool:
+        """Take or renew a lease, False if another instance holds it."""
+
+    @abstractmethod
+    async def async_release(self, name: str) -> None:
+        """Give up a lease this instance holds."""
+
+    @abstractmethod
+    async def async_get_token(self, key_id: str) -> tuple[str, float] | None:
+        """Return a stored access token and its expiry, if any."""
+
+    @abstractmethod
+    async def async_set_token(self, key_id: str, token: str, expires_at: float) -> None:
+        """Store an access token for the other instances."""
+
+    async def async_run(
+        self,
+        station_gid: str,
+        max_age: float,
+        fetch: Callable[[], Awaitable[dict[str, Any]]],
+    ) -> tuple[dict[str, Any], bool]:
+        """Return a stop area's departures and whether they were fetched here.
+
+        Fresh shared departures are returned as they are. Otherwise the
+        instance holding the stop area's lease fetches and stores them while
+        the others wait for that result; if the holder gives up without
+        one, the next instance to take the lease fetches. An unusable cache
+        never stops the fetch.
+        """
+        lease = f"departures:{station_gid}"
+        try:
+            while True:
+                data = await self.async_get_departures(station_gid, max_age)
+                if data is not None:
+                    self.hits += 1
+                    return data, False
+                if await self.async_acquire(lease, SHARED_LEASE_SECONDS):
+                    break
+                await asyncio.sleep(SHARED_POLL_SECONDS)
+        except SharedCacheError as ex:
+            if not self._warned:
+                self._warned = True
+                _LOGGER.warning("Shared cache unavailable, fetching directly: %s", ex)
+            return await fetch(), True
+
+        self._warned = False
+        try:
+            data = await fetch()
+            await self.async_set_departures(station_gid, data)
+        except SharedCacheError as ex:
+            _LOGGER.debug("Could not share the departures of %s: %s", station_gid, ex)
+        finally:
+            try:
+                await self.async_release(lease)
+            except SharedCacheError:
+                # The lease expires on its own
+                pass
+        self.fetches += 1
+        return data, True
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the state for diagnostics."""
+        return {"owner": self.owner, "hits": self.hits, "fetches": self.fetches}
+
+
+class SqliteSharedCache(SharedCache):
+    """Shared cache in a SQLite database in WAL mode."""
+
+    def __init__(self, hass: HomeAssistant, owner: str, path: str) -> None:
+        """Initialize the cache."""
+        super().__init__(hass, owner)
+        self.path = path
+        # One connection, used by whichever executor thread runs a call
+        self._conn: sqlite3.Connection | None = None
+        self._conn_lock = threading.Lock()
+
+    async def _async_job(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Run a database call in the executor."""
+        try:
+            return await self.hass.async_add_executor_job(func, *args)
+        except sqlite3.Error as ex:
+            raise SharedCacheError(f"{self.path}: {ex}") from ex
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return the connection, opening it and creating the tables once.
+
+        Callers hold ``_conn_lock``.
+        """
+        if self._conn is None:
+            conn = sqlite3.connect(
+                self.path, timeout=5, isolation_level=None, check_same_thread=False
+            )
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                for statement in _SCHEMA:
+                    conn.execute(statement)
+            except sqlite3.Error:
+                conn.close()
+                raise
+            self._conn = conn
+        return self._conn
+
+    def close(self) -> None:
+        """Close the connection."""
+        with self._conn_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _execute(self, query: str, *params: Any) -> list[tuple[Any, ...]]:
+        """Run one statement and return its rows."""
+        with self._conn_lock:
+            return self._connection().execute(query, params).fetchall()
+
+    def _acquire(self, name: str, ttl: float) -> bool:
+        """Take or renew a lease in one write transaction."""
+        now = time.time()
+        with self._conn_lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT owner, expires_at FROM leases WHERE name = ?", (name,)
+                ).fetchone()
+                if row is not None and row[0] != self.owner and row[1] > now:
+                    conn.execute("ROLLBACK")
+                    return False
+                conn.execute(
+                    "INSERT OR REPLACE INTO leases (name, owner, expires_at) "
+                    "VALUES (?, ?, ?)",
+                    (name, self.owner, now + ttl),
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+            return True
+
+    async def async_get_departures(
+        self, station_gid: str, max_age: float
+    ) -> dict[str, Any] | None:
+        """Return departures fetched within max_age seconds, if any."""
+        rows = await self._async_job(
+            self._execute,
+            "SELECT payload FROM departures WHERE station_gid = ? AND fetched_at > ?",
+            station_gid,
+            time.time() - max_age,
+        )
+        return json.loads(rows[0][0]) if rows else None
+
+    async def async_set_departures(
+        self, station_gid: str, data: dict[str, Any]
+    ) -> None:
+        """Store freshly fetched departures."""
+        await self._async_job(
+            self._execute,
+            "INSERT OR REPLACE INTO departures (station_gid, fetched_at, payload) "
+            "VALUES (?, ?, ?)",
+            station_gid,
+            time.time(),
+            json.dumps(data, separators=(",", ":")),
+        )
+
+    async def async_acquire(self, name: str, ttl: float) -> bool:
+        """Take or renew a lease, False if another instance holds it."""
+        return await self._async_job(self._acquire, name, ttl)
+
+    async def async_release(self, name: str) -> None:
+        """Give up a lease this instance holds."""
+        await self._async_job(
+            self._execute,
+            "DELETE FROM leases WHERE name = ? AND owner = ?",
+            name,
+            self.owner,
+        )
+
+    async def async_get_token(self, key_id: str) -> tuple[str, float] | None:
+        """Return a stored access token and its expiry, if any."""
+        rows = await self._async_job(
+            self._execute,
+            "SELECT token, expires_at FROM tokens WHERE key_id = ? AND expires_at > ?",
+            key_id,
+            time.time(),
+        )
+        return (rows[0][0], rows[0][1]) if rows else None
+
+    async def async_set_token(self, key_id: str, token: str, expires_at: float) -> None:
+        """Store an access token for the other instances."""
+        await self._async_job(
+            self._execute,
+            "INSERT OR REPLACE INTO tokens (key_id, token, expires_at) VALUES (?, ?, ?)",
+            key_id,
+            token,
+            expires_at,
+        )
+
+
+async def async_get_shared_cache(hass: HomeAssistant, directory: str) -> SharedCache:
+    """Return the shared cache in a directory, one per directory."""
+    caches: dict[str, SharedCache] = hass.data.setdefault(DOMAIN, {}).setdefault(
+        "shared_caches", {}
+    )
+    if (cache := caches.get(directory)) is None:
+        owner = f"{await instance_id.async_get(hass)}:{_PROCESS_ID}"
+        sqlite_cache = SqliteSharedCache(
+            hass, owner, os.path.join(directory, SHARED_CACHE_FILENAME)
+        )
+        caches[directory] = cache = sqlite_cache
+
+        @callback
+        def _async_close(event: Event) -> None:
+            hass.async_add_executor_job(sqlite_cache.close)
+
+        hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, _async_close)
+    return cache
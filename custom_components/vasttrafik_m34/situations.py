@@ -0,0 +1,191 @@
+"""Traffic situations (disruptions) for Västtrafik M34.
+
+Reasons for cancellations and planned disruptions come from the traffic
+situations API, not the departures payload. The whole feed is fetched once
+per Authentication Key and shared by every station using that key. It is
+refreshed at most every ``SITUATIONS_TTL`` with a conditional request, and
+indexed by stop area and line so each station finds its situations without
+a request of its own.
+"""
+from __future__ import annotations
+
+import asyncio
+from collections import defaultdict
+from collections.abc import Iterable
+import logging
+import time
+from typing import Any
+
+import aiohttp
+
+from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import HomeAssistantError
+
+from .auth import TokenManager, async_get_token_manager
+from .const import DOMAIN, SITUATIONS_TTL, TS_API_BASE
+from .quota import QuotaPlanner, async_get_planner
+from .resilience import REQUEST_TIMEOUT, RequestLayer, async_get_request_layer
+
+_LOGGER = logging.getLogger(__name__)
+
+# The feed's own circuit breaker, its outages must not pause departures
+SITUATIONS_BREAKER = TS_API_BASE.removeprefix("https://")
+
+
+def parse_situation(situation: dict[str, Any]) -> dict[str, Any]:
+    """Return the parts of a traffic situation shown on a station."""
+    return {
+        "id": situation.get("situationNumber"),
+        "title": situation.get("title", ""),
+        "description": situation.get("description", ""),
+        "severity": situation.get("severity", ""),
+        "start_time": situation.get("startTime"),
+        "end_time": situation.get("endTime"),
+        "lines": [
+            line.get("designation") or line.get("name", "")
+            for line in situation.get("affectedLines", [])
+        ],
+    }
+
+
+class SituationIndex:
+    """Traffic situations indexed by stop area and line designation."""
+
+    def __init__(self, situations: Iterable[dict[str, Any]] = ()) -> None:
+        """Build the index from raw situations."""
+        self._by_stop_area: defaultdict[str, list[dict[str, Any]]] = defaultdict(list)
+        self._by_line: defaultdict[str, list[dict[str, Any]]] = defaultdict(list)
+        self.count = 0
+        for raw in situations:
+            self.count += 1
+            situation = parse_situation(raw)
+            stop_areas = {
+                stop.get("stopAreaGid")
+                for stop in raw.get("affectedStopPoints", [])
+                if stop.get("stopAreaGid")
+            }
+            for stop_area in stop_areas:
+                self._by_stop_area[stop_area].append(situation)
+            for line in set(situation["lines"]):
+                if line:
+                    self._by_line[line].append(situation)
+
+    def lookup(
+        self, stop_areas: Iterable[str], lines: Iterable[str]
+    ) -> list[dict[str, Any]]:
+        """Return the situations affecting any of the stop areas or lines."""
+        found: dict[Any, dict[str, Any]] = {}
+        for stop_area in stop_areas:
+            for situation in self._by_stop_area.get(stop_area, ()):
+                found.setdefault(situation["id"] or id(situation), situation)
+        for line in lines:
+            for situation in self._by_line.get(line, ()):
+                found.setdefault(situation["id"] or id(situation), situation)
+        return list(found.values())
+
+
+class SituationFeed:
+    """The traffic situations feed for one Authentication Key."""
+
+    def __init__(
+        self,
+        token_manager: TokenManager,
+        planner: QuotaPlanner,
+        request_layer: RequestLayer,
+    ) -> None:
+        """Initialize the feed."""
+        self._token_manager = token_manager
+        self._planner = planner
+        self._request_layer = request_layer
+        self._lock = asyncio.Lock()
+        self._fetched: float | None = None
+        self._etag: str | None = None
+        self._last_modified: str | None = None
+        self.index = SituationIndex()
+        self.not_modified = 0
+
+    @property
+    def stale(self) -> bool:
+        """Return True if the feed should be checked for changes."""
+        return (
+            self._fetched is None
+            or time.monotonic() - self._fetched >= SITUATIONS_TTL.total_seconds()
+        )
+
+    async def async_refresh(self) -> SituationIndex:
+        """Return the index, refreshing the feed first if it is stale.
+
+        Concurrent callers wait for a single request.
+        """
+        if not self.stale:
+            return self.index
+        async with self._lock:
+            if self.stale:
+                try:
+                    await self._async_fetch()
+                finally:
+                    # A failed check also waits a full TTL, the feed is optional
+                    self._fetched = time.monotonic()
+        return self.index
+
+    async def _async_fetch(self) -> None:
+        """Fetch the feed unless it has not changed since the last fetch."""
+        access_token = await self._token_manager.async_get_token()
+        headers = {"Authorization": f"Bearer {access_token}"}
+        if self._etag:
+            headers["If-None-Match"] = self._etag
+        if self._last_modified:
+            headers["If-Modified-Since"] = self._last_modified
+
+        async with aiohttp.ClientSession(timeout=REQUEST_TIMEOUT) as session:
+            async with self._request_layer.request(
+                session,
+                "GET",
+                f"{TS_API_BASE}/traffic-situations",
+                endpoint=f"situations:{self._planner.key_id}",
+                on_send=self._planner.async_record_request,
+                breaker=SITUATIONS_BREAKER,
+                headers=headers,
+            ) as response:
+                if response.status == 304:
+                    self.not_modified += 1
+                    return
+                if response.status == 401:
+                    self._token_manager.invalidate()
+                if response.status != 200:
+                    # Not an API outage, so not a failure for the circuit breaker
+                    raise HomeAssistantError(
+                        f"Traffic situations request failed: {response.status}"
+                    )
+                result = await response.json()
+                self._etag = response.headers.get("ETag")
+                self._last_modified = response.headers.get("Last-Modified")
+
+        self.index = SituationIndex(result if isinstance(result, list) else [])
+        _LOGGER.debug("Loaded %s traffic situations", self.index.count)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the state for diagnostics."""
+        return {
+            "situations": self.index.count,
+            "age_seconds": (
+                None if self._fetched is None else time.monotonic() - self._fetched
+            ),
+            "not_modified": self.not_modified,
+        }
+
+
+async def async_get_situation_feed(hass: HomeAssistant, auth_key: str) -> SituationFeed:
+    """Return the shared traffic situations feed for an auth key."""
+    feeds: dict[str, SituationFeed] = hass.data.setdefault(DOMAIN, {}).setdefault(
+        "situations", {}
+    )
+    if (feed := feeds.get(auth_key)) is None:
+        token_manager = await async_get_token_manager(hass, auth_key)
+        planner = await async_get_planner(hass, auth_key)
+        # Another caller may have created it while waiting
+        if (feed := feeds.get(auth_key)) is None:
+            feed = feeds[auth_key] = SituationFeed(
+                token_manager, planner, async_get_request_layer(hass)
+            )
+    return feed
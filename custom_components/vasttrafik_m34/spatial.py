@@ -0,0 +1,111 @@
+"""Spatial index over stop areas for Västtrafik M34.
+
+A small k-d tree answering "which K stop areas are closest to this point"
+without any API call. Coordinates are projected onto a local plane around
+the centre of the indexed stops, which is accurate to well under a percent
+for an area the size of Västra Götaland.
+"""
+from __future__ import annotations
+
+from collections.abc import Sequence
+from dataclasses import dataclass
+import heapq
+import math
+from typing import Generic, TypeVar
+
+_T = TypeVar("_T")
+
+EARTH_RADIUS_M = 6_371_000
+
+
+@dataclass(slots=True)
+class _Node(Generic[_T]):
+    """A node of the k-d tree."""
+
+    x: float
+    y: float
+    item: _T
+    axis: int
+    left: _Node[_T] | None = None
+    right: _Node[_T] | None = None
+
+
+class KDTree(Generic[_T]):
+    """Two-dimensional k-d tree of items located by latitude and longitude."""
+
+    def __init__(self, points: Sequence[tuple[float, float, _T]]) -> None:
+        """Build the tree from (latitude, longitude, item) tuples."""
+        self._size = len(points)
+        if points:
+            self._lat0 = sum(point[0] for point in points) / len(points)
+        else:
+            self._lat0 = 0.0
+        self._cos_lat0 = math.cos(math.radians(self._lat0))
+        projected = [(*self._project(lat, lon), item) for lat, lon, item in points]
+        self._root = self._build(projected, 0)
+
+    def __len__(self) -> int:
+        """Return the number of indexed items."""
+        return self._size
+
+    def _project(self, lat: float, lon: float) -> tuple[float, float]:
+        """Project a coordinate onto the local plane, in metres."""
+        x = math.radians(lon) * self._cos_lat0 * EARTH_RADIUS_M
+        y = math.radians(lat) * EARTH_RADIUS_M
+        return x, y
+
+    def _build(
+        self, points: list[tuple[float, float, _T]], depth: int
+    ) -> _Node[_T] | None:
+        """Build a balanced subtree by splitting on the median."""
+        if not points:
+            return None
+        axis = depth % 2
+        points.sort(key=lambda point: point[axis])
+        median = len(points) // 2
+        x, y, item = points[median]
+        return _Node(
+            x,
+            y,
+            item,
+            axis,
+            self._build(points[:median], depth + 1),
+            self._build(points[median + 1 :], depth + 1),
+        )
+
+    def nearest(self, lat: float, lon: float, k: int) -> list[tuple[float, _T]]:
+        """Return the k nearest items as (distance in metres, item), closest first."""
+        if k <= 0 or self._root is None:
+            return []
+        qx, qy = self._project(lat, lon)
+        # Max-heap of the best k so far, as (-squared distance, tiebreak, item)
+        best: list[tuple[float, int, _T]] = []
+        counter = 0
+
+        # Nodes to visit with the squared distance to their splitting plane
+        stack: list[tuple[_Node[_T], float]] = [(self._root, 0.0)]
+        while stack:
+            node, plane_dist2 = stack.pop()
+            if len(best) == k and plane_dist2 >= -best[0][0]:
+                continue
+            dx = qx - node.x
+            dy = qy - node.y
+            dist2 = dx * dx + dy * dy
+            counter += 1
+            if len(best) < k:
+                heapq.heappush(best, (-dist2, counter, node.item))
+            elif dist2 < -best[0][0]:
+                heapq.heapreplace(best, (-dist2, counter, node.item))
+
+            delta = dx if node.axis == 0 else dy
+            near, far = (node.left, node.right) if delta < 0 else (node.right, node.left)
+            # The far side can only hold closer items if the plane is within reach
+            if far is not None:
+                stack.append((far, delta * delta))
+            if near is not None:
+                stack.append((near, 0.0))
+
+        return [
+            (math.sqrt(-neg_dist2), item)
+            for neg_dist2, _, item in sorted(best, key=lambda entry: -entry[0])
+        ]
@@ -0,0 +1,178 @@
+"""Persistent stop-area metadata and search cache for Västtrafik M34.
+
+Station searches in the config flow are answered from here when the same
+query, or a shorter query it extends, was answered recently. Every stop area
+seen in a search is kept with its name and coordinates, so the runtime can
+show positions without asking the API again.
+"""
+from __future__ import annotations
+
+from collections import OrderedDict
+import time
+from typing import Any, TypedDict
+import unicodedata
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+
+from .const import (
+    DOMAIN,
+    STOP_CACHE_MAX_QUERIES,
+    STOP_CACHE_MAX_STOPS,
+    STOP_CACHE_TTL,
+)
+
+STORAGE_VERSION = 1
+STORAGE_KEY = f"{DOMAIN}.stop_areas"
+SAVE_DELAY = 30
+
+
+class StopArea(TypedDict):
+    """Metadata for one stop area."""
+
+    gid: str
+    name: str
+    latitude: float | None
+    longitude: float | None
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a search query for use as a cache key."""
+    folded = unicodedata.normalize("NFKC", query).casefold()
+    return " ".join(folded.split())
+
+
+def _matches(name: str, query: str) -> bool:
+    """Return True if every word of the query appears in the name."""
+    normalized = normalize_query(name)
+    return all(word in normalized for word in query.split())
+
+
+class StopAreaCache:
+    """LRU cache of station searches and stop-area metadata with a TTL."""
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the cache."""
+        self._store: Store[dict[str, Any]] = Store(hass, STORAGE_VERSION, STORAGE_KEY)
+        # query -> {"gids": [...], "complete": bool, "fetched": epoch seconds}
+        self._queries: OrderedDict[str, dict[str, Any]] = OrderedDict()
+        self._stops: OrderedDict[str, StopArea] = OrderedDict()
+        # Stop areas of configured entries are never evicted
+        self._pinned: set[str] = set()
+        self.hits = 0
+        self.misses = 0
+
+    async def async_load(self) -> None:
+        """Load the cache from storage."""
+        if stored := await self._store.async_load():
+            # Anything cached while loading is newer than what was stored
+            queries = OrderedDict(stored.get("queries", {}))
+            queries.update(self._queries)
+            stops = OrderedDict((stop["gid"], stop) for stop in stored.get("stops", []))
+            stops.update(self._stops)
+            self._queries, self._stops = queries, stops
+
+    @callback
+    def _data_to_save(self) -> dict[str, Any]:
+        """Return the data to persist."""
+        return {"queries": dict(self._queries), "stops": list(self._stops.values())}
+
+    def _fresh(self, entry: dict[str, Any]) -> bool:
+        """Return True if a cached query is still within its TTL."""
+        return time.time() - entry["fetched"] < STOP_CACHE_TTL.total_seconds()
+
+    def _resolve(self, gids: list[str]) -> list[StopArea] | None:
+        """Return the stop areas for gids, None if any was evicted."""
+        stops = []
+        for gid in gids:
+            if (stop := self._stops.get(gid)) is None:
+                return None
+            self._stops.move_to_end(gid)
+            stops.append(stop)
+        return stops
+
+    @callback
+    def async_lookup(self, query: str) -> list[StopArea] | None:
+        """Return cached results for a query, None on a miss.
+
+        A query extending a shorter cached query is served by filtering that
+        query's results, provided the shorter query returned everything the
+        API had (fewer results than the search limit).
+        """
+        key = normalize_query(query)
+        if (entry := self._queries.get(key)) is not None and self._fresh(entry):
+            if (stops := self._resolve(entry["gids"])) is not None:
+                self._queries.move_to_end(key)
+                self.hits += 1
+                return stops
+
+        for length in range(len(key) - 1, 0, -1):
+            prefix = self._queries.get(key[:length])
+            if prefix is None or not prefix["complete"] or not self._fresh(prefix):
+                continue
+            if (stops := self._resolve(prefix["gids"])) is None:
+                continue
+            matches = [stop for stop in stops if _matches(stop["name"], key)]
+            if matches:
+                self.hits += 1
+                return matches
+            break
+
+        self.misses += 1
+        return None
+
+    @callback
+    def async_store(self, query: str, stops: list[StopArea], complete: bool) -> None:
+        """Cache the results of a search."""
+        key = normalize_query(query)
+        for stop in stops:
+            self._stops[stop["gid"]] = stop
+            self._stops.move_to_end(stop["gid"])
+        self._queries[key] = {
+            "gids": [stop["gid"] for stop in stops],
+            "complete": complete,
+            "fetched": time.time(),
+        }
+        self._queries.move_to_end(key)
+        self._evict()
+        self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    def _evict(self) -> None:
+        """Drop the least recently used queries and stop areas."""
+        while len(self._queries) > STOP_CACHE_MAX_QUERIES:
+            self._queries.popitem(last=False)
+        excess = len(self._stops) - STOP_CACHE_MAX_STOPS
+        for gid in list(self._stops):
+            if excess <= 0:
+                break
+            if gid not in self._pinned:
+                del self._stops[gid]
+                excess -= 1
+
+    @callback
+    def async_add_stops(self, stops: list[StopArea]) -> None:
+        """Remember stop-area metadata learned outside a text search."""
+        for stop in stops:
+            self._stops[stop["gid"]] = stop
+            self._stops.move_to_end(stop["gid"])
+        self._evict()
+        self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    @callback
+    def async_pin(self, gid: str) -> None:
+        """Never evict the metadata of a configured stop area."""
+        self._pinned.add(gid)
+
+    @callback
+    def async_get_stop(self, gid: str) -> StopArea | None:
+        """Return the metadata for a stop area if known."""
+        return self._stops.get(gid)
+
+
+async def async_get_stop_cache(hass: HomeAssistant) -> StopAreaCache:
+    """Return the stop-area cache shared by the config flow and the runtime."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if (cache := domain_data.get("stop_cache")) is None:
+        cache = domain_data["stop_cache"] = StopAreaCache(hass)
+        await cache.async_load()
+    return cache
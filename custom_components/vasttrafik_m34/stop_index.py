@@ -0,0 +1,113 @@
+"""Offline nearest-stop lookup for Västtrafik M34.
+
+The stop areas around Home Assistant's home zone are downloaded once,
+persisted, and indexed in a k-d tree. The config flow then offers the stops
+closest to any zone instantly and without API calls. The list is only
+downloaded again when it is older than ``STOP_INDEX_TTL``.
+"""
+from __future__ import annotations
+
+import logging
+import time
+from typing import Any
+
+import aiohttp
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+
+from .const import (
+    API_BASE,
+    DOMAIN,
+    STOP_INDEX_PAGE_SIZE,
+    STOP_INDEX_RADIUS_METERS,
+    STOP_INDEX_TTL,
+)
+from .resilience import REQUEST_TIMEOUT
+from .spatial import KDTree
+from .stop_cache import StopArea
+from .vasttrafik_api import async_stop_areas_within
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_VERSION = 1
+STORAGE_KEY = f"{DOMAIN}.stop_index"
+
+
+async def async_fetch_stop_areas(
+    access_token: str, latitude: float, longitude: float, radius: int
+) -> list[StopArea]:
+    """Download every stop area within a radius, page by page."""
+    async with aiohttp.ClientSession(timeout=REQUEST_TIMEOUT) as session:
+        return await async_stop_areas_within(
+            session,
+            access_token,
+            latitude,
+            longitude,
+            radius,
+            STOP_INDEX_PAGE_SIZE,
+            api_base=API_BASE,
+        )
+
+
+class StopAreaIndex:
+    """Persisted list of stop areas with a spatial index over it."""
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the index."""
+        self._store: Store[dict[str, Any]] = Store(hass, STORAGE_VERSION, STORAGE_KEY)
+        self._stops: list[StopArea] = []
+        self._fetched = 0.0
+        self._tree: KDTree[StopArea] | None = None
+
+    async def async_load(self) -> None:
+        """Load the stop list from storage."""
+        if stored := await self._store.async_load():
+            self._set(stored["stops"], stored["fetched"])
+
+    def _set(self, stops: list[StopArea], fetched: float) -> None:
+        """Replace the stop list and rebuild the tree."""
+        self._stops = stops
+        self._fetched = fetched
+        self._tree = KDTree(
+            [(stop["latitude"], stop["longitude"], stop) for stop in stops]
+        )
+
+    @property
+    def loaded(self) -> bool:
+        """Return True if a stop list is available, even a stale one."""
+        return bool(self._stops)
+
+    @property
+    def expired(self) -> bool:
+        """Return True if the stop list should be downloaded again."""
+        return time.time() - self._fetched >= STOP_INDEX_TTL.total_seconds()
+
+    async def async_refresh(
+        self, access_token: str, latitude: float, longitude: float
+    ) -> None:
+        """Download the stop list around a point and persist it."""
+        stops = await async_fetch_stop_areas(
+            access_token, latitude, longitude, STOP_INDEX_RADIUS_METERS
+        )
+        _LOGGER.debug("Indexed %s stop areas", len(stops))
+        self._set(stops, time.time())
+        await self._store.async_save({"stops": stops, "fetched": self._fetched})
+
+    @callback
+    def async_nearest(
+        self, latitude: float, longitude: float, count: int
+    ) -> list[tuple[float, StopArea]]:
+        """Return the closest stop areas as (distance in metres, stop)."""
+        if self._tree is None:
+            return []
+        return self._tree.nearest(latitude, longitude, count)
+
+
+async def async_get_stop_index(hass: HomeAssistant) -> StopAreaIndex:
+    """Return the shared stop-area index."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if (index := domain_data.get("stop_index")) is None:
+        index = domain_data["stop_index"] = StopAreaIndex(hass)
+        await index.async_load()
+    return index
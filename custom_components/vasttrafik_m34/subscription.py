@@ -0,0 +1,81 @@
+"""Departure diffs for websocket subscribers of Västtrafik M34.
+
+A dashboard subscribed to a station gets the departures once and then only
+what changed between refreshes: departures that were added, the keys of
+those that left, and the fields that changed on the rest. Times are sent as
+timestamps so the client renders the countdown itself and a refresh that
+only moves the clock sends nothing.
+"""
+from __future__ import annotations
+
+from collections.abc import Iterable
+from typing import Any
+
+from .timetable import departure_key
+
+
+def compact_departure(departure: dict[str, Any]) -> dict[str, Any]:
+    """Return the fields of a departure a dashboard renders."""
+    compact = {
+        "key": departure_key(departure),
+        "line": departure.get("line_number", "?"),
+        "destination": departure.get("direction", "?"),
+        "track": departure.get("track", ""),
+        "planned_time": departure.get("planned_time"),
+        "estimated_time": departure.get("estimated_time"),
+        "delay_minutes": departure.get("delay_minutes", 0),
+        "is_cancelled": departure.get("is_cancelled", False),
+        "is_realtime": departure.get("is_realtime", False),
+        "details_reference": departure.get("details_reference"),
+    }
+    if "stop_name" in departure:
+        compact["stop_name"] = departure["stop_name"]
+    return compact
+
+
+class DepartureStream:
+    """The departures one subscriber has seen, filtered by line and track."""
+
+    def __init__(
+        self, lines: Iterable[str] | None = None, tracks: Iterable[str] | None = None
+    ) -> None:
+        """Initialize the stream."""
+        self._lines = set(lines) if lines else None
+        self._tracks = set(tracks) if tracks else None
+        # key -> compact departure, in departure order
+        self._seen: dict[str, dict[str, Any]] = {}
+
+    def _view(self, departures: Iterable[dict[str, Any]]) -> dict[str, dict[str, Any]]:
+        """Return the compact departures that pass the filters."""
+        view: dict[str, dict[str, Any]] = {}
+        for departure in departures:
+            if self._lines is not None and departure.get("line_number") not in self._lines:
+                continue
+            if self._tracks is not None and departure.get("track") not in self._tracks:
+                continue
+            compact = compact_departure(departure)
+            view.setdefault(compact["key"], compact)
+        return view
+
+    def snapshot(self, departures: Iterable[dict[str, Any]]) -> dict[str, Any]:
+        """Return the initial message with every departure."""
+        self._seen = self._view(departures)
+        return {"departures": list(self._seen.values())}
+
+    def diff(self, departures: Iterable[dict[str, Any]]) -> dict[str, Any] | None:
+        """Return what changed since the last message, None if nothing did."""
+        view = self._view(departures)
+        added = [item for key, item in view.items() if key not in self._seen]
+        removed = [key for key in self._seen if key not in view]
+        changed = []
+        for key, item in view.items():
+            if (old := self._seen.get(key)) is None or old == item:
+                continue
+            changed.append(
+                {"key": key}
+                | {field: value for field, value in item.items() if old.get(field) != value}
+            )
+        self._seen = view
+        if not (added or removed or changed):
+            return None
+        return {"added": added, "removed": removed, "changed": changed}
@@ -0,0 +1,146 @@
+"""Planned timetable snapshot for Västtrafik M34.
+
+Most of a departures response is planned data that does not change during
+the day. In timetable mode a station downloads its planned departures until
+the start of the next service day once, in large pages, and persists them.
+Afterwards only a short realtime window is polled and laid over the
+snapshot. When nothing is planned in that window, or the request budget is
+used up, the planned times are served without any API traffic.
+"""
+from __future__ import annotations
+
+import bisect
+from datetime import datetime, timedelta
+from typing import Any
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+
+from .board import departure_time
+from .const import DOMAIN, TIMETABLE_DAY_START_HOUR
+
+STORAGE_VERSION = 1
+
+# A fresh snapshot reaches at least this far ahead
+MIN_SNAPSHOT_SPAN = timedelta(hours=12)
+
+
+def departure_key(departure: dict[str, Any]) -> str:
+    """Return an identity for a departure shared by planned and realtime data."""
+    if journey := departure.get("journey_gid"):
+        return journey
+    return "|".join(
+        (
+            departure.get("line_number", ""),
+            departure.get("direction", ""),
+            departure.get("planned_time") or "",
+        )
+    )
+
+
+def _planned_time(departure: dict[str, Any]) -> datetime:
+    """Return the planned departure time."""
+    return departure_time({"estimated_time": departure.get("planned_time")})
+
+
+def snapshot_end(now: datetime) -> datetime:
+    """Return the service-day start a snapshot taken now should reach."""
+    end = now.replace(hour=TIMETABLE_DAY_START_HOUR, minute=0, second=0, microsecond=0)
+    while end - now < MIN_SNAPSHOT_SPAN:
+        end += timedelta(days=1)
+    return end
+
+
+class TimetableSnapshot:
+    """Persisted planned departures of one stop area."""
+
+    def __init__(self, hass: HomeAssistant, station_gid: str) -> None:
+        """Initialize the snapshot."""
+        self._store: Store[dict[str, Any]] = Store(
+            hass, STORAGE_VERSION, f"{DOMAIN}.timetable_{station_gid}"
+        )
+        self._departures: list[dict[str, Any]] = []
+        # Planned time of each departure, for bisecting
+        self._times: list[datetime] = []
+        self._until: datetime | None = None
+        # Filter query parameters the snapshot was downloaded with
+        self.filters: dict[str, Any] = {}
+
+    async def async_load(self) -> None:
+        """Load the snapshot from storage."""
+        if stored := await self._store.async_load():
+            self._set(stored["departures"])
+            self._until = datetime.fromisoformat(stored["until"])
+            self.filters = stored.get("filters", {})
+
+    def _set(self, departures: list[dict[str, Any]]) -> None:
+        """Replace the departures, which must be sorted by planned time."""
+        self._departures = departures
+        self._times = [_planned_time(departure) for departure in departures]
+
+    @property
+    def loaded(self) -> bool:
+        """Return True if a snapshot is available."""
+        return self._until is not None
+
+    def needs_refresh(self, now: datetime, ahead: timedelta) -> bool:
+        """Return True if the snapshot does not reach ``ahead`` from now."""
+        return self._until is None or now + ahead > self._until
+
+    async def async_set(
+        self,
+        departures: list[dict[str, Any]],
+        until: datetime,
+        filters: dict[str, Any] | None = None,
+    ) -> None:
+        """Replace the snapshot with freshly downloaded planned departures."""
+        planned = [
+            {
+                **departure,
+                "estimated_time": departure["planned_time"],
+                "delay_minutes": 0,
+                "is_realtime": False,
+            }
+            for departure in departures
+            if departure.get("planned_time")
+        ]
+        self._set(sorted(planned, key=_planned_time))
+        self._until = until
+        self.filters = filters or {}
+        await self._store.async_save(
+            {
+                "departures": self._departures,
+                "until": until.isoformat(),
+                "filters": self.filters,
+            }
+        )
+
+    def planned(self, start: datetime, end: datetime) -> list[dict[str, Any]]:
+        """Return the planned departures between two times."""
+        return self._departures[
+            bisect.bisect_left(self._times, start) : bisect.bisect_left(self._times, end)
+        ]
+
+    def overlay(
+        self,
+        realtime: list[dict[str, Any]],
+        now: datetime,
+        realtime_window: timedelta,
+        display_window: timedelta,
+    ) -> list[dict[str, Any]]:
+        """Lay a realtime window over the planned departures.
+
+        Within the realtime window the realtime answer is authoritative, so
+        planned departures missing from it are left out. Beyond it the
+        planned times are shown.
+        """
+        realtime_keys = {departure_key(departure) for departure in realtime}
+        realtime_end = now + realtime_window
+        board = list(realtime)
+        for departure in self.planned(now, now + display_window):
+            if departure_key(departure) in realtime_keys:
+                continue
+            if _planned_time(departure) >= realtime_end:
+                board.append(departure)
+        board.sort(key=departure_time)
+        return board
@@ -0,0 +1,37 @@
+"""Async Västtrafik API client without Home Assistant dependencies.
+
+The integration builds on these functions; other services can import the
+package with the integration directory on the path. Only aiohttp is
+required. See ``python -m vasttrafik_api --help`` for the command line.
+"""
+from .client import (
+    DEFAULT_CONCURRENCY,
+    DEFAULT_SERVER,
+    AccessToken,
+    ApiError,
+    AuthenticationError,
+    VasttrafikClient,
+    VasttrafikError,
+    async_fetch_departures,
+    async_request_token,
+    async_search_stop_areas,
+    async_stop_areas_within,
+    parse_departure,
+    parse_stop_area,
+)
+
+__all__ = [
+    "DEFAULT_CONCURRENCY",
+    "DEFAULT_SERVER",
+    "AccessToken",
+    "ApiError",
+    "AuthenticationError",
+    "VasttrafikClient",
+    "VasttrafikError",
+    "async_fetch_departures",
+    "async_request_token",
+    "async_search_stop_areas",
+    "async_stop_areas_within",
+    "parse_departure",
+    "parse_stop_area",
+]
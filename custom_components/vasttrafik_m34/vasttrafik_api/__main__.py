@@ -0,0 +1,187 @@
+"""Command line interface of the Västtrafik API client.
+
+Run with the integration directory on the path, e.g.::
+
+    export PYTHONPATH=custom_components/vasttrafik_m34
+    python -m vasttrafik_api mock-server --port 8080 --latency 0.05
+    python -m vasttrafik_api --server http://127.0.0.1:8080 --auth-key x \\
+        bench 9021014001760000 9021014004945000 --requests 5000 --concurrency 50
+
+``bench --mock`` starts the mock API in the same process instead.
+
+The Authentication Key can also be given in ``VASTTRAFIK_AUTH_KEY``.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+from collections.abc import Sequence
+import json
+import os
+import sys
+import time
+from typing import Any
+
+import aiohttp
+from aiohttp import web
+
+from .client import (
+    DEFAULT_CONCURRENCY,
+    DEFAULT_SERVER,
+    DEFAULT_TIMEOUT,
+    VasttrafikClient,
+    VasttrafikError,
+)
+from .mock_server import create_app
+
+
+def _percentile(ordered: list[float], share: float) -> float:
+    """Return a percentile of sorted samples."""
+    return ordered[min(int(len(ordered) * share), len(ordered) - 1)]
+
+
+async def async_bench(
+    client: VasttrafikClient,
+    stop_area_gids: Sequence[str],
+    requests: int,
+    concurrency: int = DEFAULT_CONCURRENCY,
+) -> dict[str, Any]:
+    """Send departures requests round-robin over stop areas and time them."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+    errors: dict[str, int] = {}
+
+    async def _one(gid: str) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await client.async_get_departures(gid)
+            except (VasttrafikError, aiohttp.ClientError, asyncio.TimeoutError) as ex:
+                name = type(ex).__name__
+                errors[name] = errors.get(name, 0) + 1
+                return
+            latencies.append(time.perf_counter() - started)
+
+    await client.async_get_token()
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(_one(stop_area_gids[index % len(stop_area_gids)]) for index in range(requests))
+    )
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    result: dict[str, Any] = {
+        "requests": requests,
+        "succeeded": len(latencies),
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(requests / elapsed, 1) if elapsed else None,
+    }
+    if latencies:
+        result["latency_ms"] = {
+            "p50": round(_percentile(latencies, 0.5) * 1000, 1),
+            "p95": round(_percentile(latencies, 0.95) * 1000, 1),
+            "max": round(latencies[-1] * 1000, 1),
+        }
+    return result
+
+
+def _parser() -> argparse.ArgumentParser:
+    """Return the argument parser."""
+    parser = argparse.ArgumentParser(
+        prog="python -m vasttrafik_api", description=__doc__.splitlines()[0]
+    )
+    parser.add_argument("--server", default=DEFAULT_SERVER, help="API host URL")
+    parser.add_argument(
+        "--auth-key",
+        default=os.environ.get("VASTTRAFIK_AUTH_KEY"),
+        help="base64 Authentication Key",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    search = commands.add_parser("search", help="search stop areas by name")
+    search.add_argument("query")
+    search.add_argument("--limit", type=int, default=10)
+
+    departures = commands.add_parser("departures", help="departures of stop areas")
+    departures.add_argument("gids", nargs="+", metavar="gid")
+    departures.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+
+    bench = commands.add_parser("bench", help="load test the departures endpoint")
+    bench.add_argument("gids", nargs="+", metavar="gid")
+    bench.add_argument("--requests", type=int, default=1000)
+    bench.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    bench.add_argument(
+        "--mock", action="store_true", help="run against an in-process mock API"
+    )
+
+    mock = commands.add_parser("mock-server", help="serve a mock API")
+    mock.add_argument("--host", default="127.0.0.1")
+    mock.add_argument("--port", type=int, default=8080)
+    mock.add_argument("--latency", type=float, default=0.0, help="seconds per answer")
+    mock.add_argument(
+        "--error-rate", type=float, default=0.0, help="share of 503 answers"
+    )
+    return parser
+
+
+async def _async_run(args: argparse.Namespace) -> Any:
+    """Run a client command and return its result."""
+    connector = aiohttp.TCPConnector(limit=getattr(args, "concurrency", 100))
+    async with aiohttp.ClientSession(
+        timeout=DEFAULT_TIMEOUT, connector=connector
+    ) as session:
+        client = VasttrafikClient(session, args.auth_key, server=args.server)
+        if args.command == "search":
+            return await client.async_search_stop_areas(args.query, args.limit)
+        if args.command == "departures":
+            results = await client.async_get_many_departures(
+                args.gids, args.concurrency
+            )
+            return {
+                gid: result if isinstance(result, list) else str(result)
+                for gid, result in results.items()
+            }
+        if not args.mock:
+            return await async_bench(
+                client, args.gids, args.requests, args.concurrency
+            )
+        runner = web.AppRunner(create_app())
+        await runner.setup()
+        try:
+            await web.TCPSite(runner, "127.0.0.1", 0).start()
+            host, port = runner.addresses[0][:2]
+            client = VasttrafikClient(
+                session, args.auth_key, server=f"http://{host}:{port}"
+            )
+            return await async_bench(
+                client, args.gids, args.requests, args.concurrency
+            )
+        finally:
+            await runner.cleanup()
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    """Run the command line interface."""
+    args = _parser().parse_args(argv)
+    if args.command == "mock-server":
+        web.run_app(
+            create_app(args.latency, args.error_rate), host=args.host, port=args.port
+        )
+        return 0
+    if args.command == "bench" and args.mock:
+        # The mock API takes any key
+        args.auth_key = args.auth_key or "mock"
+    if not args.auth_key:
+        print("An Authentication Key is required", file=sys.stderr)
+        return 2
+    try:
+        result = asyncio.run(_async_run(args))
+    except (VasttrafikError, aiohttp.ClientError, asyncio.TimeoutError) as ex:
+        print(f"Request failed: {ex}", file=sys.stderr)
+        return 1
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,354 @@
+"""Async client for the Västtrafik Planera Resa v4 API.
+
+The module functions send one request each with an access token the caller
+provides and return parsed results; the integration calls them through its
+own token, quota and backoff handling by passing a ``request`` function in
+place of ``session.request``. ``VasttrafikClient`` adds token handling for
+one Authentication Key and batch fetches on top, for use without Home
+Assistant.
+"""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable, Iterable
+from contextlib import AbstractAsyncContextManager
+from dataclasses import dataclass
+from datetime import datetime
+import logging
+import time
+from typing import Any
+
+import aiohttp
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_SERVER = "https://ext-api.vasttrafik.se"
+TOKEN_PATH = "/token"
+API_PATH = "/pr/v4"
+
+# Tokens are renewed this long before the API says they expire
+TOKEN_EXPIRY_MARGIN_SECONDS = 300
+
+# Departures of the next hour, two per line, as the integration shows them
+DEFAULT_DEPARTURE_PARAMS = {"timeSpanInMinutes": 60, "maxDeparturesPerLine": 2}
+
+# Stations fetched at once by a batch
+DEFAULT_CONCURRENCY = 8
+
+DEFAULT_TIMEOUT = aiohttp.ClientTimeout(total=20, connect=5, sock_read=10)
+
+RequestFunc = Callable[..., AbstractAsyncContextManager[aiohttp.ClientResponse]]
+
+
+class VasttrafikError(Exception):
+    """Base class of the client's errors."""
+
+
+class ApiError(VasttrafikError):
+    """Error to indicate the API answered with an unexpected status."""
+
+    def __init__(self, status: int, text: str = "") -> None:
+        """Initialize the error."""
+        super().__init__(f"Västtrafik API answered {status}")
+        self.status = status
+        self.text = text
+
+
+class AuthenticationError(ApiError):
+    """Error to indicate the Authentication Key or access token was refused."""
+
+
+@dataclass
+class AccessToken:
+    """An access token and when it should no longer be used."""
+
+    token: str
+    # Epoch seconds, already shortened by the expiry margin
+    expires_at: float
+
+    @property
+    def valid(self) -> bool:
+        """Return True if the token can still be used."""
+        return time.time() < self.expires_at
+
+
+async def _read_json(response: aiohttp.ClientResponse) -> Any:
+    """Return the decoded body of a successful answer."""
+    if response.status != 200:
+        text = await response.text()
+        if response.status == 401:
+            raise AuthenticationError(response.status, text)
+        raise ApiError(response.status, text)
+    return await response.json()
+
+
+def parse_departure(departure: dict[str, Any]) -> dict[str, Any]:
+    """Return a departure of the API in the flat form the integration uses."""
+    service_journey = departure.get("serviceJourney", {})
+    line = service_journey.get("line", {})
+    planned_time = departure.get("plannedTime")
+    estimated_time = departure.get("estimatedTime")
+
+    delay_minutes = 0
+    if estimated_time and planned_time:
+        try:
+            planned_dt = datetime.fromisoformat(planned_time.replace("Z", "+00:00"))
+            estimated_dt = datetime.fromisoformat(estimated_time.replace("Z", "+00:00"))
+            delay_minutes = int((estimated_dt - planned_dt).total_seconds() / 60)
+        except (TypeError, ValueError) as ex:
+            _LOGGER.debug("Could not calculate delay: %s", ex)
+
+    # stopPoint.platform can be a string or an object
+    track = ""
+    stop_point = departure.get("stopPoint", {})
+    if isinstance(stop_point, dict):
+        platform = stop_point.get("platform", {})
+        if isinstance(platform, dict):
+            track = platform.get("name", "")
+        elif isinstance(platform, str):
+            track = platform
+
+    return {
+        "line_number": line.get("name", "?"),
+        "line_designation": line.get("designation", ""),
+        "direction": service_journey.get("direction", ""),
+        "planned_time": planned_time,
+        "estimated_time": estimated_time or planned_time,
+        "delay_minutes": delay_minutes,
+        "track": track,
+        "is_cancelled": departure.get("isCancelled", False),
+        "is_realtime": estimated_time is not None,
+        "journey_gid": service_journey.get("gid"),
+        "details_reference": departure.get("detailsReference"),
+    }
+
+
+def parse_stop_area(location: dict[str, Any]) -> dict[str, Any] | None:
+    """Return a location result as a stop area, None if it is something else."""
+    if location.get("locationType") != "stoparea" or not location.get("gid"):
+        return None
+    return {
+        "gid": location["gid"],
+        "name": location.get("name", location["gid"]),
+        "latitude": location.get("latitude"),
+        "longitude": location.get("longitude"),
+    }
+
+
+async def async_request_token(
+    session: aiohttp.ClientSession,
+    auth_key: str,
+    *,
+    token_url: str = DEFAULT_SERVER + TOKEN_PATH,
+    request: RequestFunc | None = None,
+) -> AccessToken:
+    """Exchange a base64 Authentication Key for an access token."""
+    request = request or session.request
+    async with request(
+        "POST",
+        token_url,
+        headers={
+            "Authorization": f"Basic {auth_key}",
+            "Content-Type": "application/x-www-form-urlencoded",
+        },
+        data={"grant_type": "client_credentials"},
+    ) as response:
+        result = await _read_json(response)
+    expires_in = result.get("expires_in", 86400)
+    _LOGGER.debug("Got new access token, expires in %s seconds", expires_in)
+    return AccessToken(
+        result["access_token"],
+        time.time() + expires_in - TOKEN_EXPIRY_MARGIN_SECONDS,
+    )
+
+
+async def async_fetch_departures(
+    session: aiohttp.ClientSession,
+    access_token: str,
+    stop_area_gid: str,
+    params: dict[str, Any] | None = None,
+    *,
+    api_base: str = DEFAULT_SERVER + API_PATH,
+    request: RequestFunc | None = None,
+) -> list[dict[str, Any]]:
+    """Return the parsed departures of a stop area."""
+    request = request or session.request
+    async with request(
+        "GET",
+        f"{api_base}/stop-areas/{stop_area_gid}/departures",
+        headers={"Authorization": f"Bearer {access_token}"},
+        params=params or DEFAULT_DEPARTURE_PARAMS,
+    ) as response:
+        result = await _read_json(response)
+    return [parse_departure(departure) for departure in result.get("results", [])]
+
+
+async def async_search_stop_areas(
+    session: aiohttp.ClientSession,
+    access_token: str,
+    query: str,
+    limit: int = 10,
+    *,
+    api_base: str = DEFAULT_SERVER + API_PATH,
+    request: RequestFunc | None = None,
+) -> list[dict[str, Any]]:
+    """Return the stop areas matching a free-text search."""
+    request = request or session.request
+    async with request(
+        "GET",
+        f"{api_base}/locations/by-text",
+        headers={"Authorization": f"Bearer {access_token}"},
+        params={"q": query, "limit": limit, "types": "stoparea"},
+    ) as response:
+        result = await _read_json(response)
+    return [
+        stop
+        for location in result.get("results", [])
+        if (stop := parse_stop_area(location)) is not None
+    ]
+
+
+async def async_stop_areas_within(
+    session: aiohttp.ClientSession,
+    access_token: str,
+    latitude: float,
+    longitude: float,
+    radius: int,
+    page_size: int = 1000,
+    *,
+    api_base: str = DEFAULT_SERVER + API_PATH,
+    request: RequestFunc | None = None,
+) -> list[dict[str, Any]]:
+    """Return every stop area with a position within a radius, page by page."""
+    request = request or session.request
+    stops: list[dict[str, Any]] = []
+    offset = 0
+    while True:
+        async with request(
+            "GET",
+            f"{api_base}/locations/by-coordinates",
+            headers={"Authorization": f"Bearer {access_token}"},
+            params={
+                "latitude": latitude,
+                "longitude": longitude,
+                "radiusInMeters": radius,
+                "types": "stoparea",
+                "limit": page_size,
+                "offset": offset,
+            },
+        ) as response:
+            result = await _read_json(response)
+        page = result.get("results", [])
+        stops.extend(
+            stop
+            for location in page
+            if (stop := parse_stop_area(location)) is not None
+            and stop["latitude"] is not None
+            and stop["longitude"] is not None
+        )
+        if len(page) < page_size:
+            return stops
+        offset += len(page)
+
+
+class VasttrafikClient:
+    """Client for one Authentication Key, fetching tokens as needed.
+
+    An access token is fetched on first use and renewed when it expires or
+    the API refuses it; concurrent calls wait for a single token request.
+    """
+
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        auth_key: str,
+        *,
+        server: str = DEFAULT_SERVER,
+        request: RequestFunc | None = None,
+    ) -> None:
+        """Initialize the client."""
+        self.session = session
+        self._auth_key = auth_key
+        self._token_url = server.rstrip("/") + TOKEN_PATH
+        self._api_base = server.rstrip("/") + API_PATH
+        self._request = request
+        self._token: AccessToken | None = None
+        self._lock = asyncio.Lock()
+
+    async def async_get_token(self) -> str:
+        """Return a valid access token, fetching one only when needed."""
+        if self._token is None or not self._token.valid:
+            async with self._lock:
+                if self._token is None or not self._token.valid:
+                    self._token = await async_request_token(
+                        self.session,
+                        self._auth_key,
+                        token_url=self._token_url,
+                        request=self._request,
+                    )
+        return self._token.token
+
+    def invalidate_token(self) -> None:
+        """Forget the access token, the next call fetches a new one."""
+        self._token = None
+
+    async def _async_call(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Call an API function with a token, renewing a refused one once."""
+        token = await self.async_get_token()
+        try:
+            return await func(
+                self.session, token, *args, api_base=self._api_base, request=self._request
+            )
+        except AuthenticationError:
+            if self._token is not None and self._token.token == token:
+                self.invalidate_token()
+            token = await self.async_get_token()
+            return await func(
+                self.session, token, *args, api_base=self._api_base, request=self._request
+            )
+
+    async def async_get_departures(
+        self, stop_area_gid: str, params: dict[str, Any] | None = None
+    ) -> list[dict[str, Any]]:
+        """Return the parsed departures of a stop area."""
+        return await self._async_call(async_fetch_departures, stop_area_gid, params)
+
+    async def async_search_stop_areas(
+        self, query: str, limit: int = 10
+    ) -> list[dict[str, Any]]:
+        """Return the stop areas matching a free-text search."""
+        return await self._async_call(async_search_stop_areas, query, limit)
+
+    async def async_stop_areas_within(
+        self, latitude: float, longitude: float, radius: int
+    ) -> list[dict[str, Any]]:
+        """Return every stop area within a radius."""
+        return await self._async_call(
+            async_stop_areas_within, latitude, longitude, radius
+        )
+
+    async def async_get_many_departures(
+        self,
+        stop_area_gids: Iterable[str],
+        concurrency: int = DEFAULT_CONCURRENCY,
+        params: dict[str, Any] | None = None,
+    ) -> dict[str, list[dict[str, Any]] | Exception]:
+        """Fetch several stop areas, at most ``concurrency`` at a time.
+
+        A stop area that fails maps to its error instead of failing the
+        batch.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def _fetch(gid: str) -> list[dict[str, Any]] | Exception:
+            async with semaphore:
+                try:
+                    return await self.async_get_departures(gid, params)
+                except (VasttrafikError, aiohttp.ClientError, asyncio.TimeoutError) as ex:
+                    return ex
+
+        gids = list(dict.fromkeys(stop_area_gids))
+        # One token request for the batch, not one per waiting station
+        await self.async_get_token()
+        results = await asyncio.gather(*(_fetch(gid) for gid in gids))
+        return dict(zip(gids, results))
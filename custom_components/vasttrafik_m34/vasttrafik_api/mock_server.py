@@ -0,0 +1,114 @@
+"""Mock Västtrafik API for load testing the client.
+
+Serves the token, departures and location endpoints with generated data,
+an optional delay per answer and an optional share of 503 answers, so the
+client and the integration's polling can be exercised at rates the real
+API would throttle.
+"""
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+import random
+from typing import Any
+
+from aiohttp import web
+
+from .client import API_PATH, TOKEN_PATH
+
+LINES = ("1", "2", "3", "5", "6", "7", "9", "10", "11", "13", "16", "19", "25")
+DESTINATIONS = ("Kortedala", "Östra Sjukhuset", "Saltholmen", "Angered", "Frölunda")
+
+
+def _departures(gid: str, count: int) -> list[dict[str, Any]]:
+    """Return a stop area's departures, the same lines for the same stop."""
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    rng = random.Random(gid)
+    departures = []
+    for index in range(count):
+        line = rng.choice(LINES)
+        planned = now + timedelta(minutes=2 + index * 3)
+        delay = timedelta(minutes=rng.choice((0, 0, 0, 1, 2)))
+        departures.append(
+            {
+                "detailsReference": f"{gid}-{index}",
+                "serviceJourney": {
+                    "gid": f"9015014{line.zfill(4)}{index:05d}",
+                    "direction": rng.choice(DESTINATIONS),
+                    "line": {"name": line, "designation": line},
+                },
+                "stopPoint": {"platform": chr(ord("A") + index % 4)},
+                "plannedTime": planned.isoformat(),
+                "estimatedTime": (planned + delay).isoformat(),
+                "isCancelled": False,
+            }
+        )
+    return departures
+
+
+def create_app(
+    latency: float = 0.0, error_rate: float = 0.0, departures: int = 20
+) -> web.Application:
+    """Return the mock API application.
+
+    Answers are delayed by ``latency`` seconds and ``error_rate`` of the
+    requests get a 503. ``GET /stats`` returns the requests counted per
+    endpoint.
+    """
+    stats: dict[str, int] = {"token": 0, "departures": 0, "locations": 0, "errors": 0}
+
+    async def _answer(kind: str, payload: Any) -> web.Response:
+        stats[kind] += 1
+        if latency:
+            await asyncio.sleep(latency)
+        if error_rate and random.random() < error_rate:
+            stats["errors"] += 1
+            return web.Response(status=503, text="Service Unavailable")
+        return web.json_response(payload)
+
+    def _authorized(request: web.Request, scheme: str) -> bool:
+        return request.headers.get("Authorization", "").startswith(f"{scheme} ")
+
+    async def token(request: web.Request) -> web.Response:
+        if not _authorized(request, "Basic"):
+            return web.Response(status=401)
+        return await _answer(
+            "token", {"access_token": f"mock-{random.getrandbits(64):x}", "expires_in": 3600}
+        )
+
+    async def stop_departures(request: web.Request) -> web.Response:
+        if not _authorized(request, "Bearer"):
+            return web.Response(status=401)
+        gid = request.match_info["gid"]
+        count = min(int(request.query.get("limit", departures)), departures)
+        return await _answer("departures", {"results": _departures(gid, count)})
+
+    async def locations(request: web.Request) -> web.Response:
+        if not _authorized(request, "Bearer"):
+            return web.Response(status=401)
+        limit = int(request.query.get("limit", 10))
+        offset = int(request.query.get("offset", 0))
+        name = request.query.get("q", "Hållplats")
+        results = [
+            {
+                "gid": f"902101400{index:07d}",
+                "name": f"{name} {index}, Göteborg",
+                "locationType": "stoparea",
+                "latitude": 57.7 + index / 1000,
+                "longitude": 11.97 + index / 1000,
+            }
+            # A short last page for coordinate searches
+            for index in range(offset, min(offset + limit, 25))
+        ]
+        return await _answer("locations", {"results": results})
+
+    async def get_stats(request: web.Request) -> web.Response:
+        return web.json_response(stats)
+
+    app = web.Application()
+    app.router.add_post(TOKEN_PATH, token)
+    app.router.add_get(f"{API_PATH}/stop-areas/{{gid}}/departures", stop_departures)
+    app.router.add_get(f"{API_PATH}/locations/by-text", locations)
+    app.router.add_get(f"{API_PATH}/locations/by-coordinates", locations)
+    app.router.add_get("/stats", get_stats)
+    return app
@@ -0,0 +1,229 @@
+"""HTTP and Server-Sent Events boards for kiosk displays.
+
+``/api/vasttrafik_m34/<entry_id>/board`` serves an entry's departures from
+the coordinator cache as compact JSON, or as plain text with
+``?format=text``. The body is rendered once per coordinator update and
+carries an ``ETag``, so a display polling an unchanged board gets an empty
+304. ``/api/vasttrafik_m34/<entry_id>/events`` pushes the same JSON board as
+a Server-Sent ``board`` event, then only ``diff`` events with what changed,
+until the entry is unloaded. The diff is computed once per update and shared
+by every stream. Neither ever sends an API request.
+"""
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime
+import hashlib
+import json
+from typing import TYPE_CHECKING, Any
+
+from aiohttp import web
+
+from homeassistant.components.http import KEY_HASS, HomeAssistantView
+from homeassistant.config_entries import ConfigEntryState
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.dispatcher import (
+    async_dispatcher_connect,
+    async_dispatcher_send,
+)
+
+from .const import DOMAIN, SSE_KEEPALIVE_SECONDS
+from .subscription import DepartureStream, compact_departure
+
+if TYPE_CHECKING:
+    from .sensor import VasttrafikDataUpdateCoordinator
+
+# Sent with the entry ID when an entry is unloaded
+SIGNAL_ENTRY_UNLOADED = f"{DOMAIN}_entry_unloaded_{{}}"
+
+
+def _clock(value: str | None) -> str:
+    """Return the local HH:MM of an API timestamp."""
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except (AttributeError, ValueError):
+        return "?"
+    return parsed.astimezone().strftime("%H:%M")
+
+
+def render_text(departures: list[dict[str, Any]]) -> str:
+    """Return one line per departure for plain-text displays."""
+    lines = []
+    for dep in departures:
+        parts = [dep["line"], dep["destination"], _clock(dep["estimated_time"])]
+        if dep["track"]:
+            parts.append(dep["track"])
+        if dep["delay_minutes"]:
+            parts.append(f"{dep['delay_minutes']:+d}")
+        if dep["is_cancelled"]:
+            parts.append("X")
+        lines.append(" ".join(parts))
+    return "\n".join(lines) + "\n"
+
+
+class RenderedBoard:
+    """One coordinator update rendered for displays."""
+
+    def __init__(
+        self, data: dict[str, Any] | None, previous: RenderedBoard | None = None
+    ) -> None:
+        """Render the board and its diff from the previous one."""
+        # Kept to tell whether the coordinator has updated since
+        self.data = data
+        departures = [
+            compact_departure(dep) for dep in (data or {}).get("departures", [])
+        ]
+        # No fetch time in the body, a refresh that changed nothing keeps the ETag
+        self.json = json.dumps(
+            {"departures": departures},
+            ensure_ascii=False,
+            separators=(",", ":"),
+        ).encode()
+        self.text = render_text(departures).encode()
+        self.etag = f'"{hashlib.sha1(self.json).hexdigest()[:16]}"'
+        # What changed since the previous board, for streams that sent it
+        self.previous_etag: str | None = None
+        self.diff: bytes | None = None
+        if previous is not None and previous.etag != self.etag:
+            stream = DepartureStream()
+            stream.snapshot((previous.data or {}).get("departures", []))
+            diff = stream.diff((data or {}).get("departures", []))
+            if diff is not None:
+                self.previous_etag = previous.etag
+                self.diff = json.dumps(
+                    diff, ensure_ascii=False, separators=(",", ":")
+                ).encode()
+
+
+def _get_coordinator(
+    hass: HomeAssistant, entry_id: str
+) -> VasttrafikDataUpdateCoordinator | None:
+    """Return the coordinator of a loaded entry, None if there is none."""
+    entry = hass.config_entries.async_get_entry(entry_id)
+    if (
+        entry is None
+        or entry.domain != DOMAIN
+        or entry.state is not ConfigEntryState.LOADED
+    ):
+        return None
+    return entry.runtime_data
+
+
+@callback
+def async_get_board(
+    hass: HomeAssistant, entry_id: str, coordinator: VasttrafikDataUpdateCoordinator
+) -> RenderedBoard:
+    """Return an entry's current board, rendering it once per update."""
+    boards: dict[str, RenderedBoard] = hass.data.setdefault(DOMAIN, {}).setdefault(
+        "boards", {}
+    )
+    board = boards.get(entry_id)
+    if board is None or board.data is not coordinator.data:
+        board = boards[entry_id] = RenderedBoard(coordinator.data, board)
+    return board
+
+
+@callback
+def async_entry_unloaded(hass: HomeAssistant, entry_id: str) -> None:
+    """Drop an unloaded entry's board and end its event streams."""
+    hass.data.get(DOMAIN, {}).get("boards", {}).pop(entry_id, None)
+    async_dispatcher_send(hass, SIGNAL_ENTRY_UNLOADED.format(entry_id))
+
+
+class DepartureBoardView(HomeAssistantView):
+    """Serve an entry's departures as a compact board."""
+
+    url = f"/api/{DOMAIN}/{{entry_id}}/board"
+    name = f"api:{DOMAIN}:board"
+
+    async def get(self, request: web.Request, entry_id: str) -> web.Response:
+        """Return the board, or 304 if the display already has it."""
+        hass = request.app[KEY_HASS]
+        if (coordinator := _get_coordinator(hass, entry_id)) is None:
+            return self.json_message("Entry not found", 404)
+        board = async_get_board(hass, entry_id, coordinator)
+        headers = {"ETag": board.etag, "Cache-Control": "no-cache"}
+        if request.headers.get("If-None-Match") == board.etag:
+            return web.Response(status=304, headers=headers)
+        if request.query.get("format") == "text":
+            return web.Response(
+                body=board.text,
+                content_type="text/plain",
+                charset="utf-8",
+                headers=headers,
+            )
+        return web.Response(
+            body=board.json, content_type="application/json", headers=headers
+        )
+
+
+class DepartureEventsView(HomeAssistantView):
+    """Push an entry's board to a display whenever it changes."""
+
+    url = f"/api/{DOMAIN}/{{entry_id}}/events"
+    name = f"api:{DOMAIN}:events"
+
+    async def get(self, request: web.Request, entry_id: str) -> web.StreamResponse:
+        """Stream the board, then its diffs, as Server-Sent Events."""
+        hass = request.app[KEY_HASS]
+        if (coordinator := _get_coordinator(hass, entry_id)) is None:
+            return self.json_message("Entry not found", 404)
+
+        response = web.StreamResponse(
+            headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"}
+        )
+        await response.prepare(request)
+        updated = asyncio.Event()
+        unloaded = False
+
+        @callback
+        def _async_updated() -> None:
+            updated.set()
+
+        @callback
+        def _async_unloaded() -> None:
+            nonlocal unloaded
+            unloaded = True
+            updated.set()
+
+        remove_listener = coordinator.async_add_listener(_async_updated)
+        remove_unloaded = async_dispatcher_connect(
+            hass, SIGNAL_ENTRY_UNLOADED.format(entry_id), _async_unloaded
+        )
+        # An open display can keep the station polling
+        remove_viewer = coordinator.gate.async_add_viewer()
+        sent: str | None = None
+        try:
+            while not unloaded:
+                board = async_get_board(hass, entry_id, coordinator)
+                if board.etag != sent:
+                    if sent is not None and board.previous_etag == sent:
+                        event, payload = b"diff", board.diff
+                    else:
+                        # First event, or the stream missed an update
+                        event, payload = b"board", board.json
+                    sent = board.etag
+                    await response.write(
+                        b"event: " + event + b"\nid: " + board.etag.strip('"').encode()
+                        + b"\ndata: " + payload + b"\n\n"
+                    )
+                try:
+                    await asyncio.wait_for(updated.wait(), SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    # Comment line, keeps proxies from closing the stream
+                    await response.write(b": keepalive\n\n")
+                updated.clear()
+        except ConnectionResetError:
+            pass
+        finally:
+            remove_listener()
+            remove_unloaded()
+            remove_viewer()
+        return response
+
+
+@callback
+def async_register_views(hass: HomeAssistant) -> None:
+    """Register the kiosk board views."""
+    hass.http.register_view(DepartureBoardView)
+    hass.http.register_view(DepartureEventsView)
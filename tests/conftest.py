@@ -1,11 +1,95 @@
 """Test configuration for Västtrafik M34 integration."""
+from datetime import datetime, timedelta, timezone
+import os
 import pytest
+import re
 import sys
 from pathlib import Path
 
 # Add the custom_components directory to Python path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
+STATION_GID = "9021014001760000"
+DEPARTURES_URL = re.compile(r"https://ext-api\.vasttrafik\.se/pr/v4/stop-areas/.*")
+
+
+def _api_departure(index, line, direction):
+    """Return a departure as the API answers it."""
+    time = f"2030-01-01T08:{index:02d}:00+01:00"
+    return {
+        "detailsReference": f"ref-{index}",
+        "serviceJourney": {
+            "gid": f"90150140000000{index:02d}",
+            "direction": direction,
+            "line": {"name": line, "designation": line},
+        },
+        "stopPoint": {"platform": "A"},
+        "plannedTime": time,
+        "estimatedTime": time,
+        "isCancelled": False,
+    }
+
+
+API_DEPARTURES = [
+    _api_departure(1, "6", "Kortedala"),
+    _api_departure(2, "11", "Saltholmen"),
+    _api_departure(3, "6", "Länsmansgården"),
+    _api_departure(4, "6", "Kortedala"),
+]
+
+# Parsed departures are planned some minutes after this unless told otherwise
+DEPARTURE_BASE = datetime(2026, 3, 2, 9, 0, tzinfo=timezone.utc)
+
+
+def departure(
+    journey=None, minutes=0, delay=0, line="6", base=DEPARTURE_BASE, **fields
+):
+    """Return a departure as the coordinator parses it.
+
+    It is planned ``minutes`` after ``base`` and expected ``delay`` minutes
+    late. Other keyword arguments override fields, for example ``track="B"``.
+    """
+    planned = base + timedelta(minutes=minutes)
+    return {
+        "journey_gid": journey,
+        "line_number": line,
+        "line_designation": line,
+        "direction": "Kortedala",
+        "track": "A",
+        "planned_time": planned.isoformat(),
+        "estimated_time": (planned + timedelta(minutes=delay)).isoformat(),
+        "delay_minutes": delay,
+        "is_cancelled": False,
+        "is_realtime": True,
+        **fields,
+    }
+
+
+def _fail_skipped(report):
+    """Turn a skip into a failure when strict tests are asked for.
+    
+    Tests skip when Home Assistant or a test plugin cannot be imported. CI
+    installs all of them, so a skip there hides a broken import.
+    """
+    if os.environ.get("VASTTRAFIK_M34_STRICT_TESTS") and report.skipped:
+        reason = report.longrepr[2] if isinstance(report.longrepr, tuple) else ""
+        report.outcome = "failed"
+        report.longrepr = f"{report.nodeid} was skipped: {reason}"
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_make_collect_report(collector):
+    """Fail skipped test modules in strict mode."""
+    outcome = yield
+    _fail_skipped(outcome.get_result())
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_makereport(item, call):
+    """Fail skipped tests in strict mode."""
+    outcome = yield
+    _fail_skipped(outcome.get_result())
+
 
 @pytest.fixture
 def mock_hass():
@@ -15,3 +99,40 @@ def mock_hass():
     mock = MagicMock()
     mock.config_entries = MagicMock()
     return mock
+
+
+@pytest.fixture
+async def loaded_entry(hass, enable_custom_integrations):
+    """Set up an entry whose API answers come from aioresponses.
+    
+    The aioresponses mock is available as ``entry.mocked``; requests to the
+    local test server pass through to it.
+    """
+    from aioresponses import aioresponses
+    from pytest_homeassistant_custom_component.common import MockConfigEntry
+    
+    from custom_components.vasttrafik_m34.const import DOMAIN, TOKEN_URL
+    
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        title="Brunnsparken",
+        data={
+            "auth_key": "a2V5",
+            "station_gid": STATION_GID,
+            "station_name": "Brunnsparken",
+        },
+    )
+    entry.add_to_hass(hass)
+    with aioresponses(passthrough=["http://127.0.0.1"]) as mocked:
+        mocked.post(
+            TOKEN_URL,
+            payload={"access_token": "token", "expires_in": 3600},
+            repeat=True,
+        )
+        mocked.get(DEPARTURES_URL, payload={"results": API_DEPARTURES}, repeat=True)
+        assert await hass.config_entries.async_setup(entry.entry_id)
+        await hass.async_block_till_done()
+        entry.mocked = mocked
+        yield entry
+        await hass.config_entries.async_unload(entry.entry_id)
+        await hass.async_block_till_done()
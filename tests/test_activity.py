@@ -0,0 +1,93 @@
+"""Tests for presence- and visibility-driven polling."""
+from unittest.mock import MagicMock
+
+import pytest
+
+activity = pytest.importorskip("custom_components.vasttrafik_m34.activity")
+
+from homeassistant.core import State  # noqa: E402
+
+
+def _states(mock_hass, **states):
+    """Serve the given entity states from the mock hass."""
+    current = {
+        entity_id.replace("__", "."): State(entity_id.replace("__", "."), state)
+        for entity_id, state in states.items()
+    }
+    mock_hass.states.get.side_effect = current.get
+    return current
+
+
+class TestConditionMet:
+    """Test how condition entities are read."""
+
+    @pytest.mark.parametrize(
+        ("entity_id", "state", "met"),
+        [
+            ("person.anna", "home", True),
+            ("person.anna", "not_home", False),
+            ("zone.home", "2", True),
+            ("zone.home", "0", False),
+            ("input_boolean.kiosk", "on", True),
+            ("input_boolean.kiosk", "off", False),
+        ],
+    )
+    def test_states(self, entity_id, state, met):
+        """Test each supported domain."""
+        assert activity.condition_met(State(entity_id, state)) is met
+
+    def test_missing_entity(self):
+        """Test that a missing entity does not hold."""
+        assert not activity.condition_met(None)
+
+
+class TestPollGate:
+    """Test gating a station's polling on its conditions."""
+
+    def test_unconditional_always_active(self, mock_hass):
+        """Test that a station without conditions always polls."""
+        gate = activity.PollGate(mock_hass)
+        assert gate.active
+
+    def test_any_condition_activates(self, mock_hass):
+        """Test that one condition holding is enough."""
+        _states(mock_hass, person__anna="not_home", input_boolean__kiosk="on")
+        gate = activity.PollGate(mock_hass, ["person.anna", "input_boolean.kiosk"])
+        assert gate.active
+
+    def test_wakes_when_condition_becomes_true(self, mock_hass):
+        """Test that the station is woken on the inactive to active edge only."""
+        states = _states(mock_hass, person__anna="not_home")
+        gate = activity.PollGate(mock_hass, ["person.anna"])
+        on_wake = MagicMock()
+        gate._on_wake = on_wake
+        assert not gate.active
+        states["person.anna"] = State("person.anna", "home")
+        gate._async_update()
+        gate._async_update()
+        assert gate.active
+        on_wake.assert_called_once()
+
+    def test_viewer_activates(self, mock_hass):
+        """Test that a subscribed dashboard counts when enabled."""
+        _states(mock_hass)
+        gate = activity.PollGate(mock_hass, when_viewed=True)
+        assert not gate.active
+        remove = gate.async_add_viewer()
+        assert gate.active
+        remove()
+        assert not gate.active
+        assert gate.viewers == 0
+
+    def test_set_conditions(self, mock_hass):
+        """Test that changed conditions apply to a running gate."""
+        _states(mock_hass, person__anna="not_home", input_boolean__kiosk="on")
+        gate = activity.PollGate(mock_hass, ["person.anna"])
+        on_wake = MagicMock()
+        gate._on_wake = on_wake
+        assert not gate.active
+        gate.async_set_conditions(["input_boolean.kiosk"], False)
+        assert gate.active
+        on_wake.assert_called_once()
+        gate.async_set_conditions([], False)
+        assert gate.active and not gate.conditional
@@ -0,0 +1,52 @@
+"""Tests for the compact departure attributes."""
+import pytest
+
+attributes = pytest.importorskip("custom_components.vasttrafik_m34.attributes")
+
+from .conftest import departure  # noqa: E402
+
+
+class TestColumnarDepartures:
+    """Test the columnar attribute format."""
+
+    def test_parallel_arrays_with_epoch_times(self):
+        """Test one array per field and times as epoch seconds."""
+        columns = attributes.columnar_departures(
+            [departure("1", 10), departure("2", 20, delay=1)]
+        )
+        assert columns["line"] == ["6", "6"]
+        assert columns["planned"][0] == 1772442600
+        assert columns["estimated"][1] - columns["planned"][1] == 60
+        assert "stop_name" not in columns
+
+    def test_smaller_than_objects(self):
+        """Test that the columnar format is smaller than one object per row."""
+        departures = [
+            departure(str(n), n, details_reference=f"REF{n}") for n in range(15)
+        ]
+        assert attributes.encoded_size(
+            attributes.columnar_departures(departures)
+        ) < attributes.encoded_size(departures) / 2
+
+
+class TestFitRows:
+    """Test trimming an attribute to a byte budget."""
+
+    def test_trims_to_budget(self):
+        """Test that the most rows that fit are kept."""
+        departures = [
+            departure(str(n), n, details_reference=f"REF{n}") for n in range(15)
+        ]
+
+        def render(rows):
+            return attributes.columnar_departures(departures[:rows])
+
+        fitted = attributes.fit_rows(render, 15, 600)
+        assert attributes.encoded_size(fitted) <= 600
+        rows = len(fitted["line"])
+        assert 0 < rows < 15
+        assert attributes.encoded_size(render(rows + 1)) > 600
+
+    def test_no_budget(self):
+        """Test that a budget of 0 keeps every row."""
+        assert attributes.fit_rows(lambda rows: list(range(rows)), 15, 0) == list(range(15))
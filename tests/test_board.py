@@ -0,0 +1,69 @@
+"""Tests for merging combined departure boards."""
+import pytest
+
+board = pytest.importorskip("custom_components.vasttrafik_m34.board")
+
+from .conftest import departure  # noqa: E402
+
+
+class TestMergeDepartures:
+    """Test the k-way merge of stop departure lists."""
+
+    def test_interleaves_in_time_order(self):
+        """Test that departures from all stops come out time-ordered."""
+        merged = board.merge_departures(
+            [
+                ("a", "Stop A", [departure(minutes=n) for n in (0, 10, 20)]),
+                ("b", "Stop B", [departure(minutes=n) for n in (5, 15)]),
+            ]
+        )
+        assert [dep["estimated_time"][11:16] for dep in merged] == [
+            "09:00", "09:05", "09:10", "09:15", "09:20"
+        ]
+        assert [dep["stop_name"] for dep in merged[:2]] == ["Stop A", "Stop B"]
+
+    def test_journey_at_several_stops_listed_once(self):
+        """Test that a journey is kept only at its earliest stop."""
+        merged = board.merge_departures(
+            [
+                ("a", "Stop A", [departure("j1", 2), departure("j2", 10)]),
+                ("b", "Stop B", [departure("j1", 0), departure(None, 4)]),
+            ]
+        )
+        assert [(dep["stop_gid"], dep["journey_gid"]) for dep in merged] == [
+            ("b", "j1"), ("b", None), ("a", "j2")
+        ]
+
+    def test_delayed_departure_reordered_within_stop(self):
+        """Test that a delay moving a departure past the next one is handled."""
+        late = departure(minutes=0, delay=12)
+        merged = board.merge_departures(
+            [
+                ("a", "Stop A", [late, departure(minutes=5)]),
+                ("b", "Stop B", [departure(minutes=10)]),
+            ]
+        )
+        assert [dep["estimated_time"][11:16] for dep in merged] == [
+            "09:05", "09:10", "09:12"
+        ]
+
+    def test_inputs_not_modified(self):
+        """Test that tagging departures does not touch the stop lists."""
+        departures = [departure()]
+        board.merge_departures([("a", "Stop A", departures)])
+        assert "stop_gid" not in departures[0]
+
+
+class TestParseTime:
+    """Test parsing API timestamps."""
+
+    def test_parses_utc_suffix(self):
+        """Test that a trailing Z is read as UTC."""
+        parsed = board.parse_time("2024-01-01T08:00:00Z")
+        assert parsed.utcoffset().total_seconds() == 0
+        assert parsed.hour == 8
+
+    @pytest.mark.parametrize("value", [None, "", "soon"])
+    def test_missing_or_malformed_is_none(self, value):
+        """Test that a missing or malformed timestamp gives None."""
+        assert board.parse_time(value) is None
@@ -0,0 +1,93 @@
+"""Tests for parsing bulk station imports."""
+import asyncio
+import re
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+config_flow = pytest.importorskip("custom_components.vasttrafik_m34.config_flow")
+
+from homeassistant.setup import async_setup_component  # noqa: E402
+
+from custom_components.vasttrafik_m34.const import DOMAIN  # noqa: E402
+
+
+class TestParseStationList:
+    """Test splitting pasted station lists."""
+
+    def test_lines_and_semicolons(self):
+        """Test that both separators are accepted."""
+        text = "Brunnsparken\nKorsvägen; Järntorget\n9021014001760000"
+        assert config_flow.parse_station_list(text) == [
+            "Brunnsparken",
+            "Korsvägen",
+            "Järntorget",
+            "9021014001760000",
+        ]
+
+    def test_blank_and_duplicate_items_dropped(self):
+        """Test that empty items and repeats are ignored, order kept."""
+        text = "\n Brunnsparken ;;\nKorsvägen\nBrunnsparken\n"
+        assert config_flow.parse_station_list(text) == ["Brunnsparken", "Korsvägen"]
+
+    def test_gid_pattern(self):
+        """Test that only 16-digit strings are treated as GIDs."""
+        assert config_flow.GID_PATTERN.match("9021014001760000")
+        assert not config_flow.GID_PATTERN.match("902101400176")
+
+
+@pytest.mark.usefixtures("socket_enabled")
+class TestResolveStations:
+    """Test resolving a pasted station list."""
+
+    async def test_timed_out_item_is_unresolved(self, hass):
+        """Test that a search timing out fails only its own item."""
+        mock = pytest.importorskip("aioresponses")
+
+        def _answer(url, **kwargs):
+            if kwargs["params"]["q"] == "Korsvägen":
+                raise asyncio.TimeoutError
+            return mock.CallbackResult(
+                payload={
+                    "results": [
+                        {
+                            "gid": "9021014001760000",
+                            "name": kwargs["params"]["q"],
+                            "locationType": "stoparea",
+                        }
+                    ]
+                }
+            )
+
+        with mock.aioresponses() as mocked:
+            mocked.get(
+                re.compile(r"https://ext-api\.vasttrafik\.se/pr/v4/locations/by-text.*"),
+                callback=_answer,
+                repeat=True,
+            )
+            resolved, unresolved = await config_flow.async_resolve_stations(
+                hass, "token", ["Brunnsparken", "Korsvägen"]
+            )
+        assert [station["name"] for station in resolved] == ["Brunnsparken"]
+        assert unresolved == ["Korsvägen"]
+
+
+class TestYamlImport:
+    """Test importing stations listed in configuration.yaml."""
+
+    async def test_stations_are_validated(self, hass, enable_custom_integrations):
+        """Test that listed stations are validated and handed to the flow."""
+        with patch.object(hass.config_entries.flow, "async_init", AsyncMock()) as init:
+            assert await async_setup_component(
+                hass,
+                DOMAIN,
+                {DOMAIN: {"auth_key": "a2V5", "stations": "Brunnsparken"}},
+            )
+            await hass.async_block_till_done()
+        assert init.call_args.kwargs["data"]["stations"] == ["Brunnsparken"]
+
+    async def test_invalid_config_is_refused(self, hass, enable_custom_integrations):
+        """Test that a station list without a key fails setup."""
+        assert not await async_setup_component(
+            hass, DOMAIN, {DOMAIN: {"stations": ["Brunnsparken"]}}
+        )
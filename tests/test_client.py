@@ -0,0 +1,204 @@
+"""Tests for the standalone Västtrafik API client."""
+from contextlib import asynccontextmanager
+import json
+import os
+from pathlib import Path
+import re
+import subprocess
+import sys
+
+import pytest
+
+aiohttp = pytest.importorskip("aiohttp")
+api = pytest.importorskip("custom_components.vasttrafik_m34.vasttrafik_api")
+
+from aiohttp import web  # noqa: E402
+
+from custom_components.vasttrafik_m34.vasttrafik_api.__main__ import (  # noqa: E402
+    async_bench,
+)
+from custom_components.vasttrafik_m34.vasttrafik_api.mock_server import (  # noqa: E402
+    create_app,
+)
+
+PACKAGE_DIR = Path(__file__).parent.parent / "custom_components" / "vasttrafik_m34"
+
+DEPARTURE = {
+    "detailsReference": "ref",
+    "serviceJourney": {
+        "gid": "9015014000600001",
+        "direction": "Kortedala",
+        "line": {"name": "6", "designation": "6"},
+    },
+    "stopPoint": {"platform": {"name": "B"}},
+    "plannedTime": "2024-01-01T08:00:00+01:00",
+    "estimatedTime": "2024-01-01T08:02:00+01:00",
+    "isCancelled": False,
+}
+
+
+@asynccontextmanager
+async def _serve(**kwargs):
+    """Serve the mock API on a free port and yield a session and its URL."""
+    runner = web.AppRunner(create_app(**kwargs))
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, "127.0.0.1", 0).start()
+        host, port = runner.addresses[0][:2]
+        async with aiohttp.ClientSession() as session:
+            yield session, f"http://{host}:{port}"
+    finally:
+        await runner.cleanup()
+
+
+async def _stats(session, server):
+    """Return the mock API's request counts."""
+    async with session.get(f"{server}/stats") as response:
+        return await response.json()
+
+
+class TestParsing:
+    """Test how API results are flattened."""
+
+    def test_parse_departure(self):
+        """Test delay, track and realtime flag."""
+        departure = api.parse_departure(DEPARTURE)
+        assert departure["line_number"] == "6"
+        assert departure["direction"] == "Kortedala"
+        assert departure["delay_minutes"] == 2
+        assert departure["track"] == "B"
+        assert departure["is_realtime"]
+        assert departure["details_reference"] == "ref"
+
+    def test_parse_departure_without_estimate(self):
+        """Test that the planned time stands in for a missing estimate."""
+        departure = api.parse_departure(
+            {**DEPARTURE, "estimatedTime": None, "stopPoint": {"platform": "A"}}
+        )
+        assert departure["estimated_time"] == DEPARTURE["plannedTime"]
+        assert departure["track"] == "A"
+        assert not departure["is_realtime"]
+
+    def test_parse_stop_area(self):
+        """Test that only stop areas are returned."""
+        assert api.parse_stop_area({"locationType": "address", "gid": "1"}) is None
+        assert api.parse_stop_area(
+            {"locationType": "stoparea", "gid": "1", "name": "Centrum"}
+        )["name"] == "Centrum"
+
+
+@pytest.mark.usefixtures("socket_enabled")
+class TestClient:
+    """Test the client against the mock API."""
+
+    async def test_token_is_reused(self):
+        """Test that one token serves every request."""
+        async with _serve() as (session, server):
+            client = api.VasttrafikClient(session, "a2V5", server=server)
+            departures = await client.async_get_departures("9021014001760000")
+            stops = await client.async_search_stop_areas("Brunnsparken", 5)
+            stats = await _stats(session, server)
+        assert departures and departures[0]["estimated_time"]
+        assert len(stops) == 5
+        assert stats["token"] == 1
+
+    async def test_stop_areas_within_pages(self):
+        """Test that a coordinate search follows the pages to the end."""
+        async with _serve() as (session, server):
+            token = await api.async_request_token(
+                session, "a2V5", token_url=f"{server}/token"
+            )
+            stops = await api.async_stop_areas_within(
+                session,
+                token.token,
+                57.7,
+                11.97,
+                1000,
+                page_size=10,
+                api_base=f"{server}/pr/v4",
+            )
+            stats = await _stats(session, server)
+        assert len(stops) == 25
+        assert stats["locations"] == 3
+
+    async def test_batch_keeps_failures_per_station(self):
+        """Test that failing stations do not fail the batch."""
+        async with _serve(error_rate=1.0) as (session, server):
+            client = api.VasttrafikClient(session, "a2V5", server=server)
+            # The token endpoint fails too, hand the client one
+            client._token = api.AccessToken("token", float("inf"))
+            results = await client.async_get_many_departures(["1", "2", "1"])
+        assert list(results) == ["1", "2"]
+        assert all(
+            isinstance(result, api.ApiError) and result.status == 503
+            for result in results.values()
+        )
+
+    async def test_refused_token_is_renewed_once(self):
+        """Test that a 401 fetches a new token and retries the request."""
+        aioresponses = pytest.importorskip("aioresponses").aioresponses
+        departures = re.compile(r"https://ext-api.vasttrafik.se/pr/v4/stop-areas/.*")
+        with aioresponses() as mocked:
+            mocked.post(
+                "https://ext-api.vasttrafik.se/token",
+                payload={"access_token": "token", "expires_in": 3600},
+                repeat=True,
+            )
+            mocked.get(departures, status=401)
+            mocked.get(departures, payload={"results": [DEPARTURE]})
+            async with aiohttp.ClientSession() as session:
+                client = api.VasttrafikClient(session, "a2V5")
+                result = await client.async_get_departures("9021014001760000")
+        assert result[0]["line_number"] == "6"
+        token_requests = [key for key in mocked.requests if key[0] == "POST"]
+        assert len(mocked.requests[token_requests[0]]) == 2
+
+    async def test_bench(self):
+        """Test that the load test counts every request."""
+        async with _serve() as (session, server):
+            client = api.VasttrafikClient(session, "a2V5", server=server)
+            result = await async_bench(client, ["1", "2", "3"], 30, concurrency=5)
+            stats = await _stats(session, server)
+        assert result["succeeded"] == 30
+        assert result["errors"] == {}
+        assert stats["departures"] == 30
+
+
+class TestStandalone:
+    """Test that the client works without Home Assistant."""
+
+    def test_no_home_assistant_imports(self):
+        """Test that importing the client loads nothing of Home Assistant."""
+        code = (
+            "import sys\n"
+            f"sys.path.insert(0, {str(PACKAGE_DIR)!r})\n"
+            "import vasttrafik_api, vasttrafik_api.__main__, vasttrafik_api.mock_server\n"
+            "print(sorted(m for m in sys.modules if m.startswith('homeassistant')))\n"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, check=True, text=True
+        )
+        assert result.stdout.strip() == "[]"
+
+    def test_cli_bench(self):
+        """Test the command line load test against the in-process mock API."""
+        result = subprocess.run(
+            [
+                sys.executable,
+                "-m",
+                "vasttrafik_api",
+                "bench",
+                "1",
+                "2",
+                "--mock",
+                "--requests",
+                "20",
+                "--concurrency",
+                "4",
+            ],
+            capture_output=True,
+            check=True,
+            env={**os.environ, "PYTHONPATH": str(PACKAGE_DIR)},
+            text=True,
+        )
+        assert json.loads(result.stdout)["succeeded"] == 20
@@ -0,0 +1,48 @@
+"""Tests for single-flight coalescing."""
+import asyncio
+
+import pytest
+
+coalesce = pytest.importorskip("custom_components.vasttrafik_m34.coalesce")
+
+
+class TestSingleFlight:
+    """Test that concurrent fetches share one request."""
+
+    def test_concurrent_calls_share_one_fetch(self):
+        """Test that callers joining an in-flight fetch get its result."""
+        group = coalesce.SingleFlight()
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return {"departures": []}
+
+        async def run():
+            return await asyncio.gather(*(group.run("A", fetch) for _ in range(5)))
+
+        results = asyncio.run(run())
+        assert len(calls) == 1
+        assert all(result is results[0] for result in results)
+        assert group.coalesced["A"] == 4
+
+    def test_errors_are_shared_and_cleared(self):
+        """Test that a failed fetch fails every caller and is not cached."""
+        group = coalesce.SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0)
+            raise RuntimeError("boom")
+
+        async def ok():
+            return 1
+
+        async def run():
+            results = await asyncio.gather(
+                group.run("A", fail), group.run("A", fail), return_exceptions=True
+            )
+            assert all(isinstance(result, RuntimeError) for result in results)
+            return await group.run("A", ok)
+
+        assert asyncio.run(run()) == 1
@@ -0,0 +1,349 @@
+"""Tests for the departures coordinator."""
+import asyncio
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+sensor = pytest.importorskip("custom_components.vasttrafik_m34.sensor")
+
+from homeassistant.exceptions import HomeAssistantError  # noqa: E402
+from homeassistant.helpers.update_coordinator import UpdateFailed  # noqa: E402
+from homeassistant.util import dt as dt_util  # noqa: E402
+from pytest_homeassistant_custom_component.common import (  # noqa: E402
+    async_fire_time_changed,
+)
+
+from custom_components.vasttrafik_m34 import resilience  # noqa: E402
+from custom_components.vasttrafik_m34.coalesce import SingleFlight  # noqa: E402
+from custom_components.vasttrafik_m34.const import HEDGE_MIN_SAMPLES  # noqa: E402
+from custom_components.vasttrafik_m34.timetable import (  # noqa: E402
+    TimetableSnapshot,
+)
+
+STATION_GID = "9021014001760000"
+
+
+def _coordinator(hass, cls=None, **kwargs):
+    """Return a coordinator whose collaborators are mocks."""
+    credentials = MagicMock()
+    credentials.interval_for.return_value = timedelta(minutes=1)
+    credentials.async_allow_request.return_value = True
+    situations = MagicMock()
+    situations.async_refresh = AsyncMock(side_effect=HomeAssistantError)
+    situations.index.lookup.return_value = []
+    options = {
+        "credentials": credentials,
+        "request_layer": MagicMock(),
+        "hedge_budget": resilience.HedgeBudget(0),
+        "single_flight": SingleFlight(),
+        "shared_cache": None,
+        "min_refresh_spacing": 0,
+        "situations": situations,
+        "journeys": MagicMock(),
+        "max_inferred_age": 0,
+        "punctuality": None,
+        "gate": MagicMock(active=True),
+        "idle_interval": 0,
+        **kwargs,
+    }
+    if cls is None:
+        return sensor.VasttrafikDataUpdateCoordinator(
+            hass, station_gid=STATION_GID, **options
+        )
+    return cls(hass, **options)
+
+
+class FakeRequests:
+    """Stand-in for _request_departures answering with scripted steps.
+
+    Each call runs the next step: a list of departures to answer with, an
+    exception to raise, or an (event, step) pair that waits for the event
+    first.
+    """
+
+    def __init__(self, *steps):
+        """Initialize the fake."""
+        self._steps = list(steps)
+        self.calls = 0
+        self.cancelled = 0
+
+    async def __call__(self, session, station_gid, access_token, params, credential):
+        """Answer one request."""
+        self.calls += 1
+        step = self._steps.pop(0)
+        try:
+            if isinstance(step, tuple):
+                event, step = step
+                await event.wait()
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if isinstance(step, Exception):
+            raise step
+        return step
+
+
+@pytest.fixture
+def fast_hedging(monkeypatch):
+    """Hedge after a few milliseconds instead of the production minimum."""
+    monkeypatch.setattr(resilience, "HEDGE_MIN_DELAY_SECONDS", 0.01)
+
+
+def _warm_up(coordinator, samples=HEDGE_MIN_SAMPLES):
+    """Record fast answers so the coordinator knows its usual latency."""
+    for _ in range(samples):
+        coordinator.latency.record(0.001)
+
+
+async def _fetch(coordinator):
+    """Fetch departures through the hedged path."""
+    return await coordinator._fetch_departures(
+        MagicMock(), STATION_GID, "token", {}, MagicMock()
+    )
+
+
+@pytest.mark.usefixtures("fast_hedging")
+class TestHedging:
+    """Test hedged departures requests."""
+
+    async def test_no_hedge_before_warm_up(self, hass):
+        """Test that a slow answer is awaited until enough latencies exist."""
+        coordinator = _coordinator(hass, hedge_budget=resilience.HedgeBudget(100))
+        _warm_up(coordinator, HEDGE_MIN_SAMPLES - 1)
+        answered = asyncio.Event()
+        coordinator._request_departures = FakeRequests((answered, ["slow"]))
+        hass.loop.call_later(0.05, answered.set)
+
+        assert await _fetch(coordinator) == ["slow"]
+        assert coordinator._request_departures.calls == 1
+        assert coordinator.hedge_budget.spent == 0
+
+    async def test_no_hedge_without_budget(self, hass):
+        """Test that a budget without a full request's tokens does not hedge."""
+        coordinator = _coordinator(hass, hedge_budget=resilience.HedgeBudget(5))
+        _warm_up(coordinator)
+        answered = asyncio.Event()
+        coordinator._request_departures = FakeRequests((answered, ["slow"]))
+        hass.loop.call_later(0.05, answered.set)
+
+        assert await _fetch(coordinator) == ["slow"]
+        assert coordinator._request_departures.calls == 1
+
+    async def test_hedge_wins_and_slow_primary_cancelled(self, hass):
+        """Test that the faster hedge answers and the primary is cancelled."""
+        coordinator = _coordinator(hass, hedge_budget=resilience.HedgeBudget(100))
+        _warm_up(coordinator)
+        requests = FakeRequests((asyncio.Event(), ["never"]), ["hedge"])
+        coordinator._request_departures = requests
+
+        assert await _fetch(coordinator) == ["hedge"]
+        await asyncio.sleep(0)
+        assert requests.calls == 2
+        assert requests.cancelled == 1
+        assert coordinator.hedge_budget.spent == 1
+        assert coordinator.hedge_budget.wins == 1
+
+    async def test_primary_wins_and_hedge_cancelled(self, hass):
+        """Test that a primary answering first cancels the hedge."""
+        coordinator = _coordinator(hass, hedge_budget=resilience.HedgeBudget(100))
+        _warm_up(coordinator)
+        primary_answered = asyncio.Event()
+        requests = FakeRequests(
+            (primary_answered, ["primary"]), (asyncio.Event(), ["never"])
+        )
+        coordinator._request_departures = requests
+        hass.loop.call_later(0.05, primary_answered.set)
+
+        assert await _fetch(coordinator) == ["primary"]
+        await asyncio.sleep(0)
+        assert requests.calls == 2
+        assert requests.cancelled == 1
+        assert coordinator.hedge_budget.wins == 0
+
+    async def test_failed_primary_answered_by_hedge(self, hass):
+        """Test that a primary failing after the hedge was sent is covered."""
+        coordinator = _coordinator(hass, hedge_budget=resilience.HedgeBudget(100))
+        _warm_up(coordinator)
+        primary_failed = asyncio.Event()
+        hedge_answered = asyncio.Event()
+        coordinator._request_departures = FakeRequests(
+            (primary_failed, UpdateFailed("primary")), (hedge_answered, ["hedge"])
+        )
+        hass.loop.call_later(0.03, primary_failed.set)
+        hass.loop.call_later(0.06, hedge_answered.set)
+
+        assert await _fetch(coordinator) == ["hedge"]
+        assert coordinator.hedge_budget.wins == 1
+
+    async def test_both_failed_raises_primary_error(self, hass):
+        """Test that the original request's error is reported."""
+        coordinator = _coordinator(hass, hedge_budget=resilience.HedgeBudget(100))
+        _warm_up(coordinator)
+        primary_failed = asyncio.Event()
+        coordinator._request_departures = FakeRequests(
+            (primary_failed, UpdateFailed("primary")), UpdateFailed("hedge")
+        )
+        hass.loop.call_later(0.05, primary_failed.set)
+
+        with pytest.raises(UpdateFailed, match="primary"):
+            await _fetch(coordinator)
+
+
+class TestRefreshSpacing:
+    """Test the minimum spacing of manual refreshes."""
+
+    @pytest.fixture
+    async def coordinator(self, hass):
+        """Return a coordinator with a 30 second spacing and a counted fetch."""
+        coordinator = _coordinator(hass, min_refresh_spacing=30)
+        coordinator._async_fetch = AsyncMock(
+            return_value={"departures": [], "last_update": None}
+        )
+        yield coordinator
+        await coordinator.async_shutdown()
+
+    async def test_quick_refreshes_fetch_once_then_deferred(self, hass, coordinator):
+        """Test that a second manual refresh is served now and run later."""
+        await coordinator.async_request_refresh()
+        await coordinator.async_request_refresh()
+        assert coordinator._async_fetch.await_count == 1
+        assert coordinator.served_from_cache == 1
+
+        async_fire_time_changed(hass, dt_util.utcnow() + timedelta(seconds=31))
+        await hass.async_block_till_done()
+        assert coordinator._async_fetch.await_count == 2
+
+    async def test_scheduled_fetch_replaces_deferred(self, hass, coordinator):
+        """Test that a fetch within the spacing satisfies the deferred refresh."""
+        await coordinator.async_request_refresh()
+        await coordinator.async_request_refresh()
+        await coordinator.async_refresh()
+        assert coordinator._async_fetch.await_count == 2
+
+        async_fire_time_changed(hass, dt_util.utcnow() + timedelta(seconds=31))
+        await hass.async_block_till_done()
+        assert coordinator._async_fetch.await_count == 2
+
+
+class TestBoard:
+    """Test combined boards of several stop areas."""
+
+    @pytest.fixture
+    def coordinator(self, hass):
+        """Return a board of three stops whose fetches are scripted."""
+        coordinator = _coordinator(
+            hass,
+            cls=sensor.VasttrafikBoardCoordinator,
+            board_id="board",
+            station_gids=["a", "b", "c"],
+            station_names=["Stop A", "Stop B", "Stop C"],
+        )
+        coordinator.failing = set()
+        coordinator.fetches = 0
+
+        async def _fetch(gid, params=None, observe=True):
+            coordinator.fetches += 1
+            if gid in coordinator.failing:
+                raise UpdateFailed(f"{gid} failed")
+            minute = {"a": 1, "b": 2, "c": 3}[gid] + coordinator.fetches
+            return {
+                "departures": [
+                    {
+                        "journey_gid": f"{gid}-{coordinator.fetches}",
+                        "line_number": "6",
+                        "line_designation": "6",
+                        "estimated_time": f"2030-01-01T08:{minute:02d}:00+01:00",
+                    }
+                ]
+            }
+
+        coordinator._fetch_station_departures = _fetch
+        return coordinator
+
+    async def test_failed_stop_keeps_departures_and_is_marked(self, coordinator):
+        """Test that one failing stop does not fail the board."""
+        await coordinator.async_refresh()
+        previous_b = [
+            dep for dep in coordinator.data["departures"] if dep["stop_gid"] == "b"
+        ]
+        assert coordinator.data["failed_stops"] == []
+
+        coordinator.failing = {"b"}
+        await coordinator.async_refresh()
+
+        assert coordinator.last_update_success
+        assert coordinator.data["failed_stops"] == ["b"]
+        by_stop = {dep["stop_gid"]: dep for dep in coordinator.data["departures"]}
+        assert set(by_stop) == {"a", "b", "c"}
+        assert [by_stop["b"]] == previous_b
+        assert by_stop["a"]["journey_gid"] != "a-1"
+
+    async def test_every_stop_failed_fails_the_refresh(self, coordinator):
+        """Test that the board fails when no stop answered."""
+        await coordinator.async_refresh()
+        coordinator.failing = {"a", "b", "c"}
+        await coordinator.async_refresh()
+        assert not coordinator.last_update_success
+
+
+class FakeTimetableApi:
+    """Stand-in for _fetch_station_departures serving one departure a minute.
+
+    Departures are answered for the requested window including both ends,
+    so consecutive chunks overlap, in pages of the requested size.
+    """
+
+    def __init__(self):
+        """Initialize the fake."""
+        self.requests = []
+
+    async def __call__(self, station_gid, params=None, observe=True):
+        """Answer one page."""
+        assert not observe
+        self.requests.append(params)
+        start = datetime.fromisoformat(params["startDateTime"])
+        minutes = range(params["timeSpanInMinutes"] + 1)
+        departures = [
+            {
+                "journey_gid": f"j{(start + timedelta(minutes=minute)).isoformat()}",
+                "line_number": "6",
+                "direction": "Kortedala",
+                "planned_time": (start + timedelta(minutes=minute)).isoformat(),
+                "estimated_time": (start + timedelta(minutes=minute)).isoformat(),
+            }
+            for minute in minutes
+        ]
+        offset = params["offset"]
+        return {"departures": departures[offset : offset + params["limit"]]}
+
+
+class TestTimetableDownload:
+    """Test downloading the planned timetable in chunks and pages."""
+
+    async def test_chunks_pages_until_snapshot_end(self, hass):
+        """Test that every chunk is paged to its end and overlaps are merged."""
+        timetable = TimetableSnapshot(hass, STATION_GID)
+        coordinator = _coordinator(hass, timetable=timetable)
+        api = FakeTimetableApi()
+        coordinator._fetch_station_departures = api
+        now = datetime(2030, 1, 1, 12, 0, tzinfo=timezone.utc)
+
+        await coordinator._async_refresh_timetable(now)
+
+        # 16 hours until 04:00: five full chunks and one of an hour
+        until = datetime(2030, 1, 2, 4, 0, tzinfo=timezone.utc)
+        spans = [params["timeSpanInMinutes"] for params in api.requests]
+        assert spans == [180] * 10 + [60]
+        # A chunk of 181 departures takes a full page and a short one
+        assert [params["offset"] for params in api.requests[:2]] == [0, 100]
+        assert all(
+            datetime.fromisoformat(params["startDateTime"]) < until
+            for params in api.requests
+        )
+        # One departure a minute from now to the end, each stored once
+        planned = timetable.planned(now, until + timedelta(minutes=1))
+        assert len(planned) == 16 * 60 + 1
+        assert len({dep["journey_gid"] for dep in planned}) == len(planned)
+        assert timetable.loaded
+        assert not timetable.needs_refresh(now, timedelta(hours=1))
@@ -0,0 +1,88 @@
+"""Tests for pooling several Authentication Keys."""
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+credentials = pytest.importorskip("custom_components.vasttrafik_m34.credentials")
+quota = pytest.importorskip("custom_components.vasttrafik_m34.quota")
+
+
+MORNING = datetime(2024, 1, 1, 8, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def pool(mock_hass):
+    """Return a pool of two keys whose planners do not touch storage."""
+    with patch.object(quota, "Store"), patch.object(
+        quota.dt_util, "now", return_value=MORNING
+    ), patch.object(quota.dt_util, "utcnow", return_value=MORNING):
+        yield credentials.CredentialPool(
+            [
+                credentials.Credential(MagicMock(), quota.QuotaPlanner(mock_hass, key))
+                for key in ("a2V5MQ==", "a2V5Mg==")
+            ]
+        )
+
+
+class TestCredentialPool:
+    """Test routing and health tracking across keys."""
+
+    def test_parse_auth_keys(self):
+        """Test that keys may be separated by lines or commas."""
+        assert credentials.parse_auth_keys("a\nb, c\n\na") == ["a", "b", "c"]
+        assert credentials.parse_auth_keys(None) == []
+
+    def test_select_most_remaining(self, pool):
+        """Test that requests go to the key with the most budget left."""
+        pool.async_register("A", 1000, lambda: True)
+        pool.credentials[0].planner.async_record_request(100)
+        assert pool.select() is pool.credentials[1]
+
+    def test_keys_add_up(self, pool):
+        """Test that two keys poll more often than one."""
+        pool.async_register("A", 200, lambda: True)
+        single = pool.primary.planner.interval_for("A")
+        assert pool.interval_for("A") < single
+
+    def test_failing_key_leaves_rotation(self, pool):
+        """Test that repeated failures take a key out until the cooldown ends."""
+        pool.async_register("A", 1000, lambda: True)
+        failing = pool.credentials[1]
+        for _ in range(credentials.CREDENTIAL_FAILURE_THRESHOLD):
+            pool.record_failure(failing)
+        assert not failing.healthy
+        pool.credentials[0].planner.async_record_request(100)
+        assert pool.select() is pool.primary
+
+        with patch.object(
+            credentials.time,
+            "monotonic",
+            return_value=failing.retry_at + 1,
+        ):
+            assert failing.healthy
+        pool.record_success(failing)
+        assert pool.select() is failing
+
+    def test_single_key_stays_in_rotation(self, mock_hass):
+        """Test that the only key is never taken out."""
+        with patch.object(quota, "Store"):
+            pool = credentials.CredentialPool(
+                [credentials.Credential(MagicMock(), quota.QuotaPlanner(mock_hass, "a"))]
+            )
+        for _ in range(credentials.CREDENTIAL_FAILURE_THRESHOLD + 1):
+            pool.record_failure(pool.primary)
+        assert pool.primary.healthy
+
+    def test_pooled_figures(self, pool):
+        """Test that budget, usage and exhaustion add up over the keys."""
+        pool.async_register("A", 1000, lambda: True)
+        assert pool.projected_exhaustion is None
+        pool.credentials[0].planner.async_record_request(300)
+        pool.credentials[1].planner.async_record_request(200)
+        assert pool.daily_budget == 2000
+        assert pool.used == 500
+        assert pool.remaining == 1500
+        assert not pool.degraded
+        # 500 requests in the last hour leave three hours of budget
+        assert pool.projected_exhaustion == MORNING + timedelta(hours=3)
@@ -0,0 +1,70 @@
+"""Tests for filtered departure lookups."""
+from datetime import timedelta
+
+import pytest
+
+departure_query = pytest.importorskip(
+    "custom_components.vasttrafik_m34.departure_query"
+)
+
+from custom_components.vasttrafik_m34.const import DOMAIN  # noqa: E402
+from custom_components.vasttrafik_m34.services import (  # noqa: E402
+    async_get_departures,
+)
+
+from .conftest import DEPARTURE_BASE as NOW, departure  # noqa: E402
+
+
+@pytest.fixture
+def index():
+    """Return an index over a small departure board."""
+    return departure_query.DepartureIndex(
+        {
+            "departures": [
+                departure("J0", -2, direction="Kortedala"),
+                departure("J1", 3, direction="Kortedala"),
+                departure("J2", 4, line="11", direction="Saltholmen", track="B"),
+                departure("J3", 6, direction="Länsmansgården"),
+                departure("J4", 12, direction="Kortedala via Centrum"),
+                departure("J5", 40, direction="Kortedala"),
+            ]
+        }
+    )
+
+
+class TestDepartureIndex:
+    """Test looking up departures with filters."""
+
+    def test_line_and_direction(self, index):
+        """Test that line and part of the destination narrow the answer."""
+        found = index.lookup(NOW, direction="kortedala")
+        assert [dep["key"] for dep in found] == ["J1", "J4", "J5"]
+        assert found[0]["minutes"] == 3
+
+    def test_limit_and_window(self, index):
+        """Test the limit and the time window."""
+        found = index.lookup(
+            NOW, line="6", limit=2, until=NOW + timedelta(minutes=30)
+        )
+        assert [dep["key"] for dep in found] == ["J1", "J3"]
+        found = index.lookup(NOW, until=NOW + timedelta(minutes=30))
+        assert [dep["key"] for dep in found] == ["J1", "J2", "J3", "J4"]
+
+    def test_track_and_unknown_line(self, index):
+        """Test the track filter and a line without departures."""
+        assert [dep["key"] for dep in index.lookup(NOW, track="b")] == ["J2"]
+        assert index.lookup(NOW, line="99") == []
+
+
+@pytest.mark.usefixtures("socket_enabled")
+class TestEntryIndex:
+    """Test the index kept for a loaded entry."""
+
+    async def test_dropped_on_unload(self, hass, loaded_entry):
+        """Test that unloading the entry drops its index."""
+        answer = await async_get_departures(hass, loaded_entry.entry_id, line="6")
+        assert len(answer["departures"]) == 3
+        assert loaded_entry.entry_id in hass.data[DOMAIN]["departure_indexes"]
+
+        assert await hass.config_entries.async_unload(loaded_entry.entry_id)
+        assert loaded_entry.entry_id not in hass.data[DOMAIN]["departure_indexes"]
@@ -0,0 +1,72 @@
+"""Tests for the cost of importing the integration."""
+import json
+from pathlib import Path
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+ROOT = Path(__file__).parent.parent
+
+# Measured from a fresh interpreter, so nothing the module pulls in is hidden
+_MEASURE = """
+import json, sys
+sys.path.insert(0, {root!r})
+before = set(sys.modules)
+import {module}
+print(json.dumps({{"modules": sorted(set(sys.modules) - before)}}))
+"""
+
+# The integration package itself: const and the package, nothing else
+MAX_INTEGRATION_MODULES = 3
+
+# Loaded only by entries that enable them, or on first use
+LAZY_MODULES = {
+    "config_flow",
+    "diagnostics",
+    "mock_server",
+    "mqtt_output",
+    "punctuality",
+    "services",
+    "shared_cache",
+    "timetable",
+    "views",
+}
+
+
+def _measure(module: str) -> dict:
+    """Import a module in a fresh interpreter and return what it cost."""
+    result = subprocess.run(
+        [sys.executable, "-c", _MEASURE.format(root=str(ROOT), module=module)],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+class TestImportBudget:
+    """Test that importing the integration stays cheap."""
+
+    def test_integration_import(self):
+        """Test that loading the integration imports only its constants."""
+        cost = _measure("custom_components.vasttrafik_m34")
+        integration = [
+            module
+            for module in cost["modules"]
+            if module.startswith("custom_components")
+        ]
+        assert len(integration) <= MAX_INTEGRATION_MODULES, integration
+
+    def test_sensor_platform_import(self):
+        """Test that the sensor platform leaves optional features unloaded."""
+        cost = _measure("custom_components.vasttrafik_m34.sensor")
+        loaded = {
+            module.rsplit(".", 1)[-1]
+            for module in cost["modules"]
+            if module.startswith("custom_components.vasttrafik_m34.")
+        }
+        assert not loaded & LAZY_MODULES
+        assert "sqlite3" not in cost["modules"]
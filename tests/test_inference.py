@@ -0,0 +1,79 @@
+"""Tests for cross-station journey inference."""
+from datetime import timedelta
+import time
+
+import pytest
+
+inference = pytest.importorskip("custom_components.vasttrafik_m34.inference")
+
+from homeassistant.util import dt as dt_util  # noqa: E402
+
+from .conftest import departure  # noqa: E402
+
+
+@pytest.fixture
+def now():
+    """Return the time departures are planned from."""
+    return dt_util.utcnow().replace(microsecond=0)
+
+
+class TestJourneyTracker:
+    """Test inferring downstream departures from upstream observations."""
+
+    def test_upstream_delay_carried_downstream(self, now):
+        """Test that a newer upstream delay updates the downstream estimate."""
+        tracker = inference.JourneyTracker()
+        downstream = [departure("J1", 10, base=now), departure("J2", 20, base=now)]
+        since = time.monotonic()
+        tracker.observe("upstream", [departure("J1", 5, delay=3, base=now)])
+        departures, updated = tracker.infer("downstream", downstream, since)
+        assert updated == 1
+        assert departures[0]["delay_minutes"] == 3
+        assert departures[0]["estimated_time"] == (
+            dt_util.parse_datetime(downstream[0]["planned_time"]) + timedelta(minutes=3)
+        ).isoformat()
+        assert departures[1] is downstream[1]
+
+    def test_running_early_not_carried(self, now):
+        """Test that an early upstream journey does not run early downstream."""
+        tracker = inference.JourneyTracker()
+        since = time.monotonic()
+        tracker.observe("upstream", [departure("J1", 5, delay=-2, base=now)])
+        departures, _ = tracker.infer(
+            "downstream", [departure("J1", 10, base=now)], since
+        )
+        assert departures[0]["delay_minutes"] == 0
+
+    def test_downstream_observation_ignored(self, now):
+        """Test that a stop the journey reaches later is not used."""
+        tracker = inference.JourneyTracker()
+        since = time.monotonic()
+        tracker.observe("later_stop", [departure("J1", 15, delay=4, base=now)])
+        _, updated = tracker.infer("station", [departure("J1", 10, base=now)], since)
+        assert updated == 0
+
+    def test_observation_older_than_fetch_ignored(self, now):
+        """Test that only observations newer than the last fetch count."""
+        tracker = inference.JourneyTracker()
+        tracker.observe("upstream", [departure("J1", 5, delay=3, base=now)])
+        _, updated = tracker.infer(
+            "station", [departure("J1", 10, base=now)], time.monotonic()
+        )
+        assert updated == 0
+
+    def test_departed_dropped(self, now):
+        """Test that departures in the past are removed."""
+        tracker = inference.JourneyTracker()
+        departures, _ = tracker.infer(
+            "station",
+            [departure("J1", -2, base=now), departure("J2", 5, base=now)],
+            time.monotonic(),
+        )
+        assert [dep["journey_gid"] for dep in departures] == ["J2"]
+
+    def test_old_journeys_pruned(self, now):
+        """Test that journeys long gone are forgotten."""
+        tracker = inference.JourneyTracker()
+        tracker.observe("a", [departure("J1", -120, base=now)])
+        tracker.observe("a", [departure("J2", 5, base=now)])
+        assert len(tracker) == 1
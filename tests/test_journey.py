@@ -0,0 +1,129 @@
+"""Tests for the journey details cache."""
+from datetime import timedelta
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+journey = pytest.importorskip("custom_components.vasttrafik_m34.journey")
+
+from homeassistant.util import dt as dt_util  # noqa: E402
+
+
+def _details(minutes_to_end):
+    """Return parsed details of a journey ending in some minutes."""
+    end = (dt_util.utcnow() + timedelta(minutes=minutes_to_end)).isoformat()
+    return {
+        "journey_gid": "J1",
+        "line": "6",
+        "direction": "Kortedala",
+        "calls": [
+            {
+                "stop_name": "Kortedala",
+                "stop_area_gid": "9021014004000000",
+                "track": "A",
+                "planned_arrival": end,
+                "estimated_arrival": None,
+                "planned_departure": None,
+                "estimated_departure": None,
+                "is_cancelled": False,
+            }
+        ],
+    }
+
+
+class TestParseJourneyDetails:
+    """Test parsing of the journey details payload."""
+
+    def test_calls_parsed(self):
+        """Test that calls keep their stop, platform and times."""
+        details = journey.parse_journey_details(
+            {
+                "serviceJourneys": [
+                    {
+                        "gid": "J1",
+                        "direction": "Kortedala",
+                        "line": {"name": "6"},
+                        "callsOnServiceJourney": [
+                            {
+                                "stopPoint": {
+                                    "name": "Brunnsparken",
+                                    "platform": "A",
+                                    "stopArea": {"gid": "1", "name": "Brunnsparken"},
+                                },
+                                "plannedDepartureTime": "2024-01-01T08:00:00+01:00",
+                            }
+                        ],
+                    }
+                ]
+            }
+        )
+        assert details["line"] == "6"
+        assert details["calls"][0]["stop_name"] == "Brunnsparken"
+        assert details["calls"][0]["track"] == "A"
+        assert details["calls"][0]["planned_departure"] == "2024-01-01T08:00:00+01:00"
+
+    def test_empty_payload(self):
+        """Test that a payload without journeys gives no calls."""
+        assert journey.parse_journey_details({})["calls"] == []
+
+
+class TestJourneyDetailsCache:
+    """Test caching of journey details."""
+
+    async def test_repeat_lookup_served_from_cache(self):
+        """Test that a second lookup does not fetch again."""
+        cache = journey.JourneyDetailsCache()
+        fetch = AsyncMock(return_value=_details(30))
+        await cache.async_get("ref", fetch)
+        assert await cache.async_get("ref", fetch) is fetch.return_value
+        assert fetch.await_count == 1
+        assert cache.hits == 1
+
+    async def test_expires_with_journey_end(self):
+        """Test that details are not served after the journey has ended."""
+        cache = journey.JourneyDetailsCache()
+        fetch = AsyncMock(return_value=_details(1))
+        await cache.async_get("ref", fetch)
+        later = dt_util.utcnow() + timedelta(seconds=90)
+        with patch.object(journey.dt_util, "utcnow", return_value=later):
+            await cache.async_get("ref", fetch)
+        assert fetch.await_count == 2
+
+    async def test_ended_journey_not_cached(self):
+        """Test that details of a finished journey are not stored."""
+        cache = journey.JourneyDetailsCache()
+        await cache.async_get("ref", AsyncMock(return_value=_details(-5)))
+        assert cache.as_dict()["cached"] == 0
+
+    async def test_least_recently_used_evicted(self):
+        """Test that the cache stays within its size."""
+        cache = journey.JourneyDetailsCache(size=2)
+        for ref in ("a", "b", "a", "c"):
+            await cache.async_get(ref, AsyncMock(return_value=_details(30)))
+        fetch = AsyncMock(return_value=_details(30))
+        await cache.async_get("a", fetch)
+        await cache.async_get("b", fetch)
+        assert fetch.await_count == 1
+
+
+class TestFetchJourneyDetails:
+    """Test the journey details request."""
+
+    async def test_endpoint_per_key(self):
+        """Test that backoff is kept per Authentication Key."""
+        token_manager = MagicMock(async_get_token=AsyncMock(return_value="token"))
+        planner = MagicMock(key_id="key1")
+        response = MagicMock(status=200, json=AsyncMock(return_value={}))
+        request_layer = MagicMock()
+        request_layer.request.return_value.__aenter__ = AsyncMock(
+            return_value=response
+        )
+        request_layer.request.return_value.__aexit__ = AsyncMock(return_value=None)
+
+        details = await journey.async_fetch_journey_details(
+            token_manager, planner, request_layer, "9021014001760000", "REF1"
+        )
+        assert details["calls"] == []
+        assert request_layer.request.call_args.kwargs["endpoint"] == (
+            "journey_details:key1"
+        )
@@ -0,0 +1,87 @@
+"""Tests for the MQTT departures output."""
+import json
+from unittest.mock import AsyncMock
+
+import pytest
+
+mqtt_output = pytest.importorskip("custom_components.vasttrafik_m34.mqtt_output")
+
+from .conftest import departure  # noqa: E402
+
+
+class TestBuildMessages:
+    """Test the topics published for a board."""
+
+    def test_board_and_next_per_line(self):
+        """Test that each line's topic carries its next departure."""
+        messages = mqtt_output.build_messages(
+            "vasttrafik/",
+            "9021014001760000",
+            [departure("J1", 10), departure("J2", 12, line="11"), departure("J3", 20)],
+        )
+        assert set(messages) == {
+            "vasttrafik/9021014001760000/board",
+            "vasttrafik/9021014001760000/line/6",
+            "vasttrafik/9021014001760000/line/11",
+        }
+        assert json.loads(messages["vasttrafik/9021014001760000/line/6"])["key"] == "J1"
+        assert len(json.loads(messages["vasttrafik/9021014001760000/board"])) == 3
+
+    def test_topic_wildcards_replaced(self):
+        """Test that line names cannot inject topic levels or wildcards."""
+        messages = mqtt_output.build_messages(
+            "base", "gid", [departure("J1", 10, line="X/+#")]
+        )
+        assert "base/gid/line/X___" in messages
+
+
+class TestDeparturePublisher:
+    """Test publishing only what changed."""
+
+    async def test_unchanged_not_republished_and_gone_line_cleared(self, mock_hass):
+        """Test retained messages are sent on change and cleared when gone."""
+        publish = AsyncMock()
+        publisher = mqtt_output.DeparturePublisher(mock_hass, "base", "gid", publish)
+        await publisher.async_publish(
+            [departure("J1", 10), departure("J2", 12, line="11")]
+        )
+        assert publish.await_count == 3
+        assert all(call.kwargs["retain"] for call in publish.await_args_list)
+
+        publish.reset_mock()
+        await publisher.async_publish(
+            [departure("J1", 10), departure("J2", 12, line="11")]
+        )
+        publish.assert_not_awaited()
+
+        await publisher.async_publish([departure("J1", 10)])
+        published = {call.args[1]: call.args[2] for call in publish.await_args_list}
+        assert published["base/gid/line/11"] == ""
+        assert "base/gid/line/6" not in published
+
+
+class TestBrokerPublish:
+    """Test publishing through Home Assistant's MQTT integration."""
+
+    async def test_retained_messages_reach_the_client(self, hass, mqtt_mock):
+        """Test that the MQTT integration sends and clears retained messages."""
+        publisher = mqtt_output.DeparturePublisher(hass, "base", "gid")
+        await publisher.async_publish(
+            [departure("J1", 10), departure("J2", 12, line="11")]
+        )
+        published = {
+            call.args[0]: call.args[1:] for call in mqtt_mock.async_publish.call_args_list
+        }
+        assert set(published) == {"base/gid/board", "base/gid/line/6", "base/gid/line/11"}
+        assert all(retain for _payload, _qos, retain in published.values())
+        assert json.loads(published["base/gid/line/11"][0])["key"] == "J2"
+
+        mqtt_mock.async_publish.reset_mock()
+        await publisher.async_publish([departure("J1", 10)])
+        published = {
+            call.args[0]: call.args[1] for call in mqtt_mock.async_publish.call_args_list
+        }
+        assert published == {
+            "base/gid/board": published["base/gid/board"],
+            "base/gid/line/11": "",
+        }
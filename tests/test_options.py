@@ -0,0 +1,163 @@
+"""Tests for applying changed options to a running entry."""
+from datetime import timedelta
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+pytest.importorskip("pytest_homeassistant_custom_component")
+pytest.importorskip("aioresponses")
+
+from homeassistant.helpers import entity_registry as er  # noqa: E402
+
+from custom_components.vasttrafik_m34.attributes import encoded_size  # noqa: E402
+from custom_components.vasttrafik_m34.const import (  # noqa: E402
+    ATTRIBUTE_FORMAT_COLUMNAR,
+    CONF_ATTRIBUTE_BYTES,
+    CONF_ATTRIBUTE_FORMAT,
+    CONF_DESTINATION,
+    CONF_DIRECTION_GID,
+    CONF_HEDGE_BUDGET,
+    CONF_IDLE_INTERVAL,
+    CONF_LEGACY_DEPARTURES,
+    CONF_LINES,
+    CONF_MAX_DEPARTURES,
+    CONF_MQTT_TOPIC,
+    CONF_POLL_CONDITIONS,
+    DOMAIN,
+)
+
+from .conftest import DEPARTURES_URL, STATION_GID  # noqa: E402
+
+
+def _departures_requests(mocked):
+    """Return the departures requests sent so far."""
+    return [
+        call
+        for (method, url), calls in mocked.requests.items()
+        if method == "GET" and DEPARTURES_URL.match(str(url))
+        for call in calls
+    ]
+
+
+def _sensor_state(hass):
+    """Return the state of the entry's departures sensor."""
+    entity_id = er.async_get(hass).async_get_entity_id(
+        "sensor", DOMAIN, f"vasttrafik_{STATION_GID}"
+    )
+    return hass.states.get(entity_id)
+
+
+class TestLiveOptions:
+    """Test options applied without a reload."""
+
+    async def test_filters_and_interval_applied_in_place(self, hass, loaded_entry):
+        """Test that filter and polling options need no reload or request."""
+        coordinator = loaded_entry.runtime_data
+        hedge_budget = coordinator.hedge_budget
+        requests = len(_departures_requests(loaded_entry.mocked))
+        assert _sensor_state(hass).attributes["departure_count"] == 4
+
+        with patch.object(
+            hass.config_entries, "async_reload", AsyncMock()
+        ) as reload:
+            hass.config_entries.async_update_entry(
+                loaded_entry,
+                options={
+                    CONF_LINES: "6",
+                    CONF_DESTINATION: "korte",
+                    CONF_MAX_DEPARTURES: 1,
+                    CONF_POLL_CONDITIONS: ["input_boolean.away"],
+                    CONF_IDLE_INTERVAL: 45,
+                    CONF_HEDGE_BUDGET: 20,
+                },
+            )
+            await hass.async_block_till_done()
+
+        reload.assert_not_awaited()
+        assert loaded_entry.runtime_data is coordinator
+        assert len(_departures_requests(loaded_entry.mocked)) == requests
+        # The condition entity does not exist, the station idles
+        assert coordinator.update_interval == timedelta(minutes=45)
+        # The hedge budget keeps its tokens and counters
+        assert coordinator.hedge_budget is hedge_budget
+        assert hedge_budget.as_dict()["percent"] == 20
+        attributes = _sensor_state(hass).attributes
+        assert attributes["departure_count"] == 2
+        assert [dep["destination"] for dep in attributes["departures_json"]] == [
+            "Kortedala"
+        ]
+
+    async def test_direction_sent_with_next_request(self, hass, loaded_entry):
+        """Test that a direction filter changes the query, not the entry."""
+        hass.config_entries.async_update_entry(
+            loaded_entry, options={CONF_DIRECTION_GID: "9021014004945000"}
+        )
+        await hass.async_block_till_done()
+        requests = len(_departures_requests(loaded_entry.mocked))
+
+        await loaded_entry.runtime_data.async_refresh()
+        sent = _departures_requests(loaded_entry.mocked)
+        assert len(sent) == requests + 1
+        assert sent[-1].kwargs["params"]["directionGid"] == "9021014004945000"
+
+    async def test_size_limit_counts_every_attribute(self, hass, loaded_entry):
+        """Test that departures, then situations, are trimmed to the limit."""
+        coordinator = loaded_entry.runtime_data
+        coordinator.async_set_updated_data(
+            {
+                **coordinator.data,
+                "situations": [
+                    {"title": f"Störning {index}", "description": "Försenad " * 10}
+                    for index in range(3)
+                ],
+            }
+        )
+        hass.config_entries.async_update_entry(
+            loaded_entry,
+            options={CONF_ATTRIBUTE_BYTES: 900, CONF_LEGACY_DEPARTURES: False},
+        )
+        await hass.async_block_till_done()
+
+        entity = hass.data["sensor"].get_entity(_sensor_state(hass).entity_id)
+        attributes = entity.extra_state_attributes
+        assert encoded_size(attributes) <= 900
+        assert "departures" not in attributes
+        assert 0 < len(attributes["departures_json"]) < 4
+        assert len(attributes["situations"]) < 3
+
+    async def test_hidden_formats_are_not_built(self, hass, loaded_entry):
+        """Test that columnar attributes build no objects or text lines."""
+        hass.config_entries.async_update_entry(
+            loaded_entry,
+            options={
+                CONF_ATTRIBUTE_FORMAT: ATTRIBUTE_FORMAT_COLUMNAR,
+                CONF_LEGACY_DEPARTURES: False,
+            },
+        )
+        await hass.async_block_till_done()
+
+        entity = hass.data["sensor"].get_entity(_sensor_state(hass).entity_id)
+        with patch(
+            "custom_components.vasttrafik_m34.sensor._departure_detail"
+        ) as detail, patch(
+            "custom_components.vasttrafik_m34.sensor._legacy_departure"
+        ) as legacy:
+            attributes = entity.extra_state_attributes
+        assert len(attributes["departures_columnar"]["line"]) == 4
+        detail.assert_not_called()
+        legacy.assert_not_called()
+
+
+class TestReloadOptions:
+    """Test options that rebuild the entry."""
+
+    async def test_reload_option_reloads(self, hass, loaded_entry):
+        """Test that an option in RELOAD_OPTIONS reloads the entry."""
+        with patch.object(
+            hass.config_entries, "async_reload", AsyncMock()
+        ) as reload:
+            hass.config_entries.async_update_entry(
+                loaded_entry, options={CONF_MQTT_TOPIC: "vasttrafik"}
+            )
+            await hass.async_block_till_done()
+        reload.assert_awaited_once_with(loaded_entry.entry_id)
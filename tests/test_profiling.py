@@ -0,0 +1,192 @@
+"""Tests for refresh timing, loop lag and on-demand profiling."""
+import asyncio
+import pstats
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+profiling = pytest.importorskip("custom_components.vasttrafik_m34.profiling")
+
+from custom_components.vasttrafik_m34.const import DOMAIN  # noqa: E402
+
+
+def _busy(seconds):
+    """Hold the thread like a slow parser would."""
+    deadline = profiling.time.perf_counter() + seconds
+    while profiling.time.perf_counter() < deadline:
+        pass
+
+
+@pytest.fixture
+def profile_session(mock_hass):
+    """Run a profile session for the test."""
+    session = profiling.ProfileSession()
+    mock_hass.data = {DOMAIN: {"profile_session": session}}
+    yield session
+    session.stop()
+
+
+class TestRefreshTimer:
+    """Test refresh timing, and that only the time holding the loop counts."""
+
+    async def test_not_wrapped_without_profile(self, mock_hass):
+        """Test that outside a profile a refresh is awaited directly."""
+        mock_hass.data = {}
+        timer = profiling.RefreshTimer(mock_hass, "station")
+
+        async def _refresh():
+            await asyncio.sleep(0.05)
+            return {"departures": []}
+
+        with patch.object(profiling, "_Instrumented") as instrumented:
+            assert await timer.async_run(_refresh) == {"departures": []}
+        instrumented.assert_not_called()
+        assert timer.stats.max >= 0.05
+        assert timer.loop_stats.as_dict() == {"samples": 0}
+
+    async def test_long_refresh_is_logged_once(self, mock_hass, caplog):
+        """Test that long refreshes are logged once per warning interval."""
+        mock_hass.data = {}
+        timer = profiling.RefreshTimer(mock_hass, "station")
+
+        async def _refresh():
+            await asyncio.sleep(0.02)
+
+        with patch.object(profiling, "LONG_REFRESH_SECONDS", 0.01):
+            await timer.async_run(_refresh)
+            await timer.async_run(_refresh)
+        assert timer.long_refreshes == 2
+        assert caplog.text.count("Refresh of station took") == 1
+
+    @pytest.mark.usefixtures("profile_session")
+    async def test_waiting_is_not_counted(self, mock_hass):
+        """Test that awaiting the API does not make a refresh slow."""
+        timer = profiling.RefreshTimer(mock_hass, "station")
+
+        async def _refresh():
+            await asyncio.sleep(0.2)
+            return {"departures": []}
+
+        assert await timer.async_run(_refresh) == {"departures": []}
+        assert timer.loop_stats.max < profiling.SLOW_REFRESH_SECONDS
+        assert timer.stats.max >= 0.2
+        assert timer.slow_refreshes == 0
+
+    @pytest.mark.usefixtures("profile_session")
+    async def test_slow_refresh_is_logged(self, mock_hass, caplog):
+        """Test that a refresh holding the loop is counted and logged."""
+        timer = profiling.RefreshTimer(mock_hass, "station")
+
+        async def _refresh():
+            await asyncio.sleep(0)
+            _busy(profiling.SLOW_REFRESH_SECONDS)
+            await asyncio.sleep(0)
+            _busy(profiling.SLOW_REFRESH_SECONDS / 2)
+
+        await timer.async_run(_refresh)
+        assert timer.loop_stats.max >= profiling.SLOW_REFRESH_SECONDS * 1.5
+        assert timer.slow_refreshes == 1
+        assert "held the event loop" in caplog.text
+
+    @pytest.mark.usefixtures("profile_session")
+    async def test_errors_and_cancellation_reach_the_refresh(self, mock_hass):
+        """Test that the wrapper forwards exceptions into the coroutine."""
+        timer = profiling.RefreshTimer(mock_hass, "station")
+        cleaned_up = asyncio.Event()
+
+        async def _refresh():
+            try:
+                await asyncio.sleep(10)
+            finally:
+                cleaned_up.set()
+
+        task = asyncio.create_task(timer.async_run(_refresh))
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert cleaned_up.is_set()
+        assert timer.loop_stats.as_dict()["samples"] == 1
+
+
+class TestLoopLagMonitor:
+    """Test the shared event loop lag measurement."""
+
+    async def test_late_callback_is_measured(self, mock_hass, caplog):
+        """Test that a blocked loop shows up as lag."""
+        mock_hass.data = {}
+        mock_hass.loop = asyncio.get_running_loop()
+        monitor = profiling.async_get_loop_lag_monitor(mock_hass)
+        assert profiling.async_get_loop_lag_monitor(mock_hass) is monitor
+
+        with patch.object(profiling, "LOOP_LAG_INTERVAL_SECONDS", 0.01):
+            unregister = monitor.async_register()
+            second = monitor.async_register()
+            _busy(profiling.LOOP_LAG_WARNING_SECONDS + 0.05)
+            await asyncio.sleep(0.05)
+        assert monitor.stats.max > profiling.LOOP_LAG_WARNING_SECONDS
+        assert "ran" in caplog.text and "late" in caplog.text
+
+        unregister()
+        assert monitor._handle is not None
+        second()
+        assert monitor._handle is None
+
+
+class TestProfileSession:
+    """Test the profile action."""
+
+    async def test_profile_writes_files(self, mock_hass, tmp_path):
+        """Test that a profile covers refreshes and renders of each entry."""
+        mock_hass.data = {}
+        mock_hass.config.path = MagicMock(return_value=str(tmp_path))
+
+        in_executor = False
+        snapshot = profiling.ProfileSession.snapshot
+
+        async def _executor(func, *args):
+            nonlocal in_executor
+            in_executor = True
+            # A second profile is refused until the results are written
+            with pytest.raises(profiling.HomeAssistantError):
+                await profiling.async_run_profile(mock_hass, 1)
+            try:
+                return func(*args)
+            finally:
+                in_executor = False
+
+        def _snapshot(session):
+            assert in_executor
+            return snapshot(session)
+
+        mock_hass.async_add_executor_job = _executor
+        timer = profiling.RefreshTimer(mock_hass, "station")
+
+        async def _refresh():
+            await asyncio.sleep(0)
+            return sorted(range(1000), reverse=True)
+
+        async def _exercise():
+            await asyncio.sleep(0.01)
+            assert profiling.async_get_profile_session(mock_hass) is not None
+            await timer.async_run(_refresh)
+            profiling.async_profile_render(mock_hass, "station", lambda: None)
+
+        exercise = asyncio.create_task(_exercise())
+        with patch.object(profiling.ProfileSession, "snapshot", _snapshot):
+            files = await profiling.async_run_profile(mock_hass, 0.05)
+        await exercise
+
+        assert profiling.async_get_profile_session(mock_hass) is None
+        assert DOMAIN in mock_hass.data
+        cprof, memory = files
+        assert cprof.endswith(".station.cprof")
+        stats = pstats.Stats(cprof)
+        assert any(func[2] == "_refresh" for func in stats.stats)
+        assert "station: 3 profiled steps" in open(memory, encoding="utf-8").read()
+
+    async def test_one_profile_at_a_time(self, mock_hass):
+        """Test that a second profile is refused while one runs."""
+        mock_hass.data = {DOMAIN: {"profile_session": object()}}
+        with pytest.raises(profiling.HomeAssistantError):
+            await profiling.async_run_profile(mock_hass, 1)
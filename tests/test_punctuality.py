@@ -0,0 +1,81 @@
+"""Tests for the punctuality statistics."""
+from datetime import timedelta
+
+import pytest
+
+punctuality = pytest.importorskip("custom_components.vasttrafik_m34.punctuality")
+
+from .conftest import DEPARTURE_BASE, departure  # noqa: E402
+
+# Departures are planned relative to the start of this hour
+HOUR = DEPARTURE_BASE
+
+
+class TestLineStats:
+    """Test the streaming aggregates."""
+
+    def test_mean_quantiles_and_cancellations(self):
+        """Test the aggregates over a few departures."""
+        stats = punctuality.LineStats()
+        for delay in (0, 0, 1, 2, 10):
+            stats.add(delay, False)
+        stats.add(0, True)
+        assert stats.count == 6
+        assert stats.mean_delay == pytest.approx(2.6)
+        assert stats.quantile(0.5) == 1
+        assert stats.quantile(0.9) == 10
+        assert stats.cancellation_rate == pytest.approx(1 / 6)
+        assert (stats.delay_min, stats.delay_max) == (0, 10)
+
+
+class TestPunctualityTracker:
+    """Test counting departures once they have left."""
+
+    def test_counted_once_after_departure(self):
+        """Test that a departure counts once, with its last observed delay."""
+        tracker = punctuality.PunctualityTracker()
+        tracker.observe("stop", [departure("J1", 10, delay=1)], now=HOUR)
+        assert not tracker.hours
+        for minutes in (5, 14, 15):
+            # Still listed for a while after it left
+            tracker.observe(
+                "stop",
+                [departure("J1", 10, delay=3)],
+                now=HOUR + timedelta(minutes=minutes),
+            )
+        stats = tracker.hours[(HOUR, "stop", "6")]
+        assert stats.count == 1
+        assert stats.mean_delay == 3
+
+    def test_completed_hours(self):
+        """Test that only hours that have ended are handed out."""
+        tracker = punctuality.PunctualityTracker()
+        tracker.observe(
+            "stop",
+            [departure("J1", 10), departure("J2", 70)],
+            now=HOUR + timedelta(hours=2),
+        )
+        completed = tracker.pop_completed(HOUR + timedelta(hours=1, minutes=30))
+        assert list(completed) == [(HOUR, "stop", "6")]
+        assert list(tracker.hours) == [(HOUR + timedelta(hours=1), "stop", "6")]
+
+    def test_late_observation_of_published_hour(self):
+        """Test that a departure first seen after its hour was written is dropped."""
+        tracker = punctuality.PunctualityTracker()
+        tracker.observe("stop", [departure("J1", 10)], now=HOUR + timedelta(minutes=20))
+        assert list(tracker.pop_completed(HOUR + timedelta(hours=1)))
+        tracker.observe(
+            "stop",
+            [departure("J2", 50, delay=30), departure("J3", 65)],
+            now=HOUR + timedelta(hours=1, minutes=10),
+        )
+        assert list(tracker.hours) == [(HOUR + timedelta(hours=1), "stop", "6")]
+
+    def test_statistic_rows(self):
+        """Test the rows written for one line and hour."""
+        stats = punctuality.LineStats()
+        stats.add(2, False)
+        rows = {metric: row for metric, _, row in punctuality.statistic_rows(HOUR, stats)}
+        assert set(rows) == {"departures", "cancelled", "delay", "delay_p50", "delay_p90"}
+        assert rows["delay"]["mean"] == 2
+        assert rows["cancelled"]["mean"] == 0
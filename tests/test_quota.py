@@ -0,0 +1,73 @@
+"""Tests for the request quota planner."""
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import pytest
+
+quota = pytest.importorskip("custom_components.vasttrafik_m34.quota")
+
+
+MORNING = datetime(2024, 1, 1, 8, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def frozen_time():
+    """Freeze the planner's clock at a weekday morning."""
+    with patch.object(quota.dt_util, "now", return_value=MORNING), patch.object(
+        quota.dt_util, "utcnow", return_value=MORNING
+    ):
+        yield MORNING
+
+
+@pytest.fixture
+def planner(mock_hass):
+    """Return a planner that does not touch storage."""
+    with patch.object(quota, "Store"):
+        yield quota.QuotaPlanner(mock_hass, "dGVzdDp0ZXN0")
+
+
+class TestQuotaPlanner:
+    """Test how the daily budget is spread across stations."""
+
+    def test_weighted_seconds_follows_profile(self):
+        """Test that the weight integral uses the hourly profile."""
+        start = datetime(2024, 1, 1, 3, 0)
+        end = datetime(2024, 1, 1, 4, 30)
+        expected = 3600 * quota.TIME_OF_DAY_WEIGHTS[3] + 1800 * quota.TIME_OF_DAY_WEIGHTS[4]
+        assert quota._weighted_seconds(start, end) == pytest.approx(expected)
+
+    def test_more_stations_poll_less_often(self, planner):
+        """Test that adding stations lengthens each station's interval."""
+        planner.async_register("A", 2000, lambda: True)
+        single = planner.interval_for("A")
+        for gid in ("B", "C", "D"):
+            planner.async_register(gid, 2000, lambda: True)
+        assert planner.interval_for("A") >= single
+
+    def test_unconsumed_station_gets_smaller_share(self, planner):
+        """Test that stations nobody reads poll less often."""
+        planner.async_register("A", 2000, lambda: True)
+        planner.async_register("B", 2000, lambda: False)
+        assert planner.interval_for("B") >= planner.interval_for("A")
+
+    def test_lowest_budget_wins(self, planner):
+        """Test that differing budgets resolve to the most conservative one."""
+        planner.async_register("A", 5000, lambda: True)
+        planner.async_register("B", 1000, lambda: True)
+        assert planner.daily_budget == 1000
+
+    def test_degraded_serves_cached_data(self, planner, frozen_time):
+        """Test that the reserve is kept for stations without data."""
+        planner.async_register("A", 1000, lambda: True)
+        planner.async_record_request(990)
+        assert planner.degraded
+        assert not planner.async_allow_request(has_data=True)
+        assert planner.async_allow_request(has_data=False)
+        assert planner.interval_for("A") == quota.MAX_SCAN_INTERVAL
+
+    def test_projected_exhaustion(self, planner, frozen_time):
+        """Test that a high request rate projects exhaustion before midnight."""
+        planner.async_register("A", 1000, lambda: True)
+        assert planner.projected_exhaustion is None
+        planner.async_record_request(500)
+        assert planner.projected_exhaustion == frozen_time + timedelta(hours=1)
@@ -0,0 +1,143 @@
+"""Tests for the rate-limit aware request layer."""
+from unittest.mock import patch
+
+import pytest
+
+resilience = pytest.importorskip("custom_components.vasttrafik_m34.resilience")
+
+
+class TestRetryAfter:
+    """Test Retry-After parsing."""
+
+    def test_delta_seconds(self):
+        """Test the delta-seconds form."""
+        assert resilience.parse_retry_after("120") == 120.0
+
+    def test_http_date_in_the_past(self):
+        """Test that an HTTP date in the past means retry now."""
+        assert resilience.parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+
+    def test_garbage(self):
+        """Test that unparseable values are ignored."""
+        assert resilience.parse_retry_after("soon") is None
+        assert resilience.parse_retry_after(None) is None
+
+
+class TestBackoff:
+    """Test jittered exponential backoff."""
+
+    def test_grows_and_resets(self):
+        """Test that delays grow with failures and reset on success."""
+        backoff = resilience.Backoff(base=10, cap=100)
+        delays = [backoff.record_failure() for _ in range(6)]
+        assert 5 <= delays[0] <= 10
+        assert 50 <= delays[-1] <= 100
+        assert backoff.remaining > 0
+        backoff.record_success()
+        assert backoff.remaining == 0
+        assert backoff.failures == 0
+
+    def test_retry_after_wins(self):
+        """Test that the server's Retry-After is honoured."""
+        backoff = resilience.Backoff(base=10, cap=100)
+        assert backoff.record_failure(retry_after=600) == 600
+
+
+class TestCircuitBreaker:
+    """Test the per-host circuit breaker."""
+
+    def test_single_probe_when_half_open(self):
+        """Test that only one request probes a failing host."""
+        clock = [1000.0]
+        with patch.object(resilience.time, "monotonic", side_effect=lambda: clock[0]):
+            breaker = resilience.CircuitBreaker("api", failure_threshold=2, recovery_timeout=60)
+            breaker.record_failure()
+            assert breaker.allow_request()
+            breaker.record_failure()
+            assert breaker.state == resilience.STATE_OPEN
+            assert not breaker.allow_request()
+
+            clock[0] += 61
+            assert breaker.state == resilience.STATE_HALF_OPEN
+            assert breaker.allow_request()
+            assert not breaker.allow_request()
+
+            breaker.record_failure()
+            assert breaker.state == resilience.STATE_OPEN
+            clock[0] += 61
+            assert breaker.allow_request()
+            breaker.record_success()
+            assert breaker.state == resilience.STATE_CLOSED
+            assert breaker.as_dict()["trips"] == 1
+
+    async def test_own_breaker_keeps_host_open(self):
+        """Test that a failing API with its own breaker does not pause the host."""
+        aiohttp = pytest.importorskip("aiohttp")
+        aioresponses = pytest.importorskip("aioresponses").aioresponses
+        situations = "https://ext-api.vasttrafik.se/ts/v1/traffic-situations"
+        departures = "https://ext-api.vasttrafik.se/pr/v4/stop-areas/1/departures"
+        layer = resilience.RequestLayer()
+        with aioresponses() as mocked:
+            mocked.get(situations, status=503, repeat=True)
+            mocked.get(departures, payload={"results": []})
+            async with aiohttp.ClientSession() as session:
+                # One key each, so no endpoint backoff gets in the way
+                for key in range(resilience.BREAKER_FAILURE_THRESHOLD):
+                    with pytest.raises(resilience.RateLimited):
+                        async with layer.request(
+                            session,
+                            "GET",
+                            situations,
+                            endpoint=f"situations:{key}",
+                            breaker="situations",
+                        ):
+                            pass
+                async with layer.request(session, "GET", departures) as response:
+                    assert response.status == 200
+        assert layer.breakers["situations"].state == resilience.STATE_OPEN
+        assert layer.breakers["ext-api.vasttrafik.se"].state == resilience.STATE_CLOSED
+
+
+class TestHedging:
+    """Test latency tracking and the hedge budget."""
+
+    def test_no_hedging_without_samples(self):
+        """Test that hedging waits for enough latency samples."""
+        tracker = resilience.LatencyTracker()
+        tracker.record(0.2)
+        assert tracker.hedge_delay() is None
+
+    def test_hedge_delay_is_p95(self):
+        """Test that the hedge delay follows the 95th percentile."""
+        tracker = resilience.LatencyTracker()
+        for ms in range(1, 41):
+            tracker.record(ms / 10)
+        assert tracker.hedge_delay() == pytest.approx(3.9)
+
+    def test_budget_limits_share(self):
+        """Test that a 10 percent budget allows one hedge per ten requests."""
+        budget = resilience.HedgeBudget(10)
+        spent = 0
+        for _ in range(100):
+            budget.earn()
+            spent += budget.try_spend()
+        assert spent == 10
+
+    def test_update_keeps_tokens_and_counters(self):
+        """Test that changing the share does not reset the bucket."""
+        budget = resilience.HedgeBudget(50)
+        budget.earn()
+        budget.earn()
+        assert budget.try_spend()
+        budget.earn()
+        budget.update_percent(50)
+        budget.earn()
+        assert budget.try_spend()
+        assert budget.spent == 2
+
+    def test_zero_budget_disables(self):
+        """Test that a zero budget never hedges."""
+        budget = resilience.HedgeBudget(0)
+        budget.earn()
+        assert not budget.enabled
+        assert not budget.try_spend()
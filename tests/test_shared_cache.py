@@ -0,0 +1,102 @@
+"""Tests for the departures cache shared between instances."""
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+shared_cache = pytest.importorskip("custom_components.vasttrafik_m34.shared_cache")
+
+
+DATA = {"departures": [{"line_number": "6"}], "quota_limited": False}
+
+
+@pytest.fixture
+def caches(mock_hass, tmp_path):
+    """Return the caches of two instances sharing one directory."""
+
+    async def _run(func, *args):
+        return func(*args)
+
+    mock_hass.async_add_executor_job = _run
+    path = str(tmp_path / shared_cache.SHARED_CACHE_FILENAME)
+    caches = [
+        shared_cache.SqliteSharedCache(mock_hass, owner, path)
+        for owner in ("instance-a", "instance-b")
+    ]
+    yield caches
+    for cache in caches:
+        cache.close()
+
+
+class TestSharedCache:
+    """Test leases and shared results."""
+
+    async def test_second_instance_reads_result(self, caches):
+        """Test that only the first instance fetches a fresh stop area."""
+        first, second = caches
+        fetch = AsyncMock(return_value=DATA)
+        assert await first.async_run("S1", 60, fetch) == (DATA, True)
+        assert await second.async_run("S1", 60, fetch) == (DATA, False)
+        assert fetch.await_count == 1
+        assert second.hits == 1
+
+    async def test_lease_excludes_other_instances(self, caches):
+        """Test that a held lease is not handed to another instance."""
+        first, second = caches
+        assert await first.async_acquire("departures:S1", 30)
+        assert not await second.async_acquire("departures:S1", 30)
+        await first.async_release("departures:S1")
+        assert await second.async_acquire("departures:S1", 30)
+
+    async def test_waiter_gets_holder_result(self, caches, monkeypatch):
+        """Test that an instance waits for the lease holder's fetch."""
+        monkeypatch.setattr(shared_cache, "SHARED_POLL_SECONDS", 0)
+        first, second = caches
+        assert await first.async_acquire("departures:S1", 30)
+        fetch = AsyncMock(return_value=DATA)
+        waiter = asyncio.ensure_future(second.async_run("S1", 60, fetch))
+        await asyncio.sleep(0)
+        await first.async_set_departures("S1", DATA)
+        assert await waiter == (DATA, False)
+        fetch.assert_not_awaited()
+
+    async def test_tokens(self, caches):
+        """Test that a stored token is visible to the other instance."""
+        first, second = caches
+        await first.async_set_token("key", "tok", 4102444800)
+        assert await second.async_get_token("key") == ("tok", 4102444800)
+        await first.async_set_token("old", "tok", 1)
+        assert await second.async_get_token("old") is None
+
+    async def test_unusable_cache_still_fetches(self, mock_hass, tmp_path):
+        """Test that a broken cache falls back to a direct fetch."""
+
+        async def _run(func, *args):
+            return func(*args)
+
+        mock_hass.async_add_executor_job = _run
+        cache = shared_cache.SqliteSharedCache(
+            mock_hass, "instance-a", str(tmp_path / "missing" / "cache.db")
+        )
+        fetch = AsyncMock(return_value=DATA)
+        assert await cache.async_run("S1", 60, fetch) == (DATA, True)
+
+    async def test_connection_is_reused(self, caches):
+        """Test that the schema is set up once and the connection kept."""
+        first, _ = caches
+        await first.async_set_departures("S1", DATA)
+        conn = first._conn
+        assert await first.async_get_departures("S1", 60) == DATA
+        assert await first.async_acquire("departures:S1", 30)
+        assert first._conn is conn
+
+    async def test_owner_differs_per_process(self, mock_hass, tmp_path):
+        """Test that installs sharing an instance id hold different leases."""
+        mock_hass.data = {}
+        with patch.object(
+            shared_cache.instance_id, "async_get", AsyncMock(return_value="cloned")
+        ):
+            cache = await shared_cache.async_get_shared_cache(mock_hass, str(tmp_path))
+        assert cache.owner.startswith("cloned:")
+        assert cache.owner != "cloned"
+        mock_hass.bus.async_listen_once.assert_called_once()
@@ -0,0 +1,65 @@
+"""Tests for the traffic situations index and feed."""
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+situations = pytest.importorskip("custom_components.vasttrafik_m34.situations")
+
+RAW = [
+    {
+        "situationNumber": "S1",
+        "title": "Track work at Brunnsparken",
+        "affectedStopPoints": [
+            {"gid": "9022014001760001", "stopAreaGid": "9021014001760000"},
+            {"gid": "9022014001760002", "stopAreaGid": "9021014001760000"},
+        ],
+        "affectedLines": [],
+    },
+    {
+        "situationNumber": "S2",
+        "title": "Line 6 diverted",
+        "affectedStopPoints": [{"stopAreaGid": "9021014004000000"}],
+        "affectedLines": [{"designation": "6", "name": "6"}],
+    },
+]
+
+
+class TestSituationIndex:
+    """Test looking up situations by stop area and line."""
+
+    def test_lookup_by_stop_area(self):
+        """Test that a stop area finds its situation once."""
+        index = situations.SituationIndex(RAW)
+        found = index.lookup(["9021014001760000"], [])
+        assert [s["id"] for s in found] == ["S1"]
+
+    def test_lookup_by_line(self):
+        """Test that a line serving the station finds its situation."""
+        index = situations.SituationIndex(RAW)
+        found = index.lookup(["9021014001760000"], ["6", "11"])
+        assert [s["id"] for s in found] == ["S1", "S2"]
+
+    def test_unrelated_station(self):
+        """Test that an unaffected station gets nothing."""
+        assert situations.SituationIndex(RAW).lookup(["1"], ["99"]) == []
+
+
+class TestSituationFeed:
+    """Test sharing and refreshing the feed."""
+
+    async def test_concurrent_refreshes_share_one_fetch(self):
+        """Test that stations refreshing together cause one fetch."""
+        feed = situations.SituationFeed(MagicMock(), MagicMock(), MagicMock())
+        feed._async_fetch = AsyncMock()
+        await feed.async_refresh()
+        await feed.async_refresh()
+        assert feed._async_fetch.await_count == 1
+
+    async def test_failed_fetch_waits_for_ttl(self):
+        """Test that a failing feed is not retried on every tick."""
+        feed = situations.SituationFeed(MagicMock(), MagicMock(), MagicMock())
+        feed._async_fetch = AsyncMock(side_effect=OSError)
+        with pytest.raises(OSError):
+            await feed.async_refresh()
+        assert not feed.stale
+        assert await feed.async_refresh() is feed.index
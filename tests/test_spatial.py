@@ -0,0 +1,49 @@
+"""Tests for the stop-area spatial index."""
+import math
+import random
+
+import pytest
+
+spatial = pytest.importorskip("custom_components.vasttrafik_m34.spatial")
+
+
+def _brute_force(points, lat, lon, k):
+    """Return the k nearest items by planar distance."""
+    cos_lat0 = math.cos(math.radians(sum(p[0] for p in points) / len(points)))
+
+    def dist(point):
+        dx = math.radians(point[1] - lon) * cos_lat0
+        dy = math.radians(point[0] - lat)
+        return math.hypot(dx, dy)
+
+    return [point[2] for point in sorted(points, key=dist)[:k]]
+
+
+class TestKDTree:
+    """Test nearest-neighbour queries."""
+
+    def test_matches_brute_force(self):
+        """Test that the tree returns the same neighbours as a full scan."""
+        rng = random.Random(34)
+        points = [
+            (57.5 + rng.random(), 11.5 + rng.random(), f"stop{i}") for i in range(500)
+        ]
+        tree = spatial.KDTree(points)
+        for _ in range(20):
+            lat, lon = 57.5 + rng.random(), 11.5 + rng.random()
+            found = [item for _, item in tree.nearest(lat, lon, 7)]
+            assert found == _brute_force(points, lat, lon, 7)
+
+    def test_distances_are_sorted_metres(self):
+        """Test that distances are ascending and roughly in metres."""
+        tree = spatial.KDTree(
+            [(57.7068, 11.9670, "Brunnsparken"), (57.7089, 11.9731, "Centralstationen")]
+        )
+        result = tree.nearest(57.7068, 11.9670, 5)
+        assert [item for _, item in result] == ["Brunnsparken", "Centralstationen"]
+        assert result[0][0] == pytest.approx(0)
+        assert 350 < result[1][0] < 500
+
+    def test_empty_tree(self):
+        """Test that an empty index returns nothing."""
+        assert spatial.KDTree([]).nearest(57.7, 11.9, 3) == []
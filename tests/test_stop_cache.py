@@ -0,0 +1,61 @@
+"""Tests for the stop-area search cache."""
+from unittest.mock import patch
+
+import pytest
+
+stop_cache = pytest.importorskip("custom_components.vasttrafik_m34.stop_cache")
+
+
+def _stop(gid, name):
+    """Return stop-area metadata."""
+    return {"gid": gid, "name": name, "latitude": 57.7, "longitude": 11.9}
+
+
+@pytest.fixture
+def cache(mock_hass):
+    """Return a cache that does not touch storage."""
+    with patch.object(stop_cache, "Store"):
+        yield stop_cache.StopAreaCache(mock_hass)
+
+
+class TestStopAreaCache:
+    """Test search caching and metadata lookups."""
+
+    def test_normalized_repeat_query_hits(self, cache):
+        """Test that case and whitespace do not defeat the cache."""
+        cache.async_store("Brunnsparken", [_stop("1", "Brunnsparken, Göteborg")], True)
+        assert cache.async_lookup("  brunnsPARKEN ") == [_stop("1", "Brunnsparken, Göteborg")]
+        assert cache.hits == 1
+
+    def test_prefix_extension_served_from_complete_query(self, cache):
+        """Test that a longer query filters a complete shorter one."""
+        cache.async_store(
+            "central",
+            [_stop("1", "Centralstationen, Göteborg"), _stop("2", "Centrum, Kungälv")],
+            complete=True,
+        )
+        assert cache.async_lookup("centrals") == [_stop("1", "Centralstationen, Göteborg")]
+
+    def test_incomplete_prefix_is_not_used(self, cache):
+        """Test that truncated results are not used for longer queries."""
+        cache.async_store("c", [_stop("1", "Centralstationen, Göteborg")], complete=False)
+        assert cache.async_lookup("centrals") is None
+        assert cache.misses == 1
+
+    def test_expired_query_misses(self, cache):
+        """Test that queries older than the TTL are fetched again."""
+        cache.async_store("central", [_stop("1", "Centralstationen, Göteborg")], True)
+        later = stop_cache.time.time() + stop_cache.STOP_CACHE_TTL.total_seconds() + 1
+        with patch.object(stop_cache.time, "time", return_value=later):
+            assert cache.async_lookup("central") is None
+
+    def test_lru_eviction_keeps_pinned_stops(self, cache):
+        """Test that configured stop areas survive eviction."""
+        with patch.object(stop_cache, "STOP_CACHE_MAX_STOPS", 2):
+            cache.async_store("a", [_stop("1", "A")], True)
+            cache.async_pin("1")
+            cache.async_store("b", [_stop("2", "B")], True)
+            cache.async_store("c", [_stop("3", "C")], True)
+        assert cache.async_get_stop("1") is not None
+        assert cache.async_get_stop("2") is None
+        assert cache.async_get_stop("3") is not None
@@ -0,0 +1,83 @@
+"""Tests for departure diffs sent to websocket subscribers."""
+import pytest
+
+subscription = pytest.importorskip("custom_components.vasttrafik_m34.subscription")
+
+from custom_components.vasttrafik_m34.const import DOMAIN  # noqa: E402
+
+from .conftest import departure  # noqa: E402
+
+
+class TestDepartureStream:
+    """Test snapshots and diffs of a subscriber's departures."""
+
+    def test_snapshot_then_nothing(self):
+        """Test that an unchanged refresh sends nothing."""
+        stream = subscription.DepartureStream()
+        snapshot = stream.snapshot([departure("J1"), departure("J2")])
+        assert [dep["key"] for dep in snapshot["departures"]] == ["J1", "J2"]
+        assert stream.diff([departure("J1"), departure("J2")]) is None
+
+    def test_added_removed_changed(self):
+        """Test that a diff carries only what a refresh changed."""
+        stream = subscription.DepartureStream()
+        stream.snapshot([departure("J1"), departure("J2")])
+        diff = stream.diff([departure("J2", delay=2), departure("J3")])
+        assert [dep["key"] for dep in diff["added"]] == ["J3"]
+        assert diff["removed"] == ["J1"]
+        assert diff["changed"] == [
+            {
+                "key": "J2",
+                "estimated_time": "2026-03-02T09:02:00+00:00",
+                "delay_minutes": 2,
+            }
+        ]
+
+    def test_filters(self):
+        """Test that only the subscribed lines and tracks are sent."""
+        stream = subscription.DepartureStream(lines=["6"], tracks=["A"])
+        snapshot = stream.snapshot(
+            [departure("J1"), departure("J2", line="11"), departure("J3", track="B")]
+        )
+        assert [dep["key"] for dep in snapshot["departures"]] == ["J1"]
+        # A change on a filtered line is not sent
+        changed = [departure("J1"), departure("J2", line="11", delay=3)]
+        assert stream.diff(changed) is None
+
+
+@pytest.mark.usefixtures("socket_enabled")
+class TestWebsocketCommands:
+    """Test the websocket commands of a loaded entry."""
+
+    async def test_subscribe_by_config_entry_id(
+        self, hass, hass_ws_client, loaded_entry
+    ):
+        """Test that a subscription names the entry like the services do."""
+        client = await hass_ws_client(hass)
+        await client.send_json(
+            {
+                "id": 1,
+                "type": f"{DOMAIN}/subscribe_departures",
+                "config_entry_id": loaded_entry.entry_id,
+                "lines": ["11"],
+            }
+        )
+        assert (await client.receive_json())["success"]
+        event = (await client.receive_json())["event"]
+        assert [dep["destination"] for dep in event["departures"]] == ["Saltholmen"]
+
+    async def test_journey_details_unknown_reference(
+        self, hass, hass_ws_client, loaded_entry
+    ):
+        """Test that an unknown details reference is not found."""
+        client = await hass_ws_client(hass)
+        await client.send_json(
+            {
+                "id": 1,
+                "type": f"{DOMAIN}/journey_details",
+                "config_entry_id": loaded_entry.entry_id,
+                "details_reference": "unknown",
+            }
+        )
+        result = await client.receive_json()
+        assert result["error"]["code"] == "not_found"
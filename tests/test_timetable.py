@@ -0,0 +1,72 @@
+"""Tests for the planned timetable snapshot."""
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+timetable = pytest.importorskip("custom_components.vasttrafik_m34.timetable")
+
+from .conftest import DEPARTURE_BASE as NOW, departure  # noqa: E402
+
+
+@pytest.fixture
+def snapshot(mock_hass):
+    """Return a snapshot that does not touch storage."""
+    with patch.object(timetable, "Store") as store:
+        store.return_value.async_save = AsyncMock()
+        yield timetable.TimetableSnapshot(mock_hass, "9021014001760000")
+
+
+class TestSnapshotEnd:
+    """Test how far a snapshot reaches."""
+
+    def test_reaches_next_service_day(self):
+        """Test that a morning snapshot reaches 04:00 the next day."""
+        assert timetable.snapshot_end(NOW) == datetime(2026, 3, 3, 4, 0, tzinfo=timezone.utc)
+
+    def test_night_snapshot_skips_close_day_start(self):
+        """Test that a snapshot taken at night does not end within hours."""
+        night = NOW.replace(hour=2)
+        assert timetable.snapshot_end(night) == datetime(2026, 3, 3, 4, 0, tzinfo=timezone.utc)
+
+
+class TestTimetableSnapshot:
+    """Test storing, slicing and overlaying planned departures."""
+
+    async def test_stored_as_planned_and_sorted(self, snapshot):
+        """Test that estimates are dropped and departures sorted."""
+        await snapshot.async_set([departure("J2", 30, delay=5), departure("J1", 10)], NOW + timedelta(hours=19))
+        planned = snapshot.planned(NOW, NOW + timedelta(hours=1))
+        assert [dep["journey_gid"] for dep in planned] == ["J1", "J2"]
+        assert planned[1]["estimated_time"] == planned[1]["planned_time"]
+        assert not planned[1]["is_realtime"]
+        assert snapshot.loaded
+
+    async def test_planned_window(self, snapshot):
+        """Test that only departures within the window are returned."""
+        await snapshot.async_set(
+            [departure("J1", -5), departure("J2", 10), departure("J3", 60)], NOW + timedelta(hours=19)
+        )
+        planned = snapshot.planned(NOW, NOW + timedelta(minutes=60))
+        assert [dep["journey_gid"] for dep in planned] == ["J2"]
+
+    async def test_needs_refresh(self, snapshot):
+        """Test that a snapshot is refreshed before it runs out."""
+        assert snapshot.needs_refresh(NOW, timedelta(hours=1))
+        await snapshot.async_set([], NOW + timedelta(minutes=30))
+        assert snapshot.needs_refresh(NOW, timedelta(hours=1))
+        await snapshot.async_set([], NOW + timedelta(hours=2))
+        assert not snapshot.needs_refresh(NOW, timedelta(hours=1))
+
+    async def test_overlay(self, snapshot):
+        """Test that realtime data replaces the planned times it covers."""
+        await snapshot.async_set(
+            [departure("J1", 5), departure("J2", 10), departure("J3", 40)], NOW + timedelta(hours=19)
+        )
+        # J2 was cancelled from the realtime answer, J1 runs late
+        board = snapshot.overlay(
+            [departure("J1", 5, delay=3)], NOW, timedelta(minutes=20), timedelta(minutes=60)
+        )
+        assert [dep["journey_gid"] for dep in board] == ["J1", "J3"]
+        assert board[0]["delay_minutes"] == 3
+        assert not board[1]["is_realtime"]
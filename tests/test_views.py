@@ -0,0 +1,102 @@
+"""Tests for the kiosk board views."""
+import json
+
+import pytest
+
+views = pytest.importorskip("custom_components.vasttrafik_m34.views")
+
+from custom_components.vasttrafik_m34.const import DOMAIN  # noqa: E402
+from custom_components.vasttrafik_m34.subscription import (  # noqa: E402
+    compact_departure,
+)
+
+
+def _data(delay=0):
+    """Return coordinator data with one departure."""
+    return {
+        "last_update": "2026-03-02T09:00:00",
+        "departures": [
+            {
+                "journey_gid": "J1",
+                "line_number": "6",
+                "direction": "Kortedala",
+                "track": "A",
+                "planned_time": "2026-03-02T09:10:00+00:00",
+                "estimated_time": f"2026-03-02T09:{10 + delay}:00+00:00",
+                "delay_minutes": delay,
+                "is_cancelled": False,
+            }
+        ],
+    }
+
+
+class TestRenderedBoard:
+    """Test rendering boards for displays."""
+
+    def test_etag_follows_content(self):
+        """Test that equal boards share an ETag and changed ones do not."""
+        board = views.RenderedBoard(_data())
+        assert views.RenderedBoard(_data()).etag == board.etag
+        assert views.RenderedBoard(_data(delay=2)).etag != board.etag
+
+    def test_text(self):
+        """Test the plain-text rendering."""
+        text = views.RenderedBoard(_data(delay=2)).text.decode()
+        assert text.startswith("6 Kortedala ")
+        assert text.endswith(" A +2\n")
+
+    def test_diff_from_previous_board(self):
+        """Test that a changed board carries only what changed."""
+        board = views.RenderedBoard(_data())
+        changed = views.RenderedBoard(_data(delay=2), board)
+        assert changed.previous_etag == board.etag
+        diff = json.loads(changed.diff)
+        assert diff["added"] == diff["removed"] == []
+        assert diff["changed"][0]["delay_minutes"] == 2
+        assert views.RenderedBoard(_data(), board).diff is None
+
+
+async def _read_event(response):
+    """Return the name and data of the next Server-Sent Event."""
+    message = await response.content.readuntil(b"\n\n")
+    fields = dict(line.split(": ", 1) for line in message.decode().split("\n") if line)
+    return fields["event"], json.loads(fields["data"])
+
+
+@pytest.mark.usefixtures("socket_enabled")
+class TestViews:
+    """Test the board and event stream of a loaded entry."""
+
+    async def test_unchanged_board_is_not_modified(self, hass, hass_client, loaded_entry):
+        """Test that a display sending the ETag back gets an empty 304."""
+        client = await hass_client()
+        url = f"/api/{DOMAIN}/{loaded_entry.entry_id}/board"
+        response = await client.get(url)
+        assert response.status == 200
+        assert len((await response.json())["departures"]) == 4
+        etag = response.headers["ETag"]
+        response = await client.get(url, headers={"If-None-Match": etag})
+        assert response.status == 304
+        assert await response.read() == b""
+
+    async def test_event_stream(self, hass, hass_client, loaded_entry):
+        """Test the board event, a diff event and the end on unload."""
+        coordinator = loaded_entry.runtime_data
+        client = await hass_client()
+        response = await client.get(f"/api/{DOMAIN}/{loaded_entry.entry_id}/events")
+        event, data = await _read_event(response)
+        assert event == "board"
+        assert len(data["departures"]) == 4
+        removed = coordinator.data["departures"][0]
+
+        coordinator.async_set_updated_data(
+            {**coordinator.data, "departures": coordinator.data["departures"][1:]}
+        )
+        event, data = await _read_event(response)
+        assert event == "diff"
+        assert data["removed"] == [compact_departure(removed)["key"]]
+        assert data["added"] == data["changed"] == []
+
+        assert await hass.config_entries.async_unload(loaded_entry.entry_id)
+        assert await response.content.read() == b""
+        assert loaded_entry.entry_id not in hass.data[DOMAIN].get("boards", {})